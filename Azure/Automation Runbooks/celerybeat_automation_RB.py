@@ -1,343 +1,155 @@
 #!/usr/bin/env python3
-import json
+"""
+Celerybeat Automation Runbook
+Runs supervisorctl against the celerybeat-vantage program on the VM (or a fleet of VMs) through
+Run Command and reports to Slack. Token, Run Command, polling, fleet, Slack and run history
+plumbing live in runbook_framework, which must be uploaded to the Automation account as a
+Python package; this file only declares what to run in each RUN_MODE.
+"""
+import shlex
 import sys
-import urllib.request
-import urllib.parse
-import urllib.error
-import automationassets
-from datetime import datetime
 
-# Azure metadata constants
-METADATA_URL = "http://169.254.169.254/metadata/identity/oauth2/token"
-RESOURCE = "https://management.azure.com/"
-
-# === CONFIG: GET FROM AUTOMATION VARIABLES ===
-try:
-    SUBSCRIPTION_ID = automationassets.get_automation_variable("<subscription_id_var_name>")  # e.g., "xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx"
-    RESOURCE_GROUP = automationassets.get_automation_variable("<resource_group_var_name>")  # e.g., "vantage-app-prod-rg"
-    VM_NAME = automationassets.get_automation_variable("<vm_name_var_name>")  # e.g., "vantage-app-prod-vm"
-    SRE_Prod_Alert_Slack = automationassets.get_automation_variable("<sre_infra_alert_channel_webhook_var_name>")  # e.g., "https://hooks.slack.com/services/XXX/YYY/ZZZ"
-except Exception as e:
-    print(f"Failed to get automation variables: {e}")
-    print("Make sure all required variables are configured in Assets > Variables")
-    sys.exit(1)
+from runbook_framework import Remediation, get_optional_variable, run_remediation
 
 # Command to run on the VM (runs as root already)
-COMMAND_TO_RUN = "supervisorctl status celerybeat-vantage"  # For testing
-# COMMAND_TO_RUN = "supervisorctl restart celerybeat-vantage"  # Actual command to restart celerybeat
-
-def diagnose_environment():
-    """Diagnose the Azure Automation environment for troubleshooting."""
-    print("=== ENVIRONMENT DIAGNOSTICS ===")
-    
-    # Check if we're in Azure environment
-    try:
-        import os
-        print(f"Python version: {sys.version}")
-        print(f"Current working directory: {os.getcwd()}")
-        
-        # Check for Azure environment variables
-        azure_env_vars = ['IDENTITY_ENDPOINT', 'IDENTITY_HEADER', 'MSI_ENDPOINT', 'MSI_SECRET']
-        azure_env_detected = False
-        for var in azure_env_vars:
-            value = os.environ.get(var)
-            if value:
-                print(f"{var}: {'*' * 10}")  # Mask sensitive values
-                azure_env_detected = True
-            else:
-                print(f"{var}: Not set")
-        
-        # Determine environment
-        if azure_env_detected or '/tmp' in os.getcwd() or 'automation' in os.getcwd().lower():
-            print("Environment: Likely Azure Automation Account")
-            return "azure"
-        else:
-            print("Environment: Local development machine")
-            return "local"
-                
-    except Exception as e:
-        print(f"Environment check failed: {e}")
-        return "unknown"
-    
-    print("=== END DIAGNOSTICS ===\n")
-
-def get_managed_identity_token():
-    """Get an access token for the Azure management API using the Automation Account's system-assigned managed identity."""
-    import os
-    
-    # Check for newer managed identity environment variables first
-    identity_endpoint = os.environ.get('IDENTITY_ENDPOINT')
-    identity_header = os.environ.get('IDENTITY_HEADER')
-    
-    if identity_endpoint and identity_header:
-        print("Using newer managed identity endpoint from environment variables...")
-        try:
-            params = {
-                "api-version": "2019-08-01",
-                "resource": RESOURCE
-            }
-            
-            url_with_params = identity_endpoint + "?" + urllib.parse.urlencode(params)
-            
-            request = urllib.request.Request(url_with_params)
-            request.add_header("X-IDENTITY-HEADER", identity_header)
-            request.add_header("Metadata", "true")
-            
-            with urllib.request.urlopen(request, timeout=30) as response:
-                if response.status != 200:
-                    response_text = response.read().decode('utf-8')
-                    raise Exception(f"Identity endpoint failed: {response.status} {response_text}")
-                
-                response_data = json.loads(response.read().decode('utf-8'))
-                print("Successfully obtained managed identity token using IDENTITY_ENDPOINT")
-                return response_data["access_token"]
-                
-        except Exception as e:
-            print(f"IDENTITY_ENDPOINT method failed: {str(e)}")
-            # Fall back to legacy method
-    
-    # Try legacy MSI endpoint if available
-    msi_endpoint = os.environ.get('MSI_ENDPOINT')
-    msi_secret = os.environ.get('MSI_SECRET')
-    
-    if msi_endpoint and msi_secret:
-        print("Using legacy MSI endpoint from environment variables...")
-        try:
-            params = {
-                "api-version": "2017-09-01",
-                "resource": RESOURCE
-            }
-            
-            url_with_params = msi_endpoint + "?" + urllib.parse.urlencode(params)
-            
-            request = urllib.request.Request(url_with_params)
-            request.add_header("Secret", msi_secret)
-            request.add_header("Metadata", "true")
-            
-            with urllib.request.urlopen(request, timeout=30) as response:
-                if response.status != 200:
-                    response_text = response.read().decode('utf-8')
-                    raise Exception(f"MSI endpoint failed: {response.status} {response_text}")
-                
-                response_data = json.loads(response.read().decode('utf-8'))
-                print("Successfully obtained managed identity token using MSI_ENDPOINT")
-                return response_data["access_token"]
-                
-        except Exception as e:
-            print(f"MSI_ENDPOINT method failed: {str(e)}")
-    
-    # Fall back to standard metadata endpoint as last resort
-    print("Falling back to standard metadata endpoint...")
-    api_versions = ["2019-08-01", "2018-02-01"]
-    
-    for api_version in api_versions:
-        try:
-            params = {
-                "api-version": api_version,
-                "resource": RESOURCE
-            }
-            
-            url_with_params = METADATA_URL + "?" + urllib.parse.urlencode(params)
-            
-            print(f"Attempting metadata endpoint with API version {api_version}...")
-            
-            request = urllib.request.Request(url_with_params)
-            request.add_header("Metadata", "true")
-
-            with urllib.request.urlopen(request, timeout=10) as response:
-                if response.status != 200:
-                    response_text = response.read().decode('utf-8')
-                    print(f"Metadata API version {api_version} failed: {response.status} {response_text}")
-                    continue
-                
-                response_data = json.loads(response.read().decode('utf-8'))
-                print(f"Successfully obtained managed identity token using metadata endpoint API version {api_version}")
-                return response_data["access_token"]
-                
-        except urllib.error.URLError as e:
-            print(f"Metadata API version {api_version} failed with URLError: {str(e)}")
-            continue
-        except Exception as e:
-            print(f"Metadata API version {api_version} failed with error: {str(e)}")
-            continue
-    
-    # If all methods fail
-    raise Exception("""
-Failed to obtain managed identity token with all available methods.
-
-Attempted methods:
-1. IDENTITY_ENDPOINT (newer Azure environments)
-2. MSI_ENDPOINT (legacy Azure environments)  
-3. Metadata endpoint (fallback)
-
-All environment variables are present but authentication is failing.
-This may indicate a configuration issue with the Automation Account's managed identity.
-""")
-
-def invoke_run_command(access_token):
-    """Invoke Run Command on a VM to execute the desired shell command."""
-    url = (
-        f"https://management.azure.com/subscriptions/{SUBSCRIPTION_ID}"
-        f"/resourceGroups/{RESOURCE_GROUP}/providers/Microsoft.Compute/virtualMachines/{VM_NAME}"
-        f"/runCommand?api-version=2018-04-01"
-    )
-
-    body = {
-        "commandId": "RunShellScript",
-        "script": [
-            COMMAND_TO_RUN
-        ]
-    }
-
-    print(f"Invoking Run Command on VM '{VM_NAME}' in resource group '{RESOURCE_GROUP}'...")
+CELERYBEAT_PROGRAM = "celerybeat-vantage"  # supervisord program name
+COMMAND_TO_RUN = f"supervisorctl status {CELERYBEAT_PROGRAM}"  # For testing
+# COMMAND_TO_RUN = f"supervisorctl restart {CELERYBEAT_PROGRAM}"  # Actual command to restart celerybeat
+
+# Fleet mode, run history and the required variables (subscription, resource group, VM, Slack
+# webhook) are read by runbook_framework; see DEFAULT_VARIABLES there for their names.
+
+# === STEPS MODE (optional) ===
+# RUN_MODE "steps" runs COMMAND_STEPS in order inside a single Run Command script (one round
+# trip instead of one per command). Each step's start, exit code and duration are reported per
+# step; a failing step stops the remaining ones.
+COMMAND_STEPS = [
+    ("status", f"supervisorctl status {CELERYBEAT_PROGRAM} || true"),  # Non-zero while stopped; informational
+    ("restart", f"supervisorctl restart {CELERYBEAT_PROGRAM}"),
+    ("verify", f"sleep 5; supervisorctl status {CELERYBEAT_PROGRAM} | grep -q RUNNING"),
+]
+
+# === HEALTH MODE (optional) ===
+# RUN_MODE "health" replaces COMMAND_TO_RUN with a probe that restarts celerybeat only when it is
+# stalled: not RUNNING in supervisor, or neither the schedule file nor the log has seen a tick recently.
+# Probe and restart happen in the same Run Command, and healthy runs don't notify Slack.
+RUN_MODE = get_optional_variable("<run_mode_var_name>", "command")  # "command", "steps" or "health"
+CELERYBEAT_SCHEDULE_FILE = get_optional_variable("<celerybeat_schedule_file_var_name>")  # e.g., "/srv/vantage/celerybeat-schedule*"
+CELERYBEAT_LOG_FILE = get_optional_variable("<celerybeat_log_file_var_name>")  # e.g., "/var/log/supervisor/celerybeat-vantage.log"
+HEALTH_MAX_SCHEDULE_AGE = 600  # Seconds without a schedule file write before beat counts as stalled
+HEALTH_MAX_TICK_AGE = 900  # Seconds since the last "Sending due task" log line
+HEALTH_LOG_TAIL_LINES = 5000  # Log lines searched for the last tick
+
+def build_health_check_script():
+    """Shell script that probes celerybeat and restarts it only when stalled.
     
-    request = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'))
-    request.add_header("Authorization", f"Bearer {access_token}")
-    request.add_header("Content-Type", "application/json")
-    request.get_method = lambda: 'POST'
-
-    try:
-        with urllib.request.urlopen(request, timeout=90) as response:
-            if response.status not in (200, 201, 202):
-                response_text = response.read().decode('utf-8')
-                raise Exception(f"Run Command invoke failed: {response.status} {response_text}")
-            
-            print(f"Run Command initiated successfully. Status: {response.status}")
-            
-            # For the simple approach, just return a success indicator
-            # The command is executed but we don't wait for detailed output
-            return {
-                "status": "completed", 
-                "message": f"Command '{COMMAND_TO_RUN}' was successfully executed on {VM_NAME}",
-                "execution_status": response.status
-            }
-                
-    except urllib.error.URLError as e:
-        raise Exception(f"Run Command invoke failed: {str(e)}")
-
-
-
-def send_slack_notification(message, is_error=False):
-    """Send notification to Slack channel."""
-    try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S UTC")
-        color = "#ff0000" if is_error else "#00ff00"
-        emoji = ":x:" if is_error else ":white_check_mark:"
-        
-        payload = {
-            "attachments": [{
-                "color": color,
-                "fields": [
-                    {
-                        "title": f"{emoji} Celerybeat Automation - {VM_NAME}",
-                        "value": message,
-                        "short": False
-                    },
-                    {
-                        "title": "Timestamp",
-                        "value": timestamp,
-                        "short": True
-                    }
-                ]
-            }]
-        }
-        
-        request = urllib.request.Request(SRE_Prod_Alert_Slack, data=json.dumps(payload).encode('utf-8'))
-        request.add_header("Content-Type", "application/json")
-        request.get_method = lambda: 'POST'
-        
-        try:
-            with urllib.request.urlopen(request, timeout=30) as response:
-                if response.status != 200:
-                    print(f"Failed to send Slack notification: {response.status}")
-                else:
-                    print("Slack notification sent successfully")
-        except urllib.error.URLError as e:
-            print(f"Failed to send Slack notification: {str(e)}")
-    except Exception as e:
-        print(f"Error sending Slack notification: {e}")
-
-def extract_safe_output(result):
-    """Extract command output while filtering sensitive information."""
-    if not result:
-        return "No result data available"
-        
-    try:
-        # Handle simple response format
-        if result.get("status") == "completed":
-            return result.get("message", "Command executed successfully")
-        
-        if result.get("status") == "accepted":
-            return "Command was accepted and is executing asynchronously"
-        
-        if "message" in result and isinstance(result["message"], str):
-            return result["message"]
-        
-        return "Command executed successfully - minimal output available"
-        
-    except Exception as e:
-        return f"Could not extract command output: {str(e)}"
-
-def print_run_command_output(result):
-    """Pretty-print the Run Command result from Azure."""
-    print("Run Command result (raw):")
-    print(json.dumps(result, indent=2))
-
-    # Try to extract common message formats
-    try:
-        value = result.get("value", [])
-        for item in value:
-            message = item.get("message")
-            if message:
-                print("----- MESSAGE -----")
-                print(message)
-    except Exception:
-        pass
-
-def main():
-    try:
-        print(f"Starting celerybeat restart automation for {VM_NAME}...")
-        
-        # Run diagnostics first
-        env_type = diagnose_environment()
-        
-        if env_type == "local":
-            print("🚨 WARNING: Running on local machine - managed identity won't work!")
-            print("This script is designed to run in Azure Automation Account.")
-            print("For local testing, only Slack notification will be tested.\n")
-            
-            # Test Slack notification only
-            test_message = f"🧪 **LOCAL TEST** - Celerybeat automation script for {VM_NAME}\n\nThis is a test run from local development environment.\nIn production, this would execute: `{COMMAND_TO_RUN}`"
-            send_slack_notification(test_message, is_error=False)
-            print("✅ Local test completed - Slack notification sent")
-            return
-        
-        # Azure environment - proceed with full automation
-        print("Running in Azure environment - proceeding with managed identity authentication...")
-        
-        # Get token first - this is where the timeout was occurring
-        token = get_managed_identity_token()
-        
-        # Execute the command
-        result = invoke_run_command(token)
-        
-        # Print result for logging
-        if result:
-            print_run_command_output(result)
-        
-        # Extract safe command output for Slack
-        command_output = extract_safe_output(result) if result else ""
-        
-        success_message = f"Successfully executed command: `{COMMAND_TO_RUN}`\n\n**Output:**\n```\n{command_output}\n```" if command_output else f"Successfully executed command: `{COMMAND_TO_RUN}`"
-        
-        send_slack_notification(success_message, is_error=False)
-        print("Completed Run Command on celerybeat-vantage.")
-        
-    except Exception as e:
-        error_message = f"Failed to execute celerybeat restart automation\n\n**Error:** {str(e)}"
-        send_slack_notification(error_message, is_error=True)
-        print(f"ERROR: {e}")
-        sys.exit(1)
+    Prints one "HEALTH state=... schedule_age=... tick_age=..." line (ages in seconds, -1 when
+    unknown), then "HEALTHY", "NOSIGNAL <reason>" when a running beat can't be judged (no
+    schedule file or log ticks to read; nothing is restarted), or "STALLED <reason>" followed by
+    "RESTARTED <new state>".
+    """
+    return f"""
+PROGRAM={shlex.quote(CELERYBEAT_PROGRAM)}
+SCHEDULE_GLOB={shlex.quote(CELERYBEAT_SCHEDULE_FILE or "")}
+LOG_FILE={shlex.quote(CELERYBEAT_LOG_FILE or "")}
+now=$(date +%s)
+state=$(supervisorctl status "$PROGRAM" 2>&1 | awk '{{print $2}}')
+schedule_age=-1
+if [ -n "$SCHEDULE_GLOB" ]; then
+  schedule_file=$(ls -t $SCHEDULE_GLOB 2>/dev/null | head -n 1)
+  [ -n "$schedule_file" ] && schedule_age=$(( now - $(stat -c %Y "$schedule_file") ))
+fi
+tick_age=-1
+if [ -n "$LOG_FILE" ] && [ -r "$LOG_FILE" ]; then
+  tick=$(tail -n {HEALTH_LOG_TAIL_LINES} "$LOG_FILE" | grep "Sending due task" | tail -n 1 | sed -n 's/^\\[\\([0-9-]* [0-9:]*\\).*/\\1/p')
+  [ -n "$tick" ] && tick_at=$(date -d "$tick" +%s 2>/dev/null) && tick_age=$(( now - tick_at ))
+fi
+echo "HEALTH state=${{state:-UNKNOWN}} schedule_age=$schedule_age tick_age=$tick_age"
+reason=""
+if [ "$state" != "RUNNING" ]; then
+  reason="supervisor state ${{state:-UNKNOWN}}"
+elif [ $schedule_age -lt 0 ] && [ $tick_age -lt 0 ]; then
+  if [ -z "$SCHEDULE_GLOB" ] && [ -z "$LOG_FILE" ]; then
+    echo "NOSIGNAL no schedule file or log configured"
+  else
+    echo "NOSIGNAL no readable schedule file or log ticks"
+  fi
+  exit 0
+else
+  stalled=1
+  [ $schedule_age -ge 0 ] && [ $schedule_age -le {HEALTH_MAX_SCHEDULE_AGE} ] && stalled=0
+  [ $tick_age -ge 0 ] && [ $tick_age -le {HEALTH_MAX_TICK_AGE} ] && stalled=0
+  [ $stalled -eq 1 ] && reason="no recent schedule writes or ticks"
+fi
+if [ -z "$reason" ]; then
+  echo "HEALTHY"
+  exit 0
+fi
+echo "STALLED $reason"
+supervisorctl restart "$PROGRAM" >/dev/null 2>&1
+sleep 2
+echo "RESTARTED $(supervisorctl status "$PROGRAM" 2>&1 | awk '{{print $2}}')"
+"""
+
+def parse_health_output(stdout):
+    """Parse build_health_check_script() output into a dict."""
+    health = {"state": None, "schedule_age": None, "tick_age": None,
+              "stalled": False, "reason": "", "restarted_state": None, "no_signal": None}
+    for line in (stdout or "").splitlines():
+        line = line.strip()
+        if line.startswith("HEALTH "):
+            for pair in line.split()[1:]:
+                key, _, value = pair.partition("=")
+                if key == "state":
+                    health["state"] = value
+                elif key in ("schedule_age", "tick_age") and value.lstrip("-").isdigit():
+                    health[key] = int(value) if int(value) >= 0 else None
+        elif line.startswith("NOSIGNAL"):
+            health["no_signal"] = line[len("NOSIGNAL"):].strip() or "no activity signal"
+        elif line.startswith("STALLED "):
+            health["stalled"] = True
+            health["reason"] = line[len("STALLED "):]
+        elif line.startswith("RESTARTED"):
+            health["restarted_state"] = line[len("RESTARTED"):].strip() or None
+    if health["state"] is None:
+        raise Exception(f"Health probe returned no report: {stdout!r}")
+    return health
+
+def format_health_report(health):
+    """Return (message, is_error); message is None for a healthy beat (nothing to notify)."""
+    def age(seconds):
+        return "unknown" if seconds is None else f"{seconds}s"
+    details = (f"Supervisor: {health['state']}, schedule file age: {age(health['schedule_age'])}, "
+               f"time since last tick: {age(health['tick_age'])}")
+    if health["no_signal"]:
+        return (f"Celerybeat health is unknown: {health['no_signal']}. Set the schedule file or log "
+                f"variables so stalls can be detected.\n\n{details}"), True
+    if not health["stalled"]:
+        return None, False
+    if health["restarted_state"] == "RUNNING":
+        return f"Celerybeat was stalled ({health['reason']}) and has been restarted.\n\n{details}", False
+    return (f"Celerybeat is stalled ({health['reason']}) and the restart did not bring it back "
+            f"(state: {health['restarted_state'] or 'unknown'}).\n\n{details}"), True
+
+def check_health(result):
+    """Remediation check for health mode: (ok, message), message None when beat is healthy."""
+    health = parse_health_output(result["stdout"])
+    message, is_error = format_health_report(health)
+    if message is None:
+        print(f"Celerybeat is healthy (state {health['state']}); no restart needed.")
+    return not is_error, message
+
+RUN_NAME = "celerybeat_automation_RB"
+TITLE = "Celerybeat Automation"
+REMEDIATIONS = {
+    "command": Remediation(RUN_NAME, TITLE, script=COMMAND_TO_RUN, mode="command"),
+    "steps": Remediation(RUN_NAME, TITLE, steps=COMMAND_STEPS, mode="steps"),
+    "health": Remediation(RUN_NAME, TITLE, script=build_health_check_script, check=check_health,
+                          description="the celerybeat health check", mode="health")
+}
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if RUN_MODE not in REMEDIATIONS:
+        print(f"Unknown run mode {RUN_MODE!r}; expected one of {', '.join(REMEDIATIONS)}")
+        sys.exit(1)
+    run_remediation(REMEDIATIONS[RUN_MODE])
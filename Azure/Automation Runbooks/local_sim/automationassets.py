@@ -0,0 +1,35 @@
+"""
+Local stand-in for Azure Automation's automationassets module.
+Variables are read from the JSON object in $AUTOMATION_ASSETS_FILE, e.g.
+    {"<subscription_id_var_name>": "00000000-0000-0000-0000-000000000000", ...}
+Put this directory first on PYTHONPATH to run a runbook outside Azure Automation.
+"""
+
+import json
+import os
+
+_variables = None
+
+
+def _load():
+    global _variables
+    if _variables is None:
+        path = os.environ.get("AUTOMATION_ASSETS_FILE")
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                _variables = json.load(f)
+        else:
+            _variables = {}
+    return _variables
+
+
+def get_automation_variable(name):
+    """Return the variable's value; raises like the real module when it is not defined."""
+    variables = _load()
+    if name not in variables:
+        raise ValueError(f"Automation variable '{name}' not found")
+    return variables[name]
+
+
+def set_automation_variable(name, value):
+    _load()[name] = value
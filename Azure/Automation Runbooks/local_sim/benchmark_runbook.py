@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+End-to-End Runbook Benchmark
+Runs a runbook (default: celerybeat_automation_RB.py) in fresh interpreters against the stub
+server under each scenario, and reports wall time, exit status and the requests it made.
+Every run gets its own temp directory, so the token cache starts cold unless --warm-token is given.
+
+Examples:
+    python3 benchmark_runbook.py
+    python3 benchmark_runbook.py --scenario baseline --scenario slow_command --runs 5
+    python3 benchmark_runbook.py --warm-token
+    python3 benchmark_runbook.py --history /tmp/bench_history.jsonl && python3 ../summarize_run_history.py /tmp/bench_history.jsonl
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from stub_server import SCENARIOS, StubServer
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RUNBOOK = os.path.join(os.path.dirname(SIM_DIR), "celerybeat_automation_RB.py")
+
+# Runbook automation variables shared by every benchmark
+BASE_VARIABLES = {
+    "<subscription_id_var_name>": "00000000-0000-0000-0000-000000000000",
+    "<resource_group_var_name>": "stub-rg",
+    "<vm_name_var_name>": "stub-vm"
+}
+
+# name -> (stub scenario, extra automation variables)
+BENCHMARKS = {
+    "baseline": ("baseline", {}),
+    "slow_identity": ("slow_identity", {}),
+    "identity_down": ("identity_down", {}),
+    "slow_arm": ("slow_arm", {}),
+    "slow_command": ("slow_command", {}),
+    "flaky_arm": ("flaky_arm", {}),
+    "command_failed": ("command_failed", {}),
+    "retry_after": ("retry_after", {}),
+    "location_only": ("location_only", {}),
+    "slack_throttled": ("slack_throttled", {}),
+    "fleet_tag": ("baseline", {"<fleet_vm_tag_var_name>": "role=celerybeat"}),
+    "steps": ("steps", {"<run_mode_var_name>": "steps"}),
+    "health_stalled": ("health_stalled", {"<run_mode_var_name>": "health"})
+}
+
+
+def run_once(runbook, server, variables, workdir, verbose):
+    """Run the runbook once; returns (seconds, exit code)."""
+    assets_file = os.path.join(workdir, "automation_assets.json")
+    with open(assets_file, "w", encoding="utf-8") as f:
+        json.dump(dict(variables, **{"<sre_infra_alert_channel_webhook_var_name>": f"{server.base_url}/slack"}), f)
+    env = dict(os.environ, **server.environment())
+    env.update({
+        "PYTHONPATH": SIM_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+        "AUTOMATION_ASSETS_FILE": assets_file,
+        "TMPDIR": workdir  # Token cache location
+    })
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, runbook], env=env, cwd=workdir,
+                               stdout=None if verbose else subprocess.DEVNULL,
+                               stderr=None if verbose else subprocess.DEVNULL)
+    return time.perf_counter() - started, completed.returncode
+
+
+def run_benchmark(name, runbook, runs, warm_token, verbose, history_file=None):
+    scenario, extra_variables = BENCHMARKS[name]
+    variables = dict(BASE_VARIABLES, **extra_variables)
+    if history_file:
+        variables["<run_history_file_var_name>"] = os.path.abspath(history_file)
+    server = StubServer(scenario).start()
+    times, exit_codes = [], []
+    try:
+        with tempfile.TemporaryDirectory() as shared_dir:
+            for _ in range(runs):
+                if warm_token:
+                    seconds, exit_code = run_once(runbook, server, variables, shared_dir, verbose)
+                else:
+                    with tempfile.TemporaryDirectory() as workdir:
+                        seconds, exit_code = run_once(runbook, server, variables, workdir, verbose)
+                times.append(seconds)
+                exit_codes.append(exit_code)
+    finally:
+        server.stop()
+    return {
+        "name": name,
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "failures": sum(1 for code in exit_codes if code != 0),
+        "requests": sum(server.requests.values()) / runs,
+        "connections": len(server.connections) / runs,
+        "slack_posts": len(server.slack_posts) / runs
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark a runbook end to end against the stub Azure endpoints')
+    parser.add_argument('--runbook', default=DEFAULT_RUNBOOK, help='Runbook script (default: celerybeat_automation_RB.py)')
+    parser.add_argument('--scenario', action='append', choices=sorted(BENCHMARKS),
+                       help='Benchmark to run; repeat for several (default: all)')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per scenario (default: 3)')
+    parser.add_argument('--warm-token', action='store_true', help='Keep the token cache between runs of a scenario')
+    parser.add_argument('--verbose', action='store_true', help='Show runbook output')
+    parser.add_argument('--history', help='Append every run to this run history JSONL file')
+    args = parser.parse_args()
+
+    unknown = [scenario for scenario, _ in BENCHMARKS.values() if scenario not in SCENARIOS]
+    if unknown:
+        parser.error(f"Benchmarks refer to unknown stub scenarios: {', '.join(unknown)}")
+
+    print(f"{'Scenario':<16} {'Median (s)':>10} {'Min (s)':>8} {'Max (s)':>8} {'Failed':>7} "
+          f"{'Requests':>9} {'Conns':>6} {'Slack':>6}")
+    print("-" * 78)
+    for name in args.scenario or BENCHMARKS:
+        result = run_benchmark(name, args.runbook, args.runs, args.warm_token, args.verbose, args.history)
+        print(f"{result['name']:<16} {result['median']:>10.2f} {result['min']:>8.2f} {result['max']:>8.2f} "
+              f"{result['failures']:>4}/{args.runs:<2} {result['requests']:>9.1f} {result['connections']:>6.1f} "
+              f"{result['slack_posts']:>6.1f}")
+    print("\nRequests, connections and Slack posts are per run; 'Failed' counts non-zero exit codes.")
+
+
+if __name__ == '__main__':
+    main()
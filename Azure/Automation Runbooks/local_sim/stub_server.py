@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Stub Azure Endpoints for Local Runbook Runs
+Emulates the pieces of Azure a runbook talks to, with injectable delays and errors:
+  - GET  /identity                       managed identity token endpoint (IDENTITY_ENDPOINT)
+  - POST .../virtualMachines/{vm}/runCommand   202 + Azure-AsyncOperation/Location headers
+  - GET  /operations/{id}                async operation status, output once finished
+  - GET  /operations/{id}/result         Location URL: 202 while running, RunCommandResult after
+  - GET  /subscriptions/{sub}/resources  tag lookups for fleet mode
+  - POST /slack                          Slack incoming webhook
+  - PUT/GET /blob/{name}                 append blob (create, comp=appendblock, download) for run history
+
+Example (prints the environment to point a runbook at the stub):
+    python3 stub_server.py --scenario slow_command --port 8765
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Scenario knobs; SCENARIOS entries override these
+DEFAULT_SCENARIO = {
+    "identity_delay": 0.0,  # Seconds before the token endpoint answers
+    "identity_status": 200,  # Non-200 makes the token endpoint fail
+    "arm_delay": 0.0,  # Added latency on every ARM request
+    "arm_error_rate": 0.0,  # Fraction of polls answered with 503
+    "command_seconds": 1.0,  # Time until a Run Command finishes
+    "command_status": "Succeeded",  # Final async operation status
+    "retry_after": None,  # Retry-After header on 202/in-progress responses
+    "async_operation": True,  # False answers the Run Command POST with a Location header only
+    "stdout": "celerybeat-vantage               RUNNING   pid 4242, uptime 3 days, 1:02:03",
+    "stderr": "",
+    "slack_delay": 0.0,
+    "slack_throttle": 0,  # Number of initial webhook posts answered with 429
+    "tagged_vms": 3,  # VMs returned for any tag lookup
+    "seed": 7
+}
+
+SCENARIOS = {
+    "baseline": {},
+    "slow_identity": {"identity_delay": 2.0},
+    "identity_down": {"identity_status": 500},
+    "slow_arm": {"arm_delay": 0.3},
+    "slow_command": {"command_seconds": 8.0},
+    "flaky_arm": {"arm_error_rate": 0.3, "command_seconds": 4.0},
+    "command_failed": {"command_status": "Failed"},
+    "retry_after": {"retry_after": "1", "command_seconds": 3.0},
+    "location_only": {"async_operation": False},
+    "slack_throttled": {"slack_throttle": 2},
+    "steps": {"stdout": "##runbook-step start status\ncelerybeat-vantage   STOPPED   Oct 19 08:00 AM\n"
+                        "##runbook-step end status 0 412\n##runbook-step start restart\ncelerybeat-vantage: started\n"
+                        "##runbook-step end restart 0 2310\n##runbook-step start verify\n##runbook-step end verify 0 5120"},
+    "health_stalled": {"stdout": "HEALTH state=RUNNING schedule_age=5400 tick_age=5520\n"
+                                 "STALLED no recent schedule writes or ticks\nRESTARTED RUNNING"}
+}
+
+_RUN_COMMAND_PATH = re.compile(
+    r"^/subscriptions/[^/]+/resourceGroups/(?P<rg>[^/]+)/providers/Microsoft\.Compute/virtualMachines/(?P<vm>[^/]+)/runCommand$",
+    re.IGNORECASE
+)
+_RESOURCES_PATH = re.compile(r"^/subscriptions/(?P<sub>[^/]+)/resources$", re.IGNORECASE)
+_OPERATION_PATH = re.compile(r"^/operations/(?P<id>\d+)(?P<result>/result)?$")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoints
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            if value is not None:
+                self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        server.record(self, "GET")
+        parts = urlsplit(self.path)
+        scenario = server.scenario
+
+        if parts.path == "/identity":
+            time.sleep(scenario["identity_delay"])
+            if scenario["identity_status"] != 200:
+                return self._send(scenario["identity_status"], {"error": "identity endpoint unavailable"})
+            return self._send(200, {
+                "access_token": "stub-token",
+                "expires_on": str(int(time.time()) + 3600),
+                "resource": parse_qs(parts.query).get("resource", [""])[0],
+                "token_type": "Bearer"
+            })
+
+        if parts.path.startswith("/blob/"):
+            blob = server.blobs.get(parts.path)
+            if blob is None:
+                return self._send(404, {"error": "BlobNotFound"})
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(blob)))
+            self.end_headers()
+            return self.wfile.write(bytes(blob))
+
+        time.sleep(scenario["arm_delay"])
+        match = _OPERATION_PATH.match(parts.path)
+        if match:
+            operation = server.operations.get(int(match.group("id")))
+            if operation is None:
+                return self._send(404, {"error": {"code": "NotFound"}})
+            if server.should_fail():
+                return self._send(503, {"error": {"code": "ServiceUnavailable"}}, {"Retry-After": scenario["retry_after"]})
+            return self._operation(operation, bool(match.group("result")))
+
+        match = _RESOURCES_PATH.match(parts.path)
+        if match:
+            return self._send(200, {"value": [
+                {
+                    "id": (f"/subscriptions/{match.group('sub')}/resourceGroups/stub-rg/providers/"
+                           f"Microsoft.Compute/virtualMachines/stub-vm{index}"),
+                    "type": "Microsoft.Compute/virtualMachines"
+                }
+                for index in range(1, scenario["tagged_vms"] + 1)
+            ]})
+
+        self._send(404, {"error": {"code": "NotFound", "message": parts.path}})
+
+    def _operation(self, operation, location):
+        scenario = self.server.scenario
+        finished = time.monotonic() - operation["started"] >= scenario["command_seconds"]
+        in_progress_headers = {"Retry-After": scenario["retry_after"]}
+        if location:
+            if not finished:
+                return self._send(202, None, in_progress_headers)
+            return self._send(200, operation["result"])
+        if not finished:
+            return self._send(200, {"status": "InProgress"}, in_progress_headers)
+        if scenario["command_status"] != "Succeeded":
+            return self._send(200, {"status": scenario["command_status"],
+                                    "error": {"code": "VMAgentStatusCommunicationError",
+                                              "message": "VM has reported a failure when processing extension 'RunCommandLinux'"}})
+        return self._send(200, {"status": "Succeeded", "properties": {"output": operation["result"]}})
+
+    def do_PUT(self):
+        server = self.server
+        server.record(self, "PUT")
+        parts = urlsplit(self.path)
+        data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not parts.path.startswith("/blob/"):
+            return self._send(404, {"error": {"code": "NotFound", "message": parts.path}})
+        with server.lock:
+            blob = server.blobs.get(parts.path)
+            if "comp=appendblock" in parts.query:
+                if blob is None:
+                    status = 404
+                else:
+                    blob.extend(data)
+                    status = 201
+            elif self.headers.get("x-ms-blob-type") == "AppendBlob":
+                if blob is not None and self.headers.get("If-None-Match") == "*":
+                    status = 409
+                else:
+                    server.blobs[parts.path] = bytearray()
+                    status = 201
+            else:
+                status = 400
+        self._send(status, None if status == 201 else {"error": status})
+
+    def do_POST(self):
+        server = self.server
+        server.record(self, "POST")
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        scenario = server.scenario
+        path = urlsplit(self.path).path
+
+        if path == "/slack":
+            time.sleep(scenario["slack_delay"])
+            with server.lock:
+                server.slack_posts.append(body)
+                throttled = len(server.slack_posts) <= scenario["slack_throttle"]
+            if throttled:
+                return self._send(429, {"error": "rate_limited"}, {"Retry-After": "1"})
+            return self._send(200, None)
+
+        time.sleep(scenario["arm_delay"])
+        match = _RUN_COMMAND_PATH.match(path)
+        if not match:
+            return self._send(404, {"error": {"code": "NotFound", "message": path}})
+        operation_id = next(server.operation_ids)
+        server.operations[operation_id] = {
+            "vm": match.group("vm"),
+            "script": "\n".join(body.get("script", [])),
+            "started": time.monotonic(),
+            # RunShellScript on Linux: one message with [stdout] and [stderr] sections
+            "result": {"value": [
+                {"code": "ProvisioningState/succeeded", "level": "Info", "displayStatus": "Provisioning succeeded",
+                 "message": f"Enable succeeded: \n[stdout]\n{scenario['stdout']}\n\n[stderr]\n{scenario['stderr']}\n"}
+            ]}
+        }
+        base = server.base_url
+        self._send(202, None, {
+            "Azure-AsyncOperation": f"{base}/operations/{operation_id}" if scenario["async_operation"] else None,
+            "Location": f"{base}/operations/{operation_id}/result",
+            "Retry-After": scenario["retry_after"]
+        })
+
+
+class StubServer(ThreadingHTTPServer):
+    """Stub endpoints for one scenario; request counts are kept in `requests`."""
+
+    daemon_threads = True
+
+    def __init__(self, scenario="baseline", port=0, **overrides):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.scenario = dict(DEFAULT_SCENARIO, **SCENARIOS.get(scenario, {}), **overrides)
+        self.scenario_name = scenario
+        self.random = random.Random(self.scenario["seed"])
+        self.lock = threading.Lock()
+        self.operation_ids = itertools.count(1)
+        self.operations = {}
+        self.slack_posts = []
+        self.blobs = {}
+        self.requests = {}
+        self.connections = set()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def environment(self):
+        """Environment variables that point a runbook at this stub."""
+        return {
+            "IDENTITY_ENDPOINT": f"{self.base_url}/identity",
+            "IDENTITY_HEADER": "stub-identity-header",
+            "RUNBOOK_ARM_ENDPOINT": self.base_url
+        }
+
+    def record(self, handler, method):
+        with self.lock:
+            key = f"{method} {urlsplit(handler.path).path.split('/')[1]}"
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.connections.add(handler.client_address)
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.scenario["arm_error_rate"]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve stub Azure identity, Run Command and Slack endpoints')
+    parser.add_argument('--scenario', default='baseline', choices=sorted(SCENARIOS), help='Scenario (default: baseline)')
+    parser.add_argument('--port', type=int, default=8765, help='Port (default: 8765)')
+    args = parser.parse_args()
+
+    server = StubServer(args.scenario, args.port)
+    print(f"Stub server for scenario '{args.scenario}' on {server.base_url}")
+    for name, value in server.environment().items():
+        print(f"export {name}={value}")
+    print(f"Slack webhook: {server.base_url}/slack")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
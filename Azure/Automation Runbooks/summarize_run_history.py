@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Runbook Run History Summary
+Reads the JSONL run history the runbooks append (a local file, or the append blob given by a
+SAS URL) and reports, per runbook, the failure rate and p50/p95 of the total run time and of
+each phase (token, invoke, poll, notify). Grouping by day shows whether IMDS or ARM is slowing
+down over time.
+
+Examples:
+    python3 summarize_run_history.py /tmp/runbook_history.jsonl
+    python3 summarize_run_history.py "https://<account>.blob.core.windows.net/runbooks/history.jsonl?<sas>" --by day
+    python3 summarize_run_history.py history.jsonl --runbook celerybeat_automation_RB --since 2024-06-01
+"""
+
+import argparse
+import json
+import sys
+import urllib.request
+
+PHASES = ("token", "invoke", "poll", "notify")
+
+
+def percentile(values, fraction):
+    """Linear-interpolated percentile of a non-empty list."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def load_records(source):
+    """History records from a file path or an http(s) URL; malformed lines are skipped."""
+    if source.startswith(("http://", "https://")):
+        with urllib.request.urlopen(source, timeout=60) as response:
+            lines = response.read().decode("utf-8").splitlines()
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    records = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            print(f"Skipping malformed history line: {line[:80]}", file=sys.stderr)
+    return records
+
+
+def summarize(records, by_day=False):
+    """Rows of {runbook, day, runs, failures, failure_rate, total/phase p50/p95} sorted by runbook and day."""
+    groups = {}
+    for record in records:
+        key = (record.get("runbook", "?"), record.get("started_at", "")[:10] if by_day else "")
+        groups.setdefault(key, []).append(record)
+
+    rows = []
+    for (runbook, day), group in sorted(groups.items()):
+        failures = sum(1 for record in group if record.get("outcome") != "success")
+        row = {"runbook": runbook, "day": day, "runs": len(group), "failures": failures,
+               "failure_rate": failures / len(group)}
+        columns = {"total": [record["seconds"] for record in group if "seconds" in record]}
+        for phase in PHASES:
+            columns[phase] = [record["phases"][phase] for record in group if phase in record.get("phases", {})]
+        for name, values in columns.items():
+            row[f"{name}_p50"] = percentile(values, 0.5) if values else None
+            row[f"{name}_p95"] = percentile(values, 0.95) if values else None
+        rows.append(row)
+    return rows
+
+
+def print_summary(rows, by_day):
+    def seconds(value):
+        return f"{value:.2f}" if value is not None else "-"
+
+    columns = ["total"] + list(PHASES)
+    label_width = max([len("Runbook")] + [len(row["runbook"]) for row in rows])
+    header = f"{'Runbook':<{label_width}} " + (f"{'Day':<10} " if by_day else "") + f"{'Runs':>5} {'Fail %':>7}"
+    header += "".join(f" {name + ' p50/p95':>17}" for name in columns)
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        line = f"{row['runbook']:<{label_width}} " + (f"{row['day']:<10} " if by_day else "")
+        line += f"{row['runs']:>5} {row['failure_rate'] * 100:>6.1f}%"
+        for name in columns:
+            line += f" {seconds(row[f'{name}_p50']) + ' / ' + seconds(row[f'{name}_p95']):>17}"
+        print(line)
+    print("\nTimes in seconds; fleet runs sum each phase across VMs.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize runbook run history (latency percentiles and failure rates)')
+    parser.add_argument('source', help='History JSONL file, or an http(s) URL such as an append blob SAS URL')
+    parser.add_argument('--runbook', help='Only this runbook')
+    parser.add_argument('--since', help='Only runs started on or after this date, e.g. 2024-06-01')
+    parser.add_argument('--by', choices=('runbook', 'day'), default='runbook', help='Grouping (default: runbook)')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args()
+
+    try:
+        records = load_records(args.source)
+    except (OSError, ValueError) as e:
+        print(f"Error: could not read run history from {args.source}: {e}")
+        sys.exit(1)
+    if args.runbook:
+        records = [record for record in records if record.get("runbook") == args.runbook]
+    if args.since:
+        records = [record for record in records if record.get("started_at", "") >= args.since]
+    if not records:
+        print("No matching runs")
+        return
+
+    rows = summarize(records, by_day=args.by == 'day')
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_summary(rows, args.by == 'day')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# Runbooks import runbook_framework from their own directory and automationassets from the
+# Automation sandbox; local_sim provides the stand-in and the stub endpoints
+RUNBOOK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [RUNBOOK_DIR, os.path.join(RUNBOOK_DIR, "local_sim")]
+
+import runbook_framework  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Start a stub server for a scenario and point runbook_framework's ARM calls at it."""
+    servers = []
+
+    def start(scenario="baseline", **overrides):
+        server = StubServer(scenario, **overrides).start()
+        servers.append(server)
+        monkeypatch.setattr(runbook_framework, "ARM_ENDPOINT", server.base_url)
+        return server
+
+    # Fast polling so the suite runs in seconds
+    monkeypatch.setattr(runbook_framework, "POLL_INITIAL_DELAY", 0.05)
+    monkeypatch.setattr(runbook_framework, "POLL_MAX_DELAY", 0.2)
+    yield start
+    runbook_framework.HTTP.close()
+    for server in servers:
+        server.stop()
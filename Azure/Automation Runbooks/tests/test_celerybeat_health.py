@@ -0,0 +1,81 @@
+"""celerybeat_automation_RB health mode: the probe script and how its report is judged."""
+
+import os
+import subprocess
+import time
+
+import pytest
+
+import celerybeat_automation_RB as rb
+import runbook_framework as rf
+
+
+@pytest.fixture
+def supervisor(tmp_path):
+    """A fake supervisorctl on PATH reporting the given state; returns a runner for the probe script."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+
+    def run_probe(state):
+        supervisorctl = bin_dir / "supervisorctl"
+        supervisorctl.write_text(f"#!/bin/sh\necho \"{rb.CELERYBEAT_PROGRAM}   {state}   pid 42\"\n")
+        supervisorctl.chmod(0o755)
+        env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+        return subprocess.run(["bash", "-c", rb.build_health_check_script()], env=env,
+                              capture_output=True, text=True, timeout=30).stdout
+
+    return run_probe
+
+
+def test_no_activity_signal_is_reported_not_healthy(supervisor, monkeypatch):
+    monkeypatch.setattr(rb, "CELERYBEAT_SCHEDULE_FILE", None)
+    monkeypatch.setattr(rb, "CELERYBEAT_LOG_FILE", None)
+    health = rb.parse_health_output(supervisor("RUNNING"))
+    assert health["no_signal"] == "no schedule file or log configured"
+    message, is_error = rb.format_health_report(health)
+    assert is_error and "unknown" in message
+
+
+def test_unreadable_signal_is_reported_not_healthy(supervisor, monkeypatch, tmp_path):
+    monkeypatch.setattr(rb, "CELERYBEAT_SCHEDULE_FILE", str(tmp_path / "missing-schedule*"))
+    monkeypatch.setattr(rb, "CELERYBEAT_LOG_FILE", str(tmp_path / "missing.log"))
+    health = rb.parse_health_output(supervisor("RUNNING"))
+    assert health["no_signal"] == "no readable schedule file or log ticks"
+    assert rb.format_health_report(health)[1]
+
+
+def test_fresh_schedule_file_is_healthy(supervisor, monkeypatch, tmp_path):
+    (tmp_path / "celerybeat-schedule").write_text("")
+    monkeypatch.setattr(rb, "CELERYBEAT_SCHEDULE_FILE", str(tmp_path / "celerybeat-schedule*"))
+    monkeypatch.setattr(rb, "CELERYBEAT_LOG_FILE", None)
+    assert rb.format_health_report(rb.parse_health_output(supervisor("RUNNING"))) == (None, False)
+
+
+def test_stale_schedule_file_is_stalled(supervisor, monkeypatch, tmp_path):
+    schedule = tmp_path / "celerybeat-schedule"
+    schedule.write_text("")
+    old = time.time() - rb.HEALTH_MAX_SCHEDULE_AGE - 60
+    os.utime(schedule, (old, old))
+    monkeypatch.setattr(rb, "CELERYBEAT_SCHEDULE_FILE", str(schedule))
+    monkeypatch.setattr(rb, "CELERYBEAT_LOG_FILE", None)
+    health = rb.parse_health_output(supervisor("RUNNING"))
+    assert health["stalled"] and health["restarted_state"] == "RUNNING"
+
+
+@pytest.mark.parametrize("stdout, ok", [
+    ("HEALTH state=RUNNING schedule_age=30 tick_age=40\nHEALTHY", True),
+    ("HEALTH state=RUNNING schedule_age=5400 tick_age=5520\nSTALLED no recent schedule writes or ticks\n"
+     "RESTARTED RUNNING", True),
+    ("HEALTH state=RUNNING schedule_age=5400 tick_age=5520\nSTALLED no recent schedule writes or ticks\n"
+     "RESTARTED FATAL", False),
+    ("HEALTH state=RUNNING schedule_age=-1 tick_age=-1\nNOSIGNAL no schedule file or log configured", False),
+    ("supervisorctl: command not found", False)
+], ids=["healthy", "restarted", "restart-failed", "no-signal", "no-report"])
+def test_fleet_health_judges_each_vm(stub, stdout, ok):
+    stub("baseline", command_seconds=0.1, tagged_vms=2, stdout=stdout)
+    remediation = rb.REMEDIATIONS["health"]
+    targets = [("stub-rg", "stub-vm1"), ("stub-rg", "stub-vm2")]
+    results = rf.run_fleet("stub-token", "sub", targets, remediation.build_script(), remediation.judge)
+    assert [result["ok"] for result in results] == [ok, ok]
+    summary, has_failures = rf.format_fleet_summary(results, remediation.description)
+    assert has_failures is not ok
@@ -0,0 +1,30 @@
+"""Fleet target resolution: tag lookups and explicit VM lists."""
+
+import urllib.parse
+
+import runbook_framework as rf
+
+
+def test_tag_lookup_returns_tagged_vms(stub):
+    stub("baseline", tagged_vms=2)
+    assert rf.list_vms_by_tag("stub-token", "sub", "role=web") == [("stub-rg", "stub-vm1"), ("stub-rg", "stub-vm2")]
+
+
+def test_tag_filter_escapes_single_quotes(monkeypatch):
+    urls = []
+
+    def get_json(url, headers=None):
+        urls.append(url)
+        return 200, {}, {"value": []}
+
+    monkeypatch.setattr(rf.HTTP, "get_json", get_json)
+    rf.list_vms_by_tag("token", "sub", "owner's team = ops' or 1 eq 1")
+
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(urls[0]).query)
+    assert query["$filter"] == ["tagName eq 'owner''s team' and tagValue eq 'ops'' or 1 eq 1'"]
+
+
+def test_explicit_vm_names_default_the_resource_group():
+    assert rf.resolve_fleet("token", "sub", "default-rg", vm_names="vm1, other-rg/vm2,") == [
+        ("default-rg", "vm1"), ("other-rg", "vm2")
+    ]
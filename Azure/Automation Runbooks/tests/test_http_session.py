@@ -0,0 +1,64 @@
+"""HttpSession retries after a reused keep-alive connection drops."""
+
+import http.client
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import runbook_framework as rf
+
+
+class DropSecondRequestHandler(BaseHTTPRequestHandler):
+    """Answers the first request on a connection, then drops the connection on the second."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.handled = getattr(self, "handled", 0) + 1
+        with self.server.lock:
+            self.server.received.append(self.command)
+        if self.handled > 1:
+            self.close_connection = True
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    do_GET = do_POST = _handle
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DropSecondRequestHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.received = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_is_retried_on_fresh_connection(server):
+    session = rf.HttpSession()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    session.request("GET", url)
+    assert session.request("GET", url).status == 200
+    assert server.received == ["GET", "GET", "GET"]
+    session.close()
+
+
+def test_post_is_not_resent_after_it_was_sent(server):
+    session = rf.HttpSession()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    session.request("GET", url)
+    with pytest.raises(http.client.RemoteDisconnected):
+        session.post_json(url, {"commandId": "RunShellScript"})
+    assert server.received == ["GET", "POST"]
+    session.close()
@@ -0,0 +1,70 @@
+"""Run Command invoke, 202 polling and result parsing against local_sim's stub ARM endpoints."""
+
+import time
+
+import pytest
+
+import runbook_framework as rf
+
+
+def run(script="echo hello"):
+    return rf.invoke_run_command("stub-token", "sub", "stub-rg", "stub-vm", script)
+
+
+def test_parse_linux_message_sections():
+    result = rf.parse_run_command_result({"value": [{
+        "code": "ProvisioningState/succeeded",
+        "message": "Enable succeeded: \n[stdout]\nline 1\nline 2\n\n[stderr]\nwarning: x\n"
+    }]}, time.monotonic())
+    assert result["stdout"] == "line 1\nline 2"
+    assert result["stderr"] == "warning: x"
+
+
+def test_parse_windows_items():
+    result = rf.parse_run_command_result({"value": [
+        {"code": "ComponentStatus/StdOut/succeeded", "message": "out"},
+        {"code": "ComponentStatus/StdErr/succeeded", "message": "err"}
+    ]}, time.monotonic())
+    assert (result["stdout"], result["stderr"]) == ("out", "err")
+
+
+def test_polls_azure_async_operation(stub):
+    server = stub("baseline", command_seconds=0.3, stdout="RUNNING", stderr="deprecated flag")
+    result = run()
+    assert (result["stdout"], result["stderr"]) == ("RUNNING", "deprecated flag")
+    assert server.requests["GET operations"] >= 2
+    assert server.operations[1]["script"] == "echo hello"
+
+
+def test_polls_location_when_no_async_operation_header(stub):
+    server = stub("location_only", command_seconds=0.3, stdout="via location")
+    assert run()["stdout"] == "via location"
+    assert server.requests["GET operations"] >= 2
+
+
+def test_honours_retry_after(stub):
+    server = stub("baseline", command_seconds=0.5, retry_after="1")
+    started = time.monotonic()
+    run()
+    # Without Retry-After the 0.05s backoff would poll several times before 0.5s
+    assert time.monotonic() - started >= 1
+    assert server.requests["GET operations"] == 1
+
+
+def test_retries_transient_poll_errors(stub):
+    server = stub("baseline", command_seconds=0.3, arm_error_rate=0.5, stdout="ok")
+    assert run()["stdout"] == "ok"
+    assert server.requests["GET operations"] >= 2
+
+
+def test_failed_operation_raises(stub):
+    stub("command_failed", command_seconds=0.1)
+    with pytest.raises(Exception, match="Run Command Failed: VM has reported a failure"):
+        run()
+
+
+def test_timeout(stub, monkeypatch):
+    monkeypatch.setattr(rf, "RUN_COMMAND_TIMEOUT", 0.5)
+    stub("baseline", command_seconds=30)
+    with pytest.raises(Exception, match="did not finish within"):
+        run()
@@ -0,0 +1,44 @@
+"""Managed identity endpoint probing order."""
+
+import time
+
+import pytest
+
+import runbook_framework as rf
+
+CANDIDATES = [("IDENTITY_ENDPOINT", "", "", {}), ("MSI_ENDPOINT", "", "", {}), ("IMDS 2019-08-01", "", "", {})]
+
+
+def fake_request_token(outcomes):
+    """request_token stand-in: outcomes maps endpoint name -> (delay, token or exception)."""
+    def request_token(candidate, timeout):
+        delay, outcome = outcomes[candidate[0]]
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome, 0
+    return request_token
+
+
+def test_fast_imds_does_not_beat_identity_endpoint(monkeypatch):
+    monkeypatch.setattr(rf, "request_token", fake_request_token({
+        "IDENTITY_ENDPOINT": (0.3, "identity"), "MSI_ENDPOINT": (0.3, "msi"), "IMDS 2019-08-01": (0, "imds")
+    }))
+    assert rf.probe_token_endpoints(CANDIDATES)[:2] == ("IDENTITY_ENDPOINT", "identity")
+
+
+def test_lower_priority_used_after_higher_ones_fail(monkeypatch):
+    monkeypatch.setattr(rf, "request_token", fake_request_token({
+        "IDENTITY_ENDPOINT": (0.2, TimeoutError("timed out")), "MSI_ENDPOINT": (0, OSError("refused")),
+        "IMDS 2019-08-01": (0, "imds")
+    }))
+    assert rf.probe_token_endpoints(CANDIDATES)[:2] == ("IMDS 2019-08-01", "imds")
+
+
+def test_all_failures_reported_in_priority_order(monkeypatch):
+    monkeypatch.setattr(rf, "request_token", fake_request_token({
+        name: (0.1 * (3 - position), OSError(f"{name} down")) for position, (name, *_) in enumerate(CANDIDATES)
+    }))
+    with pytest.raises(Exception) as error:
+        rf.probe_token_endpoints(CANDIDATES)
+    assert [line.split(":")[0] for line in str(error.value).splitlines()] == [name for name, *_ in CANDIDATES]
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Azure VM/VMSS Inventory Collector
+Collects the same VM and VMSS inventory as update_gsheet_azure_vm_vmss_inventory.sh, but with a
+handful of concurrent Azure Resource Graph queries instead of one `az` call per resource.
+Rows are fed straight into an InventoryIndex, so the Sheets updater can sync without a CSV round trip.
+
+Offline usage: point --fixtures at a directory of recorded Resource Graph responses
+(subscriptions.json, vms.json, vmss.json, autoscale.json) to replay them without Azure access.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Iterator, List, Optional
+
+from change_journal import DEFAULT_JOURNAL_FILE, ChangeJournal
+from inventory_index import InventoryIndex
+from orphan_policy import ORPHAN_POLICY_MODES, OrphanPolicy
+from sheet_mirror import DEFAULT_MIRROR_FILE, SheetMirror
+
+RESOURCE_GRAPH_URL = "https://management.azure.com/providers/Microsoft.ResourceGraph/resources?api-version=2022-10-01"
+MANAGEMENT_RESOURCE = "https://management.azure.com/"
+PAGE_SIZE = 1000  # Resource Graph maximum page size
+MAX_RETRIES = 3
+
+# Same column layout as the shell script's CSV output
+CSV_HEADER = [
+    'ResourceType', 'Name', 'ResourceGroup', 'Subscription', 'Location', 'SKU', 'Capacity',
+    'PowerState', 'OsType', 'AutoscaleEnabled', 'AutoscaleMinCapacity', 'AutoscaleMaxCapacity',
+    'AutoscaleDefaultCapacity'
+]
+
+QUERIES = {
+    'subscriptions': '''
+    ResourceContainers
+    | where type =~ "microsoft.resources/subscriptions"
+    | project subscriptionId, name, state = tostring(properties.state)
+    ''',
+    'vms': '''
+    Resources
+    | where type =~ "Microsoft.Compute/virtualMachines"
+    | extend powerState = properties.extended.instanceView.statuses[1].displayStatus
+    | extend osType = case(
+        properties.storageProfile.osDisk.osType == "Windows", "Windows",
+        properties.storageProfile.osDisk.osType == "Linux", "Linux",
+        "Unknown"
+    )
+    | project
+        name,
+        resourceGroup,
+        location,
+        vmSize = tostring(properties.hardwareProfile.vmSize),
+        powerState = coalesce(tostring(powerState), "Unknown"),
+        osType,
+        subscriptionId
+    ''',
+    'vmss': '''
+    Resources
+    | where type =~ "Microsoft.Compute/virtualMachineScaleSets"
+    | project
+        id = tolower(id),
+        name,
+        resourceGroup,
+        location,
+        capacity = sku.capacity,
+        vmSize = tostring(sku.name),
+        provisioningState = tostring(properties.provisioningState),
+        subscriptionId
+    ''',
+    'autoscale': '''
+    Resources
+    | where type =~ "microsoft.insights/autoscalesettings"
+    | project
+        targetResourceUri = tolower(tostring(properties.targetResourceUri)),
+        enabled = properties.enabled,
+        capacity = properties.profiles[0].capacity
+    '''
+}
+
+
+class ResourceGraphHttpTransport:
+    """Posts Resource Graph queries over HTTPS with a single bearer token."""
+
+    def __init__(self, access_token: str, timeout: int = 60):
+        self.access_token = access_token
+        self.timeout = timeout
+
+    def _post(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        for attempt in range(1, MAX_RETRIES + 1):
+            request = urllib.request.Request(RESOURCE_GRAPH_URL, data=json.dumps(body).encode('utf-8'), method='POST')
+            request.add_header("Authorization", f"Bearer {self.access_token}")
+            request.add_header("Content-Type", "application/json")
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return json.loads(response.read().decode('utf-8'))
+            except urllib.error.HTTPError as e:
+                # Resource Graph throttles per tenant; honour its reset hint before retrying
+                if e.code == 429 and attempt < MAX_RETRIES:
+                    reset = e.headers.get('x-ms-user-quota-resets-after') or e.headers.get('Retry-After') or '5'
+                    time.sleep(_parse_wait_seconds(reset))
+                    continue
+                raise Exception(f"Resource Graph query failed: {e.code} {e.read().decode('utf-8', 'replace')}")
+        raise Exception("Resource Graph query failed: retries exhausted")
+
+    async def query(self, name: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._post, body)
+
+
+class FixtureTransport:
+    """Replays recorded Resource Graph responses from <fixture_dir>/<query name>.json.
+
+    A fixture file holds either one response or a list of pages; pages are
+    returned in order as the collector follows $skipToken.
+    """
+
+    def __init__(self, fixture_dir: str):
+        self.fixture_dir = fixture_dir
+        self.calls: List[Dict[str, Any]] = []
+        self._pages: Dict[str, List[Dict[str, Any]]] = {}
+
+    def _load(self, name: str) -> List[Dict[str, Any]]:
+        if name not in self._pages:
+            path = os.path.join(self.fixture_dir, f"{name}.json")
+            if not os.path.exists(path):
+                self._pages[name] = [{'data': []}]
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    recorded = json.load(f)
+                self._pages[name] = recorded if isinstance(recorded, list) else [recorded]
+        return self._pages[name]
+
+    async def query(self, name: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls.append({'name': name, 'body': body})
+        pages = self._load(name)
+        skip_token = body.get('options', {}).get('$skipToken')
+        page_index = int(skip_token) if skip_token else 0
+        page = dict(pages[page_index])
+        if page_index + 1 < len(pages):
+            page['$skipToken'] = str(page_index + 1)
+        return page
+
+
+def _parse_wait_seconds(value: str) -> float:
+    """Parse a Retry-After value given as seconds or as an hh:mm:ss quota reset."""
+    try:
+        if ':' in value:
+            hours, minutes, seconds = (float(part) for part in value.split(':'))
+            return hours * 3600 + minutes * 60 + seconds
+        return float(value)
+    except ValueError:
+        return 5.0
+
+
+def get_cli_access_token() -> str:
+    """Get one ARM access token from the Azure CLI login (or AZURE_ACCESS_TOKEN)."""
+    token = os.environ.get('AZURE_ACCESS_TOKEN')
+    if token:
+        return token
+    result = subprocess.run(
+        ['az', 'account', 'get-access-token', '--resource', MANAGEMENT_RESOURCE, '--query', 'accessToken', '-o', 'tsv'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise Exception(f"Could not get Azure access token (run 'az login'): {result.stderr.strip()}")
+    return result.stdout.strip()
+
+
+async def run_query(transport, name: str, subscriptions: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Run one Resource Graph query and follow $skipToken until every page is read."""
+    body: Dict[str, Any] = {
+        'query': QUERIES[name],
+        'options': {'resultFormat': 'objectArray', '$top': PAGE_SIZE}
+    }
+    if subscriptions:
+        body['subscriptions'] = subscriptions
+
+    records: List[Dict[str, Any]] = []
+    while True:
+        page = await transport.query(name, body)
+        records.extend(page.get('data', []))
+        skip_token = page.get('$skipToken')
+        if not skip_token:
+            return records
+        body = dict(body, options=dict(body['options'], **{'$skipToken': skip_token}))
+
+
+def _text(value: Any, default: str = '') -> str:
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def build_rows(subscriptions: List[Dict[str, Any]], vms: List[Dict[str, Any]],
+               vmss: List[Dict[str, Any]], autoscale: List[Dict[str, Any]]) -> Iterator[List[str]]:
+    """Turn Resource Graph records into CSV-shaped rows (VMs first, then VMSS, like the shell script)."""
+    subscription_names = {
+        sub['subscriptionId']: sub.get('name', sub['subscriptionId'])
+        for sub in subscriptions
+        if sub.get('state', 'Enabled') == 'Enabled'
+    }
+    autoscale_by_target = {setting.get('targetResourceUri'): setting for setting in autoscale}
+
+    for vm in vms:
+        subscription = subscription_names.get(vm.get('subscriptionId'))
+        if subscription is None:
+            continue
+        yield ['VM', _text(vm.get('name')), _text(vm.get('resourceGroup')), subscription,
+               _text(vm.get('location')), _text(vm.get('vmSize')), '', _text(vm.get('powerState'), 'Unknown'),
+               _text(vm.get('osType')), 'N/A', 'N/A', 'N/A', 'N/A']
+
+    for scale_set in vmss:
+        subscription = subscription_names.get(scale_set.get('subscriptionId'))
+        if subscription is None:
+            continue
+        setting = autoscale_by_target.get(scale_set.get('id'))
+        if setting:
+            capacity = setting.get('capacity') or {}
+            autoscale_fields = [_text(setting.get('enabled'), 'false'), _text(capacity.get('minimum'), 'N/A'),
+                                _text(capacity.get('maximum'), 'N/A'), _text(capacity.get('default'), 'N/A')]
+        else:
+            autoscale_fields = ['false', 'N/A', 'N/A', 'N/A']
+        yield ['VMSS', _text(scale_set.get('name')), _text(scale_set.get('resourceGroup')), subscription,
+               _text(scale_set.get('location')), _text(scale_set.get('vmSize')), _text(scale_set.get('capacity')),
+               _text(scale_set.get('provisioningState')), ''] + autoscale_fields
+
+
+async def collect_rows(transport, subscriptions: Optional[List[str]] = None) -> List[List[str]]:
+    """Issue all inventory queries concurrently and return CSV-shaped rows."""
+    results = await asyncio.gather(*(run_query(transport, name, subscriptions) for name in QUERIES))
+    collected = dict(zip(QUERIES, results))
+    return list(build_rows(collected['subscriptions'], collected['vms'], collected['vmss'], collected['autoscale']))
+
+
+def write_csv(rows: List[List[str]], output_file: str) -> None:
+    """Write rows with the shell script's header ('-' for stdout)."""
+    if output_file == '-':
+        writer = csv.writer(sys.stdout)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(rows)
+        return
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Collect Azure VM/VMSS inventory with concurrent Resource Graph queries'
+    )
+    parser.add_argument('--spreadsheet-id', '-g', help='Sync the collected inventory into this Google Sheet')
+    parser.add_argument('--sheet-name', '-s', default='Azure Inventory',
+                       help='Name of the sheet to update (default: Azure Inventory)')
+    parser.add_argument('--output-csv', '-f', help="Also write the inventory to a CSV file ('-' for stdout)")
+    parser.add_argument('--subscription', action='append', dest='subscriptions',
+                       help='Limit collection to a subscription ID (repeatable; default: all accessible)')
+    parser.add_argument('--fixtures', help='Replay recorded Resource Graph responses from this directory')
+    parser.add_argument('--service-account', default='service-account-key.json',
+                       help='Path to service account JSON file (default: service-account-key.json)')
+    parser.add_argument('--orphan-policy', choices=ORPHAN_POLICY_MODES, default='flag',
+                       help='Orphan policy for the sheet sync (default: flag)')
+    parser.add_argument('--journal-file', default=DEFAULT_JOURNAL_FILE,
+                       help=f'SQLite change journal for the sheet sync (default: {DEFAULT_JOURNAL_FILE})')
+    parser.add_argument('--no-journal', action='store_true',
+                       help='Do not record changes in the change journal')
+    parser.add_argument('--mirror-file', default=DEFAULT_MIRROR_FILE,
+                       help=f'Local SQLite mirror of the synced tab (default: {DEFAULT_MIRROR_FILE})')
+    parser.add_argument('--no-mirror', action='store_true',
+                       help='Do not maintain the local mirror')
+
+    args = parser.parse_args()
+
+    if not args.spreadsheet_id and not args.output_csv:
+        parser.error("Nothing to do: pass --spreadsheet-id and/or --output-csv")
+
+    try:
+        transport = FixtureTransport(args.fixtures) if args.fixtures else ResourceGraphHttpTransport(get_cli_access_token())
+        started = time.monotonic()
+        rows = asyncio.run(collect_rows(transport, args.subscriptions))
+        print(f"Collected {len(rows)} resources in {time.monotonic() - started:.2f}s", file=sys.stderr)
+    except Exception as e:
+        print(f"Error collecting inventory: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output_csv:
+        write_csv(rows, args.output_csv)
+
+    if args.spreadsheet_id:
+        from update_gsheet_service_account import GoogleSheetsServiceAccountUpdater
+
+        updater = GoogleSheetsServiceAccountUpdater(service_account_file=args.service_account)
+        if not updater.authenticate():
+            print("Authentication failed. Please check service account setup.")
+            sys.exit(1)
+        inventory = InventoryIndex.from_rows(CSV_HEADER, rows)
+        journal = None
+        if not args.no_journal:
+            try:
+                journal = ChangeJournal(args.journal_file)
+            except sqlite3.Error as e:
+                print(f"Warning: change journal '{args.journal_file}' unavailable ({e}); continuing without it")
+        mirror = None
+        if not args.no_mirror:
+            try:
+                mirror = SheetMirror(args.mirror_file)
+            except sqlite3.Error as e:
+                print(f"Warning: local mirror '{args.mirror_file}' unavailable ({e}); continuing without it")
+        try:
+            success = updater.update_sheet_selective(
+                args.spreadsheet_id, args.sheet_name, inventory=inventory,
+                orphan_policy=OrphanPolicy(mode=args.orphan_policy), journal=journal, mirror=mirror
+            )
+        finally:
+            for store in (journal, mirror):
+                if store is not None:
+                    store.close()
+        sys.exit(0 if success else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Google Sheets Client Startup Benchmark
+Measures cold-start time of the service account updater, from interpreter start to a ready
+`spreadsheets().values()` resource, in fresh subprocesses:
+  - baseline: build('sheets', 'v4') from the full bundled discovery document
+  - cached:   GoogleSheetsServiceAccountUpdater.authenticate() with a warm discovery and token cache
+A throwaway service account key and a pre-seeded token are generated, so no network access is needed.
+The baseline excludes the OAuth token exchange (it needs Google), so real-world savings are larger.
+
+Example:
+    python3 benchmark_startup.py --runs 7
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BASELINE_SCRIPT = """
+import sys
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+credentials = service_account.Credentials.from_service_account_file(sys.argv[1], scopes=['https://www.googleapis.com/auth/spreadsheets'])
+service = build('sheets', 'v4', credentials=credentials, static_discovery=True, cache_discovery=False)
+service.spreadsheets().values()
+"""
+
+CACHED_SCRIPT = """
+import logging, sys
+logging.disable(logging.CRITICAL)
+from update_gsheet_service_account import GoogleSheetsServiceAccountUpdater
+updater = GoogleSheetsServiceAccountUpdater(sys.argv[1])
+if not updater.authenticate():
+    sys.exit(1)
+updater.service.spreadsheets().values()
+"""
+
+
+def write_fake_service_account(path: str) -> str:
+    """Write a service account key with a freshly generated RSA key; returns its client email."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode('utf-8')
+    client_email = 'benchmark@example-project.iam.gserviceaccount.com'
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'type': 'service_account',
+            'project_id': 'example-project',
+            'private_key_id': 'benchmark',
+            'private_key': pem,
+            'client_email': client_email,
+            'client_id': '0',
+            'token_uri': 'https://oauth2.googleapis.com/token'
+        }, f)
+    return client_email
+
+
+def seed_token_cache(key_file: str, cache_dir: str) -> None:
+    """Store a fake, unexpired access token so authenticate() takes the cached path."""
+    from sheets_client import _token_cache_file, _write_private_file, format_expiry
+    from update_gsheet_service_account import SCOPES
+
+    with open(key_file, 'r', encoding='utf-8') as f:
+        client_email = json.load(f)['client_email']
+    expiry = datetime.now(timezone.utc) + timedelta(hours=1)
+    _write_private_file(_token_cache_file(client_email, SCOPES, cache_dir), json.dumps({
+        'token': 'benchmark-token',
+        'expiry': format_expiry(expiry)
+    }))
+
+
+def time_script(script: str, key_file: str, env: dict) -> float:
+    """Run a script in a fresh interpreter and return its wall time in seconds."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', script, key_file], cwd=SCRIPT_DIR, env=env, check=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Google Sheets client cold start')
+    parser.add_argument('--runs', type=int, default=5, help='Subprocess runs per variant (default: 5)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, SCRIPT_DIR)
+    with tempfile.TemporaryDirectory() as workdir:
+        key_file = os.path.join(workdir, 'service-account-key.json')
+        cache_dir = os.path.join(workdir, 'cache')
+        write_fake_service_account(key_file)
+        env = dict(os.environ, GSHEET_CACHE_DIR=cache_dir)
+        os.environ['GSHEET_CACHE_DIR'] = cache_dir
+        seed_token_cache(key_file, cache_dir)
+
+        # Warm-up run populates the trimmed discovery cache
+        time_script(CACHED_SCRIPT, key_file, env)
+
+        results = {}
+        for name, script in (('baseline', BASELINE_SCRIPT), ('cached', CACHED_SCRIPT)):
+            results[name] = [time_script(script, key_file, env) for _ in range(args.runs)]
+
+    print(f"{'Variant':<10} {'Median (s)':>11} {'Min (s)':>9} {'Max (s)':>9}")
+    print("-" * 42)
+    for name, times in results.items():
+        print(f"{name:<10} {statistics.median(times):>11.3f} {min(times):>9.3f} {max(times):>9.3f}")
+    speedup = statistics.median(results['baseline']) / statistics.median(results['cached'])
+    print(f"\nSpeedup: {speedup:.1f}x (baseline excludes the OAuth token exchange)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Google Sheets Sync Benchmark
+Runs the sync strategies against the offline Sheets emulator (sheets_emulator.py) with generated
+inventories and reports API call counts, bytes sent and wall time per strategy. No Google or Azure
+access is needed.
+
+Examples:
+    python3 benchmark_sync.py
+    python3 benchmark_sync.py --sizes 1000,10000 --latency 0.05 --strategies selective,full
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from sheets_emulator import FAKE_SPREADSHEET_ID, FakeSheetsService
+
+SHEET_NAME = 'Azure Inventory'
+CSV_HEADER = [
+    'ResourceType', 'Name', 'ResourceGroup', 'Subscription', 'Location', 'SKU', 'Capacity',
+    'PowerState', 'OsType', 'AutoscaleEnabled', 'AutoscaleMinCapacity', 'AutoscaleMaxCapacity',
+    'AutoscaleDefaultCapacity'
+]
+SHEET_HEADER = ['Group', 'Resource Type', 'Subscription', 'SKU', 'current', 'min', 'max', 'Notes']
+SKUS = ['Standard_B2s', 'Standard_D2s_v3', 'Standard_D4s_v3', 'Standard_E8s_v5']
+SUBSCRIPTIONS = ['Production', 'Staging', 'Development', 'Shared Services']
+
+
+def generate_inventory(csv_file: str, rows: int, seed: int = 42) -> List[List[str]]:
+    """Write a synthetic VM/VMSS inventory CSV and return its data rows."""
+    rng = random.Random(seed)
+    data = []
+    for i in range(rows):
+        subscription = rng.choice(SUBSCRIPTIONS)
+        sku = rng.choice(SKUS)
+        if rng.random() < 0.3:
+            minimum = rng.randint(1, 5)
+            maximum = minimum + rng.randint(0, 20)
+            current = rng.randint(minimum, maximum)
+            data.append(['VMSS', f"vmss-{i:06d}", f"rg-{i % 50}", subscription, 'eastus', sku, str(current),
+                         'Succeeded', '', 'true', str(minimum), str(maximum), str(current)])
+        else:
+            data.append(['VM', f"vm-{i:06d}", f"rg-{i % 50}", subscription, 'eastus', sku, '',
+                         'VM running', 'Linux', 'N/A', 'N/A', 'N/A', 'N/A'])
+    with open(csv_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(data)
+    return data
+
+
+def generate_sheet(inventory: List[List[str]], change_rate: float, new_rate: float,
+                   orphan_rate: float, seed: int = 7) -> List[List[str]]:
+    """Build sheet rows that mostly match the inventory, with some drift, gaps and orphans."""
+    rng = random.Random(seed)
+    rows = [SHEET_HEADER]
+    for row in inventory:
+        if rng.random() < new_rate:
+            continue  # resource is new to the sheet
+        resource_type, name, subscription, sku = row[0], row[1], row[3], row[5]
+        current, minimum, maximum = (row[12], row[10], row[11]) if resource_type == 'VMSS' else ('', '', '')
+        if rng.random() < change_rate:
+            sku = rng.choice(SKUS)
+            if resource_type == 'VMSS':
+                maximum = str(int(maximum) + 1)
+        rows.append([name, resource_type, subscription, sku, current, minimum, maximum, 'owner: sre'])
+    for i in range(int(len(inventory) * orphan_rate)):
+        rows.append([f"retired-{i:06d}", 'VM', rng.choice(SUBSCRIPTIONS), rng.choice(SKUS), '', '', '', ''])
+    return rows
+
+
+def _quiet():
+    """Silence updater logging and stdout chatter so they don't dominate the timings."""
+    logging.getLogger().setLevel(logging.ERROR)
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def run_selective(service: FakeSheetsService, csv_file: str, workdir: str) -> bool:
+    """update_gsheet_service_account.py selective sync with unattended orphan deletion."""
+    from orphan_policy import OrphanPolicy
+    from update_gsheet_service_account import GoogleSheetsServiceAccountUpdater
+
+    updater = GoogleSheetsServiceAccountUpdater()
+    updater.service = service
+    policy = OrphanPolicy(mode='delete', state_file=os.path.join(workdir, 'orphan_state.json'))
+    with _quiet():
+        return updater.update_sheet_selective(FAKE_SPREADSHEET_ID, SHEET_NAME, csv_file, orphan_policy=policy)
+
+
+def run_full(service: FakeSheetsService, csv_file: str, workdir: str, max_workers: int = 1) -> bool:
+    """update_gsheet.py clear-and-replace upload."""
+    from update_gsheet import GoogleSheetsUpdater
+
+    updater = GoogleSheetsUpdater()
+    updater.service = service
+    with _quiet():
+        return updater.update_sheet(FAKE_SPREADSHEET_ID, SHEET_NAME, csv_file, max_workers=max_workers)
+
+
+def run_full_parallel(service: FakeSheetsService, csv_file: str, workdir: str) -> bool:
+    """update_gsheet.py upload with the default parallel chunking."""
+    from update_gsheet import DEFAULT_UPLOAD_WORKERS
+    return run_full(service, csv_file, workdir, max_workers=DEFAULT_UPLOAD_WORKERS)
+
+
+def run_debug_read(service: FakeSheetsService, csv_file: str, workdir: str) -> bool:
+    """debug_column_mapping.py sheet read."""
+    from debug_column_mapping import read_gsheet_debug
+    with _quiet():
+        header, _ = read_gsheet_debug(FAKE_SPREADSHEET_ID, SHEET_NAME, service=service)
+    return header is not None
+
+
+STRATEGIES: Dict[str, Callable[[FakeSheetsService, str, str], bool]] = {
+    'selective': run_selective,
+    'full': run_full,
+    'full-parallel': run_full_parallel,
+    'debug-read': run_debug_read
+}
+
+
+def benchmark(sizes: List[int], strategies: List[str], latency: float, change_rate: float,
+              new_rate: float, orphan_rate: float) -> List[Dict[str, Any]]:
+    """Run every strategy for every inventory size and return one result dict per run."""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            csv_file = os.path.join(workdir, f"inventory_{size}.csv")
+            inventory = generate_inventory(csv_file, size)
+            sheet_rows = generate_sheet(inventory, change_rate, new_rate, orphan_rate)
+            for strategy in strategies:
+                service = FakeSheetsService({SHEET_NAME: sheet_rows}, latency=latency)
+                started = time.perf_counter()
+                success = STRATEGIES[strategy](service, csv_file, workdir)
+                wall_time = time.perf_counter() - started
+                summary = service.summary()
+                results.append({
+                    'strategy': strategy,
+                    'rows': size,
+                    'success': success,
+                    'api_calls': summary['calls'],
+                    'per_method': summary['per_method'],
+                    'bytes_sent': summary['bytes_sent'],
+                    'bytes_received': summary['bytes_received'],
+                    'wall_time': round(wall_time, 4)
+                })
+    return results
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'Strategy':<15} {'Rows':>8} {'OK':>3} {'API calls':>10} {'Sent (KB)':>11} {'Recv (KB)':>11} {'Wall (s)':>9}")
+    print("-" * 72)
+    for result in results:
+        print(f"{result['strategy']:<15} {result['rows']:>8} {'✓' if result['success'] else '✗':>3} "
+              f"{result['api_calls']:>10} {result['bytes_sent'] / 1024:>11.1f} "
+              f"{result['bytes_received'] / 1024:>11.1f} {result['wall_time']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Google Sheets sync strategies offline')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                       help='Comma-separated inventory sizes (default: 1000,10000,100000)')
+    parser.add_argument('--strategies', default=','.join(STRATEGIES),
+                       help=f"Comma-separated strategies (default: {','.join(STRATEGIES)})")
+    parser.add_argument('--latency', type=float, default=0.0,
+                       help='Emulated seconds per API request (default: 0)')
+    parser.add_argument('--change-rate', type=float, default=0.05,
+                       help='Fraction of sheet rows that differ from Azure (default: 0.05)')
+    parser.add_argument('--new-rate', type=float, default=0.01,
+                       help='Fraction of Azure resources missing from the sheet (default: 0.01)')
+    parser.add_argument('--orphan-rate', type=float, default=0.01,
+                       help='Orphaned sheet rows as a fraction of the inventory (default: 0.01)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    args = parser.parse_args()
+
+    strategies = [name.strip() for name in args.strategies.split(',') if name.strip()]
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        parser.error(f"Unknown strategies: {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+
+    results = benchmark(sizes, strategies, args.latency, args.change_rate, args.new_rate, args.orphan_rate)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+    sys.exit(0 if all(result['success'] for result in results) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Inventory Change Journal
+Append-only SQLite log of every change a selective sync writes to the Google Sheet
+(field updates, added resources, deleted orphans), indexed by resource and time so SKU and
+capacity history can be queried without scraping logs or old sheet revisions.
+
+Examples:
+    python3 change_journal.py history --resource vmss-web-prod
+    python3 change_journal.py history --field "Max Capacity" --since 2024-01-01
+    python3 change_journal.py prune --keep-days 365
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from orphan_policy import STATE_DIR
+
+# Next to the scripts (or in $GSHEET_STATE_DIR) so cron/CI runs from any directory share it
+DEFAULT_JOURNAL_FILE = os.path.join(STATE_DIR, 'inventory_changes.db')
+JOURNAL_ACTIONS = ('updated', 'added', 'deleted')
+
+# action: one of JOURNAL_ACTIONS; field is the change-log label ('' for added/deleted rows)
+JournalEntry = namedtuple('JournalEntry', ['action', 'resource', 'field', 'old_value', 'new_value'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY,
+    synced_at TEXT NOT NULL,
+    spreadsheet_id TEXT NOT NULL,
+    sheet TEXT NOT NULL,
+    action TEXT NOT NULL,
+    resource TEXT NOT NULL,
+    resource_key TEXT NOT NULL,
+    field TEXT NOT NULL DEFAULT '',
+    old_value TEXT NOT NULL DEFAULT '',
+    new_value TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_changes_resource ON changes (resource_key, synced_at);
+CREATE INDEX IF NOT EXISTS idx_changes_synced_at ON changes (synced_at);
+"""
+
+
+class ChangeJournal:
+    """SQLite-backed change journal. Rows are only ever inserted (and pruned by age)."""
+
+    def __init__(self, journal_file: str = DEFAULT_JOURNAL_FILE):
+        self.journal_file = journal_file
+        self.connection = sqlite3.connect(journal_file)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def record(self, spreadsheet_id: str, sheet_name: str, entries: Iterable[JournalEntry],
+               synced_at: Optional[str] = None) -> int:
+        """Append one sync's change set in a single transaction; returns the number of rows written."""
+        synced_at = synced_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            (synced_at, spreadsheet_id, sheet_name, entry.action, entry.resource, entry.resource.lower(),
+             entry.field or '', entry.old_value or '', entry.new_value or '')
+            for entry in entries
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO changes (synced_at, spreadsheet_id, sheet, action, resource, resource_key, "
+                "field, old_value, new_value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def history(self, resource: Optional[str] = None, field: Optional[str] = None,
+                since: Optional[str] = None, until: Optional[str] = None,
+                action: Optional[str] = None, limit: Optional[int] = None) -> List[sqlite3.Row]:
+        """Return journal rows, oldest first. Resource matching is case-insensitive."""
+        conditions, params = [], []
+        if resource:
+            conditions.append("resource_key = ?")
+            params.append(resource.lower())
+        if field:
+            conditions.append("field = ?")
+            params.append(field)
+        if since:
+            conditions.append("synced_at >= ?")
+            params.append(since)
+        if until:
+            conditions.append("synced_at < ?")
+            params.append(until)
+        if action:
+            conditions.append("action = ?")
+            params.append(action)
+        query = "SELECT id, synced_at, spreadsheet_id, sheet, action, resource, field, old_value, new_value FROM changes"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if limit:
+            # Most recent `limit` rows, still returned oldest first
+            query = f"SELECT * FROM ({query} ORDER BY synced_at DESC, id DESC LIMIT ?) ORDER BY synced_at, id"
+            params.append(limit)
+        else:
+            query += " ORDER BY synced_at, id"
+        self.connection.row_factory = sqlite3.Row
+        try:
+            return self.connection.execute(query, params).fetchall()
+        finally:
+            self.connection.row_factory = None
+
+    def prune(self, keep_days: int) -> int:
+        """Delete entries older than keep_days; returns the number of rows removed."""
+        cutoff = (datetime.now() - timedelta(days=keep_days)).strftime("%Y-%m-%d %H:%M:%S")
+        with self.connection:
+            removed = self.connection.execute("DELETE FROM changes WHERE synced_at < ?", (cutoff,)).rowcount
+        self.connection.execute("VACUUM")
+        return removed
+
+
+def format_entry(row: sqlite3.Row) -> str:
+    """One history line, in the same wording as the sync's change log."""
+    if row['action'] == 'updated':
+        detail = f"{row['field']}: '{row['old_value']}' → '{row['new_value']}'"
+    elif row['action'] == 'added':
+        field, value = row['field'], row['new_value']
+        detail = f"added ({field}: '{value}')" if field else "added"
+    else:
+        detail = "deleted (orphaned)"
+    return f"{row['synced_at']}  {row['sheet']}  {row['resource']} -> {detail}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the inventory sync change journal')
+    parser.add_argument('--journal-file', default=DEFAULT_JOURNAL_FILE,
+                       help=f'Journal database (default: {DEFAULT_JOURNAL_FILE})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    history_parser = subparsers.add_parser('history', help='Show recorded changes')
+    history_parser.add_argument('--resource', '-r', help='Resource (group) name, case-insensitive')
+    history_parser.add_argument('--field', '-f', help="Field label, e.g. 'SKU' or 'Max Capacity'")
+    history_parser.add_argument('--action', choices=JOURNAL_ACTIONS, help='Only this kind of change')
+    history_parser.add_argument('--since', help='Start timestamp, e.g. 2024-01-31 or "2024-01-31 12:00:00"')
+    history_parser.add_argument('--until', help='End timestamp (exclusive)')
+    history_parser.add_argument('--limit', type=int, help='Only the most recent N entries')
+
+    prune_parser = subparsers.add_parser('prune', help='Delete old entries')
+    prune_parser.add_argument('--keep-days', type=int, required=True, help='Keep entries from the last N days')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.journal_file):
+        print(f"Error: journal '{args.journal_file}' not found.")
+        sys.exit(1)
+
+    journal = ChangeJournal(args.journal_file)
+    try:
+        if args.command == 'history':
+            rows = journal.history(resource=args.resource, field=args.field, since=args.since,
+                                   until=args.until, action=args.action, limit=args.limit)
+            for row in rows:
+                print(format_entry(row))
+            print(f"\n{len(rows)} change(s)")
+        else:
+            removed = journal.prune(args.keep_days)
+            print(f"Removed {removed} journal entries older than {args.keep_days} days")
+    finally:
+        journal.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Column Mapping Helpers
+Shared header-to-field resolution for the CSV inventory and the Google Sheet.
+Both the service account updater and debug_column_mapping.py use these helpers
+so that column lookups behave the same way everywhere.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Logical field -> accepted header names, in priority order
+CSV_COLUMN_ALIASES = {
+    'resource_type': ('ResourceType', 'Resource Type', 'Type'),
+    'name': ('Name',),
+    'resource_group': ('ResourceGroup', 'Resource Group'),
+    'subscription': ('Subscription',),
+    'location': ('Location',),
+    'sku': ('SKU',),
+    'capacity': ('Capacity',),
+    'autoscale_enabled': ('AutoscaleEnabled',),
+    'autoscale_min': ('AutoscaleMinCapacity',),
+    'autoscale_max': ('AutoscaleMaxCapacity',),
+    'autoscale_current': ('AutoscaleDefaultCapacity',)
+}
+
+GSHEET_COLUMN_ALIASES = {
+    'group': ('Group',),
+    'sku': ('SKU',),
+    'subscription': ('Subscription',),
+    'resource_type': ('Resource Type', 'ResourceType', 'Type'),
+    'current': ('current', 'curr'),
+    'min': ('min', 'minimum'),
+    'max': ('max', 'maximum')
+}
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_header(column_name: str) -> str:
+    """Normalize a header cell for matching ('Resource Type ' -> 'resourcetype')."""
+    return _NON_ALNUM.sub('', str(column_name).strip().lower())
+
+
+def _alias_signature(aliases: Dict[str, Sequence[str]]) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    """Convert an alias dict into a hashable, order-preserving signature."""
+    return tuple((field, tuple(terms)) for field, terms in aliases.items())
+
+
+@lru_cache(maxsize=128)
+def _resolve(header: Tuple[str, ...],
+             aliases: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> Tuple[Tuple[str, Optional[int], Optional[str]], ...]:
+    """Resolve every logical field against a header in a single pass over the header."""
+    exact = {}
+    normalized = {}
+    for idx, col_name in enumerate(header):
+        exact.setdefault(col_name.strip(), idx)
+        normalized.setdefault(normalize_header(col_name), idx)
+
+    resolved = []
+    for field, terms in aliases:
+        index, matched_term = None, None
+        # Exact header text wins over a normalized match so priority order is stable
+        for term in terms:
+            if term in exact:
+                index, matched_term = exact[term], term
+                break
+        if index is None:
+            for term in terms:
+                key = normalize_header(term)
+                if key in normalized:
+                    index, matched_term = normalized[key], term
+                    break
+        resolved.append((field, index, matched_term))
+    return tuple(resolved)
+
+
+def map_columns(header_row: Sequence[str], aliases: Dict[str, Sequence[str]]) -> Dict[str, Optional[int]]:
+    """Map each logical field to its column index (None when missing).
+
+    Results are cached per header signature, so repeated calls for the same
+    header are dictionary lookups rather than header scans.
+    """
+    resolved = _resolve(tuple(header_row), _alias_signature(aliases))
+    return {field: index for field, index, _ in resolved}
+
+
+def explain_columns(header_row: Sequence[str], aliases: Dict[str, Sequence[str]]) -> Dict[str, Dict]:
+    """Return per-field match details (used by debug_column_mapping.py)."""
+    header = tuple(header_row)
+    details = {}
+    for field, index, matched_term in _resolve(header, _alias_signature(aliases)):
+        details[field] = {
+            'found': index is not None,
+            'index': index,
+            'matched_term': matched_term,
+            'matched_column': header[index] if index is not None else None,
+            'search_terms': list(aliases[field])
+        }
+    return details
+
+
+def find_column_index(header_row: Sequence[str], search_terms: List[str]) -> Optional[int]:
+    """Find the column index for a single list of search terms."""
+    return map_columns(header_row, {'_field': tuple(search_terms)})['_field']
@@ -2,16 +2,36 @@
 """
 Debug Column Mapping Script
 This script helps debug column mapping issues between CSV and Google Sheets.
+With --scan it checks every row instead of samples: match rates, near-miss group names and
+per-column gaps/differences, in one pass over both sides.
 """
 
+import argparse
 import csv
 import json
 import sys
 import os
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 
-def read_csv_debug(csv_file: str) -> tuple:
-    """Read CSV file and return header and sample data for debugging."""
+from column_mapping import CSV_COLUMN_ALIASES, GSHEET_COLUMN_ALIASES, explain_columns, map_columns, normalize_header
+from inventory_diff import FIELD_MAPPINGS, diff_rows, extract_column
+
+# Fields inspected by the debugger (same alias rules the updater uses)
+DEBUG_CSV_ALIASES = {key: CSV_COLUMN_ALIASES[key]
+                     for key in ('name', 'sku', 'autoscale_min', 'autoscale_max', 'autoscale_current')}
+DEBUG_GSHEET_ALIASES = {key: GSHEET_COLUMN_ALIASES[key]
+                        for key in ('group', 'sku', 'current', 'min', 'max')}
+
+# Full-scan near-miss detection: character trigrams over normalized names, Dice similarity
+NGRAM_SIZE = 3
+NEAR_MISS_THRESHOLD = 0.6
+NEAR_MISS_CANDIDATES = 5      # candidates (by shared n-grams) scored exactly per name
+NGRAM_MAX_POSTING_SHARE = 0.05  # n-grams shared by more names than this carry no signal
+MAX_ROWS_SHOWN = 20
+
+def read_csv_debug(csv_file: str, full: bool = False) -> tuple:
+    """Read CSV file and return header and sample data (all data rows if full) for debugging."""
     if not os.path.exists(csv_file):
         print(f"❌ CSV file not found: {csv_file}")
         return None, None
@@ -26,7 +46,7 @@ def read_csv_debug(csv_file: str) -> tuple:
             return None, None
         
         header = rows[0]
-        sample_data = rows[1:6] if len(rows) > 1 else []  # First 5 data rows
+        sample_data = rows[1:] if full else rows[1:6]  # First 5 data rows
         
         return header, sample_data
     
@@ -34,20 +54,25 @@ def read_csv_debug(csv_file: str) -> tuple:
         print(f"❌ Error reading CSV: {e}")
         return None, None
 
-def read_gsheet_debug(spreadsheet_id: str, sheet_name: str) -> tuple:
-    """Read Google Sheet and return header and sample data for debugging."""
+def read_gsheet_debug(spreadsheet_id: str, sheet_name: str, service=None, full: bool = False) -> tuple:
+    """Read Google Sheet and return header and sample data (all data rows if full) for debugging.
+    
+    Pass `service` (e.g. sheets_emulator.FakeSheetsService) to skip authentication.
+    """
     try:
-        from update_gsheet_service_account import GoogleSheetsServiceAccountUpdater
-        
-        updater = GoogleSheetsServiceAccountUpdater()
-        
-        if not updater.authenticate():
-            print("❌ Google Sheets authentication failed")
-            return None, None
+        if service is None:
+            from update_gsheet_service_account import GoogleSheetsServiceAccountUpdater
+            
+            updater = GoogleSheetsServiceAccountUpdater()
+            
+            if not updater.authenticate():
+                print("❌ Google Sheets authentication failed")
+                return None, None
+            service = updater.service
         
         # Read sheet data
         range_name = f"{sheet_name}!A:Z"
-        sheet_result = updater.service.spreadsheets().values().get(
+        sheet_result = service.spreadsheets().values().get(
             spreadsheetId=spreadsheet_id,
             range=range_name
         ).execute()
@@ -58,7 +83,7 @@ def read_gsheet_debug(spreadsheet_id: str, sheet_name: str) -> tuple:
             return None, None
         
         header = existing_data[0]
-        sample_data = existing_data[1:6] if len(existing_data) > 1 else []  # First 5 data rows
+        sample_data = existing_data[1:] if full else existing_data[1:6]  # First 5 data rows
         
         return header, sample_data
     
@@ -69,42 +94,21 @@ def read_gsheet_debug(spreadsheet_id: str, sheet_name: str) -> tuple:
         print(f"❌ Error reading Google Sheet: {e}")
         return None, None
 
-def find_column_index_debug(header_row: List[str], search_terms: List[str], case_sensitive: bool = True) -> Dict:
-    """Debug version of column finding function."""
-    results = {
-        'found': False,
-        'index': None,
-        'matched_term': None,
-        'matched_column': None,
-        'search_details': []
-    }
-    
-    for term in search_terms:
-        for idx, col_name in enumerate(header_row):
-            search_detail = {
-                'term': term,
-                'column_index': idx,
-                'column_name': col_name,
-                'comparison': f"'{term}' vs '{col_name}'",
-                'case_sensitive': case_sensitive
-            }
-            
-            if case_sensitive:
-                match = col_name.strip() == term
-                search_detail['match_method'] = 'exact (case-sensitive)'
-            else:
-                match = col_name.strip().lower() == term.lower()
-                search_detail['match_method'] = 'exact (case-insensitive)'
-            
-            search_detail['match'] = match
-            results['search_details'].append(search_detail)
-            
-            if match and not results['found']:
-                results['found'] = True
-                results['index'] = idx
-                results['matched_term'] = term
-                results['matched_column'] = col_name
-    
+def find_column_index_debug(header_row: List[str], search_terms: List[str]) -> Dict:
+    """Debug version of column finding function (uses the shared column_mapping rules)."""
+    results = explain_columns(header_row, {'field': search_terms})['field']
+    results['search_details'] = [
+        {
+            'term': term,
+            'column_index': idx,
+            'column_name': col_name,
+            'comparison': f"'{term}' vs '{col_name}'",
+            'match_method': 'normalized (case/space/punctuation-insensitive)',
+            'match': normalize_header(col_name) == normalize_header(term)
+        }
+        for term in search_terms
+        for idx, col_name in enumerate(header_row)
+    ]
     return results
 
 def debug_column_mappings(csv_header: List[str], gsheet_header: List[str]) -> Dict:
@@ -113,24 +117,6 @@ def debug_column_mappings(csv_header: List[str], gsheet_header: List[str]) -> Di
     print("🔍 DEBUGGING COLUMN MAPPINGS")
     print("=" * 60)
     
-    # CSV column mappings
-    csv_mappings = {
-        'name': ['Name'],
-        'sku': ['SKU'],
-        'autoscale_min': ['AutoscaleMinCapacity'],
-        'autoscale_max': ['AutoscaleMaxCapacity'],
-        'autoscale_current': ['AutoscaleDefaultCapacity']
-    }
-    
-    # GSheet column mappings  
-    gsheet_mappings = {
-        'group': ['Group', 'group'],
-        'sku': ['SKU', 'sku'],
-        'current': ['current', 'Current', 'curr'],
-        'min': ['min', 'Min', 'minimum', 'Minimum'],
-        'max': ['max', 'Max', 'maximum', 'Maximum']
-    }
-    
     print(f"\n📄 CSV HEADER ({len(csv_header)} columns):")
     for i, col in enumerate(csv_header):
         print(f"  [{i:2d}] '{col}'")
@@ -140,33 +126,27 @@ def debug_column_mappings(csv_header: List[str], gsheet_header: List[str]) -> Di
         print(f"  [{i:2d}] '{col}'")
     
     print(f"\n🔍 CSV COLUMN SEARCHES:")
-    csv_results = {}
-    for key, search_terms in csv_mappings.items():
-        result = find_column_index_debug(csv_header, search_terms, case_sensitive=True)
-        csv_results[key] = result
-        
+    csv_results = explain_columns(csv_header, DEBUG_CSV_ALIASES)
+    for key, result in csv_results.items():
         status = "✅ FOUND" if result['found'] else "❌ NOT FOUND"
         print(f"\n  {key.upper()}: {status}")
         if result['found']:
             print(f"    Index: {result['index']}")
             print(f"    Matched: '{result['matched_term']}' → '{result['matched_column']}'")
         else:
-            print(f"    Searched for: {search_terms}")
+            print(f"    Searched for: {result['search_terms']}")
             print(f"    Available columns: {csv_header}")
     
     print(f"\n🔍 GOOGLE SHEET COLUMN SEARCHES:")
-    gsheet_results = {}
-    for key, search_terms in gsheet_mappings.items():
-        result = find_column_index_debug(gsheet_header, search_terms, case_sensitive=False)
-        gsheet_results[key] = result
-        
+    gsheet_results = explain_columns(gsheet_header, DEBUG_GSHEET_ALIASES)
+    for key, result in gsheet_results.items():
         status = "✅ FOUND" if result['found'] else "❌ NOT FOUND"
         print(f"\n  {key.upper()}: {status}")
         if result['found']:
             print(f"    Index: {result['index']}")
             print(f"    Matched: '{result['matched_term']}' → '{result['matched_column']}'")
         else:
-            print(f"    Searched for: {search_terms}")
+            print(f"    Searched for: {result['search_terms']}")
             print(f"    Available columns: {gsheet_header}")
     
     return {
@@ -231,6 +211,143 @@ def analyze_sample_data(csv_header: List[str], csv_data: List[List[str]],
         if gsheet_current_idx is not None and len(row) > gsheet_current_idx:
             print(f"    Current: '{row[gsheet_current_idx]}'")
 
+def _ngrams(text: str) -> frozenset:
+    """Character n-grams of a normalized name, padded so short names still produce some."""
+    padded = f" {text} "
+    return frozenset(padded[i:i + NGRAM_SIZE] for i in range(max(1, len(padded) - NGRAM_SIZE + 1)))
+
+class NgramIndex:
+    """Inverted n-gram index over names for fast fuzzy lookups (Dice similarity on n-gram sets)."""
+    
+    def __init__(self, names: Iterable[str]):
+        self.names = list(names)
+        self.grams = [_ngrams(normalize_header(name)) for name in self.names]
+        postings = {}
+        for position, grams in enumerate(self.grams):
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        # Very common n-grams ("vm-", "prod") match almost everything: skip them when collecting candidates
+        limit = max(50, int(len(self.names) * NGRAM_MAX_POSTING_SHARE))
+        self.postings = {gram: positions for gram, positions in postings.items() if len(positions) <= limit}
+    
+    def best_match(self, name: str) -> Tuple[Optional[str], float]:
+        """Return the most similar indexed name and its similarity (0-1)."""
+        grams = _ngrams(normalize_header(name))
+        shared = {}
+        for gram in grams:
+            for position in self.postings.get(gram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        if not shared:
+            return None, 0.0
+        candidates = sorted(shared, key=shared.get, reverse=True)[:NEAR_MISS_CANDIDATES]
+        best_position, best_score = None, 0.0
+        for position in candidates:
+            score = 2 * len(grams & self.grams[position]) / (len(grams) + len(self.grams[position]))
+            if score > best_score:
+                best_position, best_score = position, score
+        return self.names[best_position], best_score
+
+def scan_mappings(csv_header: List[str], csv_rows: List[List[str]],
+                  gsheet_header: List[str], gsheet_rows: List[List[str]]) -> Dict[str, Any]:
+    """Check every row of both sides the way the selective sync would.
+    
+    Returns match statistics, near-miss names (CSV resources with no exact sheet row but a
+    similar sheet group that has no CSV resource), and per-column empty/differing counts.
+    """
+    csv_indices = map_columns(csv_header, CSV_COLUMN_ALIASES)
+    gsheet_indices = map_columns(gsheet_header, GSHEET_COLUMN_ALIASES)
+    report = {'csv_rows': len(csv_rows), 'sheet_rows': len(gsheet_rows),
+              'csv_columns': csv_indices, 'gsheet_columns': gsheet_indices}
+    if csv_indices['name'] is None or gsheet_indices['group'] is None:
+        report['error'] = "CSV 'Name' or Google Sheet 'Group' column not found - fix the headers first"
+        return report
+    
+    # Whole columns at once, then set operations for matching
+    csv_names = extract_column(csv_rows, csv_indices['name'])
+    sheet_groups = extract_column(gsheet_rows, gsheet_indices['group'])
+    sheet_row_by_key = {}
+    for row_number, group in enumerate(sheet_groups, start=2):
+        if group:
+            sheet_row_by_key.setdefault(group.lower(), row_number)
+    csv_keys = {name.lower(): name for name in csv_names if name}
+    
+    matched_keys = csv_keys.keys() & sheet_row_by_key.keys()
+    csv_only = sorted(csv_keys[key] for key in csv_keys.keys() - matched_keys)
+    sheet_only = sorted(sheet_groups[sheet_row_by_key[key] - 2] for key in sheet_row_by_key.keys() - matched_keys)
+    report.update({
+        'csv_empty_names': csv_names.count(''),
+        'sheet_empty_groups': sheet_groups.count(''),
+        'matched': len(matched_keys),
+        'csv_match_rate': len(matched_keys) / len(csv_keys) if csv_keys else 0.0,
+        'sheet_match_rate': len(matched_keys) / len(sheet_row_by_key) if sheet_row_by_key else 0.0,
+        'csv_only': csv_only,
+        'sheet_only': sheet_only
+    })
+    
+    # Near misses: an unmatched CSV name that closely resembles an unmatched sheet group
+    near_misses = []
+    if csv_only and sheet_only:
+        index = NgramIndex(sheet_only)
+        for name in csv_only:
+            candidate, score = index.best_match(name)
+            if candidate is not None and score >= NEAR_MISS_THRESHOLD:
+                same_normalized = normalize_header(candidate) == normalize_header(name)
+                near_misses.append({'csv_name': name, 'sheet_group': candidate, 'similarity': round(score, 3),
+                                    'reason': 'punctuation/spacing only' if same_normalized else 'similar spelling'})
+        near_misses.sort(key=lambda miss: -miss['similarity'])
+    report['near_misses'] = near_misses
+    
+    # Per mapped column: gaps on each side and values the sync would overwrite
+    matches = [(sheet_row_by_key[name.lower()], row) for name, row in zip(csv_names, csv_rows)
+               if name and name.lower() in matched_keys]
+    pending = {}
+    for change in diff_rows(matches, [gsheet_header] + gsheet_rows, csv_indices, gsheet_indices):
+        pending[change.field] = pending.get(change.field, 0) + 1
+    columns = []
+    for csv_field, gsheet_field, label, _ in FIELD_MAPPINGS:
+        csv_index, gsheet_index = csv_indices.get(csv_field), gsheet_indices.get(gsheet_field)
+        columns.append({
+            'field': label,
+            'csv_column': csv_header[csv_index] if csv_index is not None else None,
+            'sheet_column': gsheet_header[gsheet_index] if gsheet_index is not None else None,
+            'csv_empty': extract_column(csv_rows, csv_index).count('') if csv_index is not None else None,
+            'sheet_empty': extract_column(gsheet_rows, gsheet_index).count('') if gsheet_index is not None else None,
+            'would_update': pending.get(label, 0)
+        })
+    report['columns'] = columns
+    return report
+
+def print_scan_report(report: Dict[str, Any], elapsed: float) -> None:
+    """Print the full-scan diagnostic report."""
+    print(f"\n🔬 FULL SCAN DIAGNOSTICS ({report['csv_rows']} CSV rows, {report['sheet_rows']} sheet rows, "
+          f"{elapsed:.3f}s including reads)")
+    print("=" * 60)
+    if 'error' in report:
+        print(f"❌ {report['error']}")
+        return
+    
+    print(f"\n📈 MATCH RATES:")
+    print(f"  Matched resources:        {report['matched']}")
+    print(f"  CSV resources matched:    {report['csv_match_rate']:.1%} ({len(report['csv_only'])} would be added as new rows)")
+    print(f"  Sheet groups matched:     {report['sheet_match_rate']:.1%} ({len(report['sheet_only'])} orphaned)")
+    print(f"  CSV rows without a name:  {report['csv_empty_names']}")
+    print(f"  Sheet rows without group: {report['sheet_empty_groups']}")
+    
+    near_misses = report['near_misses']
+    print(f"\n🔎 NEAR MISSES ({len(near_misses)} unmatched CSV names resemble an orphaned sheet group):")
+    for miss in near_misses[:MAX_ROWS_SHOWN]:
+        print(f"  '{miss['csv_name']}' ≈ '{miss['sheet_group']}' ({miss['similarity']:.0%}, {miss['reason']})")
+    if len(near_misses) > MAX_ROWS_SHOWN:
+        print(f"  ... and {len(near_misses) - MAX_ROWS_SHOWN} more")
+    
+    print(f"\n📋 COLUMNS:")
+    print(f"  {'Field':<18} {'CSV column':<24} {'Sheet column':<16} {'CSV empty':>10} {'Sheet empty':>12} {'Would update':>13}")
+    for column in report['columns']:
+        def show(value):
+            return '-' if value is None else value
+        print(f"  {column['field']:<18} {show(column['csv_column']):<24} {show(column['sheet_column']):<16} "
+              f"{show(column['csv_empty']):>10} {show(column['sheet_empty']):>12} {column['would_update']:>13}")
+
 def suggest_fixes(mappings: Dict) -> None:
     """Suggest fixes based on the mapping analysis."""
     
@@ -271,24 +388,39 @@ def suggest_fixes(mappings: Dict) -> None:
     print("3. Or modify the search terms in the Python script")
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 debug_column_mapping.py <CSV_FILE> [SPREADSHEET_ID] [SHEET_NAME]")
-        print("\nExamples:")
-        print("  python3 debug_column_mapping.py inventory.csv")
-        print("  python3 debug_column_mapping.py inventory.csv 1ABC...XYZ")
-        print("  python3 debug_column_mapping.py inventory.csv 1ABC...XYZ 'Sheet1'")
-        sys.exit(1)
-    
-    csv_file = sys.argv[1]
-    spreadsheet_id = sys.argv[2] if len(sys.argv) > 2 else None
-    sheet_name = sys.argv[3] if len(sys.argv) > 3 else "Sheet1"
+    parser = argparse.ArgumentParser(
+        description='Debug column mapping between an inventory CSV and a Google Sheet',
+        epilog="Examples:\n"
+               "  python3 debug_column_mapping.py inventory.csv\n"
+               "  python3 debug_column_mapping.py inventory.csv 1ABC...XYZ\n"
+               "  python3 debug_column_mapping.py inventory.csv 1ABC...XYZ 'Sheet1'\n"
+               "  python3 debug_column_mapping.py inventory.csv 1ABC...XYZ 'Sheet1' --scan   # check every row",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('csv_file', help='Path to CSV file with inventory data')
+    parser.add_argument('spreadsheet_id', nargs='?', help='Google Sheets spreadsheet ID')
+    parser.add_argument('sheet_name', nargs='?', default='Sheet1', help='Name of the sheet (default: Sheet1)')
+    parser.add_argument('--scan', action='store_true',
+                       help='Check every row of both sides instead of samples (needs SPREADSHEET_ID)')
+    args = parser.parse_args()
+    
+    if args.scan and not args.spreadsheet_id:
+        parser.error('--scan compares the CSV with a sheet and needs SPREADSHEET_ID')
+    
+    csv_file = args.csv_file
+    spreadsheet_id = args.spreadsheet_id
+    sheet_name = args.sheet_name
+    scan = args.scan
     
     print("🐛 GOOGLE SHEETS COLUMN MAPPING DEBUGGER")
     print("=" * 70)
     
+    # The scan timing covers the full reads as well as the matching
+    started = time.perf_counter()
+    
     # Read CSV data
     print(f"\n📄 Reading CSV file: {csv_file}")
-    csv_header, csv_data = read_csv_debug(csv_file)
+    csv_header, csv_data = read_csv_debug(csv_file, full=scan)
     
     if csv_header is None:
         sys.exit(1)
@@ -299,7 +431,7 @@ def main():
     # Read Google Sheet data if provided
     if spreadsheet_id:
         print(f"\n📊 Reading Google Sheet: {spreadsheet_id} / {sheet_name}")
-        gsheet_header, gsheet_data = read_gsheet_debug(spreadsheet_id, sheet_name)
+        gsheet_header, gsheet_data = read_gsheet_debug(spreadsheet_id, sheet_name, full=scan)
         
         if gsheet_header is None:
             print("⚠️  Continuing with CSV analysis only...")
@@ -312,6 +444,11 @@ def main():
         if csv_data and gsheet_data:
             analyze_sample_data(csv_header, csv_data, gsheet_header, gsheet_data, mappings)
         
+        # Check every row (--scan)
+        if scan:
+            report = scan_mappings(csv_header, csv_data, gsheet_header, gsheet_data)
+            print_scan_report(report, time.perf_counter() - started)
+        
         # Suggest fixes
         suggest_fixes(mappings)
     else:
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Inventory Diff Engine
+Compares matched CSV/Google Sheet rows column by column and returns a compact change set.
+Each mapped field is normalized once into two aligned columns (CSV side and sheet side) and
+compared in a single pass, instead of re-stripping and re-checking lengths per row and field.
+"""
+
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# (CSV field, GSheet field, label used in the change log, skip N/A placeholders)
+FIELD_MAPPINGS = (
+    ('sku', 'sku', 'SKU', False),
+    ('subscription', 'subscription', 'Subscription', False),
+    ('resource_type', 'resource_type', 'Resource Type', False),
+    ('autoscale_current', 'current', 'Current Capacity', True),
+    ('autoscale_min', 'min', 'Min Capacity', True),
+    ('autoscale_max', 'max', 'Max Capacity', True)
+)
+
+PLACEHOLDER_VALUES = frozenset(['n/a', '', 'null'])
+
+# row: 1-based sheet row, column: 0-based sheet column
+CellChange = namedtuple('CellChange', ['row', 'column', 'field', 'resource', 'old_value', 'new_value'])
+
+
+def extract_column(rows: Sequence[Sequence[str]], index: Optional[int]) -> List[str]:
+    """Return the stripped values of one column, '' where a row is too short."""
+    if index is None:
+        return [''] * len(rows)
+    return [row[index].strip() if len(row) > index else '' for row in rows]
+
+
+def diff_rows(matches: Sequence[Tuple[int, Sequence[str]]], sheet_rows: Sequence[Sequence[str]],
+              csv_indices: Dict[str, Optional[int]], gsheet_indices: Dict[str, Optional[int]]) -> List[CellChange]:
+    """Diff matched rows and return the cells that need updating.
+
+    matches     - (1-based sheet row number, CSV row) pairs
+    sheet_rows  - all sheet rows including the header, as returned by values().get
+    A value is only written when the CSV has one and it differs from the sheet; for the
+    capacity fields N/A/null placeholders never overwrite the sheet.
+    """
+    if not matches:
+        return []
+
+    row_numbers = [row_number for row_number, _ in matches]
+    csv_side = [csv_row for _, csv_row in matches]
+    sheet_side = [sheet_rows[row_number - 1] for row_number in row_numbers]
+    resources = extract_column(csv_side, csv_indices.get('name'))
+
+    changes = []
+    for csv_field, gsheet_field, label, skip_placeholders in FIELD_MAPPINGS:
+        csv_index, sheet_index = csv_indices.get(csv_field), gsheet_indices.get(gsheet_field)
+        if csv_index is None or sheet_index is None:
+            continue
+        new_values = extract_column(csv_side, csv_index)
+        old_values = extract_column(sheet_side, sheet_index)
+        skipped = PLACEHOLDER_VALUES if skip_placeholders else ('',)
+        changes.extend(
+            CellChange(row_number, sheet_index, label, resource, old, new)
+            for row_number, resource, old, new in zip(row_numbers, resources, old_values, new_values)
+            if new != old and (new.lower() if skip_placeholders else new) not in skipped
+        )
+
+    # Group by row so the change log reads resource by resource, fields in mapping order
+    field_order = {label: position for position, (_, _, label, _) in enumerate(FIELD_MAPPINGS)}
+    changes.sort(key=lambda change: (change.row, field_order[change.field]))
+    return changes
+
+
+def format_change(change: CellChange) -> str:
+    """Change log line for one cell update."""
+    return f"Updated {change.resource} -> {change.field}: '{change.old_value}' → '{change.new_value}'"
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Inventory Index
+Streams an inventory CSV once and builds everything the Sheets sync needs from it:
+the name -> row match index, the orphan-detection name set and the summary stats
+(an inventory_stats.InventoryStats, so every updater reports the same legacy summary).
+Rows are stored as tuples with repeated values (type, subscription, location...) interned.
+"""
+
+import csv
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from column_mapping import CSV_COLUMN_ALIASES, map_columns
+from inventory_stats import InventoryStats
+
+# Columns with few distinct values; interning them keeps large inventories small in memory
+_INTERNED_FIELDS = ('resource_type', 'resource_group', 'subscription', 'location', 'sku', 'autoscale_enabled')
+
+
+class InventoryIndex:
+    """Compact, single-pass view of an inventory CSV."""
+
+    __slots__ = ('header', 'columns', 'rows', 'by_name', 'stats', '_interned')
+
+    def __init__(self, header: Sequence[str]):
+        self.header = list(header)
+        self.columns = map_columns(self.header, CSV_COLUMN_ALIASES)
+        self.rows: List[Tuple[int, Tuple[str, ...]]] = []  # (csv line number, row)
+        self.by_name: Dict[str, Tuple[str, ...]] = {}      # lower-cased name -> first matching row
+        self.stats = InventoryStats()  # report with stats.legacy_summary()
+        self._interned = [idx for idx in (self.columns[field] for field in _INTERNED_FIELDS) if idx is not None]
+
+    @classmethod
+    def from_rows(cls, header: Sequence[str], rows: Iterable[Sequence[str]]) -> 'InventoryIndex':
+        """Build an index from any iterable of rows (CSV reader, collector, ...)."""
+        index = cls(header)
+        for line_number, row in enumerate(rows, start=2):
+            index.add_row(row, line_number)
+        return index
+
+    @property
+    def names(self):
+        """Lower-cased set of resource names (used for orphan detection)."""
+        return self.by_name.keys()
+
+    def value(self, row: Sequence[str], field: str) -> str:
+        """Return a stripped field value from a row, or '' when the column is missing."""
+        idx = self.columns.get(field)
+        if idx is None or len(row) <= idx:
+            return ''
+        return row[idx].strip()
+
+    def add_row(self, row: Sequence[str], line_number: int) -> None:
+        """Add one CSV row to the index and the running stats."""
+        if not row:
+            return
+
+        row = list(row)
+        for idx in self._interned:
+            if idx < len(row):
+                row[idx] = sys.intern(row[idx])
+        row = tuple(row)
+
+        value = self.value
+        self.stats.add(value(row, 'resource_type'), value(row, 'subscription'), value(row, 'sku'),
+                       value(row, 'capacity'), value(row, 'autoscale_max'), value(row, 'autoscale_enabled'))
+
+        name = self.value(row, 'name')
+        if not name:
+            return
+        self.rows.append((line_number, row))
+        self.by_name.setdefault(name.lower(), row)
+
+
+def load_inventory(csv_file: str) -> Optional[InventoryIndex]:
+    """Stream a CSV file into an InventoryIndex. Returns None for an empty file."""
+    with open(csv_file, 'r', encoding='utf-8', newline='') as file:
+        csv_reader = csv.reader(file)
+        header = next(csv_reader, None)
+        if header is None:
+            return None
+        return InventoryIndex.from_rows(header, csv_reader)
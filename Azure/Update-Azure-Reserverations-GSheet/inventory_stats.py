@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Inventory Statistics Engine
+Aggregates resource counts and capacity totals by resource type, subscription and SKU in a
+single streaming pass per CSV. Several CSVs (e.g. one per subscription or tenant) are
+aggregated concurrently in worker processes and the partial results merged.
+
+Examples:
+    python3 inventory_stats.py azure_inventory.csv
+    python3 inventory_stats.py exports/*.csv --by subscription,type --workers 8
+    python3 inventory_stats.py exports/*.csv --by sku --json
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from column_mapping import CSV_COLUMN_ALIASES, map_columns
+
+# Legacy summary counters keyed by upper-cased resource type (see create_summary_stats)
+LEGACY_TYPE_COUNTERS = {
+    'VM': 'vms',
+    'VMSS': 'vmss',
+    'MYSQL': 'mysql',
+    'POSTGRESQL': 'postgresql',
+    'COSMOSDB': 'cosmosdb',
+    'SQLDB': 'sqldb',
+    'REDIS': 'redis'
+}
+
+# Group-by dimensions -> position in the aggregation key
+DIMENSIONS = {'type': 0, 'subscription': 1, 'sku': 2}
+
+# Per-key totals: resources, capacity, autoscale max capacity, autoscale-enabled resources
+_COUNT, _CAPACITY, _MAX_CAPACITY, _AUTOSCALE = range(4)
+
+
+def new_summary_stats() -> Dict[str, Any]:
+    """Return an empty summary stats accumulator."""
+    return {
+        'total_resources': 0,
+        'vms': 0,
+        'vmss': 0,
+        'autoscale_enabled': 0,
+        'mysql': 0,
+        'postgresql': 0,
+        'cosmosdb': 0,
+        'sqldb': 0,
+        'redis': 0,
+        'subscriptions': set()
+    }
+
+
+def _number(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+class InventoryStats:
+    """Totals per (resource type, subscription, SKU); all other breakdowns are rolled up from these."""
+
+    __slots__ = ('totals', 'files', '_numbers')
+
+    def __init__(self):
+        self.totals: Dict[Tuple[str, str, str], List[float]] = {}
+        self.files = 0
+        self._numbers: Dict[str, float] = {}  # capacity values repeat a lot; parse each distinct string once
+
+    def add(self, resource_type: str, subscription: str, sku: str,
+            capacity: str = '', maximum: str = '', autoscale: str = '') -> None:
+        """Aggregate one resource (the per-row accumulator behind add_rows and InventoryIndex)."""
+        key = (resource_type.strip(), subscription.strip(), sku.strip())
+        entry = self.totals.get(key)
+        if entry is None:
+            entry = self.totals[key] = [0, 0.0, 0.0, 0]
+        entry[_COUNT] += 1
+        numbers = self._numbers
+        if capacity:
+            number = numbers.get(capacity)
+            if number is None:
+                number = numbers[capacity] = _number(capacity)
+            entry[_CAPACITY] += number
+        if maximum:
+            number = numbers.get(maximum)
+            if number is None:
+                number = numbers[maximum] = _number(maximum)
+            entry[_MAX_CAPACITY] += number
+        if autoscale and autoscale.strip().lower() == 'true':
+            entry[_AUTOSCALE] += 1
+
+    def add_rows(self, header: Sequence[str], rows: Iterable[Sequence[str]]) -> None:
+        """Aggregate rows that follow `header` in one pass."""
+        columns = map_columns(header, CSV_COLUMN_ALIASES)
+        fields = ('resource_type', 'subscription', 'sku', 'capacity', 'autoscale_max', 'autoscale_enabled')
+        # Unmapped fields read from a trailing '' appended to each row; short rows are padded with ''
+        width = max([index for index in (columns[field] for field in fields) if index is not None] + [-1]) + 1
+        missing = [field for field in fields if columns[field] is None]
+        getter = itemgetter(*[width if columns[field] is None else columns[field] for field in fields])
+        padding = [''] * (width + 1)
+        add = self.add
+
+        for row in rows:
+            if len(row) < width or missing:
+                if not row:
+                    continue
+                row = row[:width] + padding[len(row[:width]):]
+            add(*getter(row))
+
+    def merge(self, other: 'InventoryStats') -> 'InventoryStats':
+        """Add another partial aggregate into this one."""
+        for key, values in other.totals.items():
+            entry = self.totals.get(key)
+            if entry is None:
+                self.totals[key] = list(values)
+            else:
+                for position, value in enumerate(values):
+                    entry[position] += value
+        self.files += other.files
+        return self
+
+    def breakdown(self, dimensions: Sequence[str]) -> List[Dict[str, Any]]:
+        """Roll totals up to the given dimensions (e.g. ['subscription', 'type']), largest first."""
+        positions = [DIMENSIONS[dimension] for dimension in dimensions]
+        rolled: Dict[Tuple[str, ...], List[float]] = {}
+        for key, values in self.totals.items():
+            group = tuple(key[position] for position in positions)
+            entry = rolled.setdefault(group, [0, 0.0, 0.0, 0])
+            for position, value in enumerate(values):
+                entry[position] += value
+        rows = []
+        for group, values in rolled.items():
+            row = dict(zip(dimensions, group))
+            row.update({
+                'resources': int(values[_COUNT]),
+                'capacity': values[_CAPACITY],
+                'max_capacity': values[_MAX_CAPACITY],
+                'autoscale_enabled': int(values[_AUTOSCALE])
+            })
+            rows.append(row)
+        rows.sort(key=lambda row: (-row['resources'], [row[dimension] for dimension in dimensions]))
+        return rows
+
+    def legacy_summary(self) -> Dict[str, int]:
+        """The summary dict printed by the updaters after a sync."""
+        stats = new_summary_stats()
+        for (resource_type, subscription, _), values in self.totals.items():
+            count = int(values[_COUNT])
+            stats['total_resources'] += count
+            normalized = resource_type.upper()
+            counter = LEGACY_TYPE_COUNTERS.get('COSMOSDB' if normalized.startswith('COSMOSDB-') else normalized)
+            if counter:
+                stats[counter] += count
+            if normalized == 'VMSS':
+                stats['autoscale_enabled'] += int(values[_AUTOSCALE])
+            if subscription:
+                stats['subscriptions'].add(subscription)
+        stats['subscriptions'] = len(stats['subscriptions'])
+        return stats
+
+
+def aggregate_csv(csv_file: str) -> InventoryStats:
+    """Stream one CSV into an InventoryStats."""
+    stats = InventoryStats()
+    with open(csv_file, 'r', encoding='utf-8', newline='') as file:
+        csv_reader = csv.reader(file)
+        header = next(csv_reader, None)
+        if header is not None:
+            stats.add_rows(header, csv_reader)
+    stats.files = 1
+    return stats
+
+
+def aggregate_csvs(csv_files: Sequence[str], max_workers: Optional[int] = None) -> InventoryStats:
+    """Aggregate several CSVs in parallel worker processes and merge the partial results."""
+    combined = InventoryStats()
+    if len(csv_files) <= 1 or max_workers == 1:
+        for csv_file in csv_files:
+            combined.merge(aggregate_csv(csv_file))
+        return combined
+
+    workers = min(len(csv_files), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for partial in executor.map(aggregate_csv, csv_files):
+            combined.merge(partial)
+    return combined
+
+
+def print_breakdown(rows: List[Dict[str, Any]], dimensions: Sequence[str]) -> None:
+    widths = {dimension: max([len(dimension)] + [len(row[dimension]) for row in rows]) for dimension in dimensions}
+    header = "  ".join(dimension.title().ljust(widths[dimension]) for dimension in dimensions)
+    print(f"{header}  {'Resources':>10} {'Capacity':>10} {'Max Cap.':>10} {'Autoscale':>10}")
+    print("-" * (len(header) + 46))
+    for row in rows:
+        keys = "  ".join((row[dimension] or '-').ljust(widths[dimension]) for dimension in dimensions)
+        print(f"{keys}  {row['resources']:>10} {row['capacity']:>10g} {row['max_capacity']:>10g} {row['autoscale_enabled']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate Azure inventory CSVs by resource type, subscription and SKU')
+    parser.add_argument('csv_files', nargs='+', help='Inventory CSV files')
+    parser.add_argument('--by', default='type',
+                       help=f"Comma-separated breakdown dimensions: {', '.join(DIMENSIONS)} (default: type)")
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes (default: one per CPU, at most one per file)')
+    parser.add_argument('--json', action='store_true', help='Print the breakdown and summary as JSON')
+
+    args = parser.parse_args()
+
+    dimensions = [dimension.strip() for dimension in args.by.split(',') if dimension.strip()]
+    unknown = [dimension for dimension in dimensions if dimension not in DIMENSIONS]
+    if unknown or not dimensions:
+        parser.error(f"Unknown dimensions: {', '.join(unknown)}. Choose from: {', '.join(DIMENSIONS)}")
+    missing = [csv_file for csv_file in args.csv_files if not os.path.exists(csv_file)]
+    if missing:
+        print(f"Error: CSV file(s) not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    stats = aggregate_csvs(args.csv_files, args.workers)
+    rows = stats.breakdown(dimensions)
+    summary = stats.legacy_summary()
+    if args.json:
+        print(json.dumps({'files': stats.files, 'summary': summary, 'breakdown': rows}, indent=2))
+        return
+
+    print_breakdown(rows, dimensions)
+    print(f"\n{summary['total_resources']} resources in {summary['subscriptions']} subscriptions "
+          f"across {stats.files} file(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Orphaned Resource Policies
+Declarative, non-interactive handling of Google Sheet rows that no longer exist in Azure.
+Consecutive "miss" counts are persisted between runs so a row is only removed after it has
+been missing from N syncs in a row - useful for cron/CI runs where nobody answers a prompt.
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+ORPHAN_POLICY_MODES = ('prompt', 'flag', 'delete', 'archive')
+DEFAULT_ARCHIVE_SHEET = 'Orphaned Archive'
+# Miss counters must survive runs from any working directory (cron, CI), so they live next to
+# this script unless GSHEET_STATE_DIR points somewhere else
+STATE_DIR = os.environ.get('GSHEET_STATE_DIR', os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STATE_FILE = os.path.join(STATE_DIR, 'orphan_miss_counters.json')
+
+
+class OrphanPolicy:
+    """How orphaned rows are handled.
+
+    prompt  - ask interactively (falls back to flag when stdin is not a TTY)
+    flag    - report orphans and their miss counts, never modify the sheet
+    delete  - delete rows missing for at least min_misses consecutive syncs
+    archive - like delete, but copy the rows to archive_sheet first
+    """
+
+    def __init__(self, mode: str = 'prompt', min_misses: int = 1,
+                 archive_sheet: Optional[str] = None, state_file: str = DEFAULT_STATE_FILE):
+        if mode not in ORPHAN_POLICY_MODES:
+            raise ValueError(f"Unknown orphan policy '{mode}'. Choose from: {', '.join(ORPHAN_POLICY_MODES)}")
+        if min_misses < 1:
+            raise ValueError("min_misses must be at least 1")
+        self.mode = mode
+        self.min_misses = min_misses
+        self.archive_sheet = archive_sheet or (DEFAULT_ARCHIVE_SHEET if mode == 'archive' else None)
+        self.state_file = state_file
+
+    def effective_mode(self) -> str:
+        """Resolve 'prompt' to 'flag' when there is no terminal to prompt on."""
+        if self.mode == 'prompt' and not sys.stdin.isatty():
+            return 'flag'
+        return self.mode
+
+    def select_for_removal(self, orphan_names: Iterable[str], miss_counts: Dict[str, int]) -> List[str]:
+        """Return the orphan names (lower-cased) whose miss count has reached the threshold."""
+        return [name for name in orphan_names if miss_counts.get(name.lower(), 0) >= self.min_misses]
+
+
+class MissCounterStore:
+    """JSON-backed consecutive-miss counters, keyed by spreadsheet/sheet and lower-cased row name."""
+
+    def __init__(self, state_file: str = DEFAULT_STATE_FILE):
+        self.state_file = state_file
+        self.state = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Dict]]:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # A corrupt counter file only delays deletions, so start over rather than fail the sync
+            return {}
+
+    @staticmethod
+    def scope(spreadsheet_id: str, sheet_name: str) -> str:
+        return f"{spreadsheet_id}/{sheet_name}"
+
+    def record_sync(self, scope: str, orphan_names: Iterable[str]) -> Dict[str, int]:
+        """Increment counters for this sync's orphans and reset rows that reappeared."""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        previous = self.state.get(scope, {})
+        current = {}
+        for name in {name.lower() for name in orphan_names}:
+            entry = previous.get(name, {'misses': 0, 'first_missed': now})
+            entry['misses'] += 1
+            entry['last_missed'] = now
+            current[name] = entry
+        self.state[scope] = current
+        return {name: entry['misses'] for name, entry in current.items()}
+
+    def forget(self, scope: str, names: Iterable[str]) -> None:
+        """Drop counters for rows that were removed from the sheet."""
+        entries = self.state.get(scope, {})
+        for name in names:
+            entries.pop(name.lower(), None)
+
+    def save(self) -> None:
+        """Write counters atomically so an interrupted run never leaves a half-written file."""
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.state_file)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Local SQLite Mirror of Synced Sheets
+Keeps the mapped columns of every tab the selective sync touches in a local SQLite database,
+refreshed from the mapped columns the sync already read and then its own change set (cell
+updates, added rows, deleted orphans), so questions like "all VMSS in Production with max
+capacity above 10" don't need a sheet download. Rows are upserted in place; the tab is only
+rebuilt when its rows no longer line up with the mirror (first sync, or rows added/removed by
+hand in the sheet).
+
+Examples:
+    python3 sheet_mirror.py tabs
+    python3 sheet_mirror.py query --subscription Production --resource-type VMSS --where "max_capacity > 10"
+    python3 sheet_mirror.py query --group "web-%" --format csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from inventory_diff import CellChange
+from orphan_policy import STATE_DIR
+
+# Next to the scripts (or in $GSHEET_STATE_DIR) so cron/CI runs from any directory share it
+DEFAULT_MIRROR_FILE = os.path.join(STATE_DIR, 'inventory_mirror.db')
+
+# GSheet field (column_mapping.GSHEET_COLUMN_ALIASES) -> mirror column
+MIRROR_COLUMNS = (
+    ('group', 'group_name'),
+    ('resource_type', 'resource_type'),
+    ('subscription', 'subscription'),
+    ('sku', 'sku'),
+    ('current', 'current_capacity'),
+    ('min', 'min_capacity'),
+    ('max', 'max_capacity')
+)
+
+# inventory_diff change-log labels -> mirror column
+LABEL_COLUMNS = {
+    'SKU': 'sku',
+    'Subscription': 'subscription',
+    'Resource Type': 'resource_type',
+    'Current Capacity': 'current_capacity',
+    'Min Capacity': 'min_capacity',
+    'Max Capacity': 'max_capacity'
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheet_rows (
+    spreadsheet_id TEXT NOT NULL,
+    sheet TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    resource_type TEXT NOT NULL DEFAULT '',
+    subscription TEXT NOT NULL DEFAULT '',
+    sku TEXT NOT NULL DEFAULT '',
+    current_capacity INTEGER,
+    min_capacity INTEGER,
+    max_capacity INTEGER,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (spreadsheet_id, sheet, row_key)
+);
+CREATE INDEX IF NOT EXISTS idx_sheet_rows_group ON sheet_rows (group_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_sheet_rows_subscription ON sheet_rows (subscription COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_sheet_rows_resource_type ON sheet_rows (resource_type COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS synced_tabs (
+    spreadsheet_id TEXT NOT NULL,
+    sheet TEXT NOT NULL,
+    last_sync TEXT NOT NULL,
+    last_mode TEXT NOT NULL,
+    PRIMARY KEY (spreadsheet_id, sheet)
+);
+"""
+
+_COLUMN_NAMES = [column for _, column in MIRROR_COLUMNS]
+_INSERT = (f"INSERT OR IGNORE INTO sheet_rows (spreadsheet_id, sheet, row_key, {', '.join(_COLUMN_NAMES)}, updated_at) "
+           f"VALUES (?, ?, ?, {', '.join('?' * len(_COLUMN_NAMES))}, ?)")
+# Refresh a row from the sheet; updated_at only moves when a mapped value actually changed
+_UPSERT = (_INSERT.replace("INSERT OR IGNORE", "INSERT") +
+           " ON CONFLICT (spreadsheet_id, sheet, row_key) DO UPDATE SET " +
+           ", ".join(f"{column} = excluded.{column}" for column in _COLUMN_NAMES) +
+           ", updated_at = excluded.updated_at" +
+           f" WHERE ({', '.join(_COLUMN_NAMES)}) IS NOT ({', '.join('excluded.' + column for column in _COLUMN_NAMES)})")
+
+
+def _capacity(value: str) -> Optional[float]:
+    """Capacity cells are stored as numbers; empty or N/A cells become NULL so comparisons skip them."""
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class SheetMirror:
+    """SQLite mirror of the mapped columns of synced sheet tabs, one row per group (first occurrence)."""
+
+    def __init__(self, mirror_file: str = DEFAULT_MIRROR_FILE):
+        self.mirror_file = mirror_file
+        self.connection = sqlite3.connect(mirror_file)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _row_values(self, row: Sequence[str], gsheet_indices: Dict[str, Optional[int]]) -> List[Any]:
+        values = []
+        for field, column in MIRROR_COLUMNS:
+            index = gsheet_indices.get(field)
+            value = row[index].strip() if index is not None and len(row) > index else ''
+            values.append(_capacity(value) if column.endswith('_capacity') else value)
+        return values
+
+    def _keys(self, spreadsheet_id: str, sheet_name: str) -> set:
+        return {key for (key,) in self.connection.execute(
+            "SELECT row_key FROM sheet_rows WHERE spreadsheet_id = ? AND sheet = ?", (spreadsheet_id, sheet_name))}
+
+    def apply_sync(self, spreadsheet_id: str, sheet_name: str, sheet_rows: Sequence[Sequence[str]],
+                   gsheet_indices: Dict[str, Optional[int]], cell_changes: Iterable[CellChange] = (),
+                   added_rows: Iterable[Sequence[str]] = (), deleted_names: Iterable[str] = ()) -> str:
+        """Bring the mirror in line with the sheet after a sync; returns 'incremental' or 'full'.
+
+        sheet_rows is the sheet as read before the sync (header first). Every row in it is upserted,
+        so hand edits and cells the sync never rewrites (blank or N/A in the CSV) are picked up
+        too; the change set is then applied on top, exactly as the sync wrote it.
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        group_index = gsheet_indices['group']
+        first_rows = {}
+        for row in sheet_rows[1:]:
+            group = row[group_index].strip() if len(row) > group_index else ''
+            if group:
+                first_rows.setdefault(group.lower(), row)
+
+        mode = 'incremental' if self._keys(spreadsheet_id, sheet_name) == first_rows.keys() else 'full'
+        with self.connection:
+            if mode == 'full':
+                self.connection.execute("DELETE FROM sheet_rows WHERE spreadsheet_id = ? AND sheet = ?",
+                                        (spreadsheet_id, sheet_name))
+            self.connection.executemany(_UPSERT, (
+                [spreadsheet_id, sheet_name, key] + self._row_values(row, gsheet_indices) + [now]
+                for key, row in first_rows.items()
+            ))
+
+            for change in cell_changes:
+                column = LABEL_COLUMNS[change.field]
+                value = _capacity(change.new_value) if column.endswith('_capacity') else change.new_value
+                self.connection.execute(
+                    f"UPDATE sheet_rows SET {column} = ?, updated_at = ? "
+                    "WHERE spreadsheet_id = ? AND sheet = ? AND row_key = ?",
+                    (value, now, spreadsheet_id, sheet_name, change.resource.lower())
+                )
+
+            self.connection.executemany(_INSERT, (
+                [spreadsheet_id, sheet_name, row[group_index].strip().lower()] +
+                self._row_values(row, gsheet_indices) + [now]
+                for row in added_rows
+            ))
+
+            self.connection.executemany(
+                "DELETE FROM sheet_rows WHERE spreadsheet_id = ? AND sheet = ? AND row_key = ?",
+                ((spreadsheet_id, sheet_name, name.lower()) for name in deleted_names)
+            )
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO synced_tabs (spreadsheet_id, sheet, last_sync, last_mode) VALUES (?, ?, ?, ?)",
+                (spreadsheet_id, sheet_name, now, mode)
+            )
+        return mode
+
+    def tabs(self) -> List[sqlite3.Row]:
+        """Synced tabs with their row counts and last sync time."""
+        self.connection.row_factory = sqlite3.Row
+        try:
+            return self.connection.execute(
+                "SELECT t.spreadsheet_id, t.sheet, t.last_sync, t.last_mode, COUNT(r.row_key) AS rows "
+                "FROM synced_tabs t LEFT JOIN sheet_rows r ON r.spreadsheet_id = t.spreadsheet_id AND r.sheet = t.sheet "
+                "GROUP BY t.spreadsheet_id, t.sheet ORDER BY t.sheet"
+            ).fetchall()
+        finally:
+            self.connection.row_factory = None
+
+    def query(self, sheet_name: Optional[str] = None, group: Optional[str] = None,
+              subscription: Optional[str] = None, resource_type: Optional[str] = None,
+              sku: Optional[str] = None, where: Optional[str] = None) -> List[sqlite3.Row]:
+        """Filter mirrored rows. Text filters are case-insensitive; group accepts SQL LIKE patterns.
+
+        `where` is a raw SQL expression over the mirror columns, e.g. "max_capacity > 10".
+        """
+        conditions, params = [], []
+        for column, value in (('sheet', sheet_name), ('subscription', subscription),
+                              ('resource_type', resource_type), ('sku', sku)):
+            if value:
+                conditions.append(f"{column} = ? COLLATE NOCASE")
+                params.append(value)
+        if group:
+            conditions.append("group_name LIKE ?")
+            params.append(group)
+        if where:
+            conditions.append(f"({where})")
+        query = f"SELECT sheet, {', '.join(_COLUMN_NAMES)}, updated_at FROM sheet_rows"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY sheet, group_name COLLATE NOCASE"
+        self.connection.row_factory = sqlite3.Row
+        try:
+            return self.connection.execute(query, params).fetchall()
+        finally:
+            self.connection.row_factory = None
+
+
+def print_rows(rows: List[sqlite3.Row], output_format: str) -> None:
+    if not rows:
+        print("No matching rows")
+        return
+    columns = list(rows[0].keys())
+    if output_format == 'json':
+        print(json.dumps([dict(row) for row in rows], indent=2))
+    elif output_format == 'csv':
+        writer = csv.writer(sys.stdout)
+        writer.writerow(columns)
+        writer.writerows(tuple(row) for row in rows)
+    else:
+        values = [['' if value is None else str(value) for value in row] for row in rows]
+        widths = [max([len(column)] + [len(row[i]) for row in values]) for i, column in enumerate(columns)]
+        print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+        print("  ".join('-' * width for width in widths))
+        for row in values:
+            print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+        print(f"\n{len(rows)} row(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the local mirror of synced Google Sheet tabs')
+    parser.add_argument('--mirror-file', default=DEFAULT_MIRROR_FILE,
+                       help=f'Mirror database (default: {DEFAULT_MIRROR_FILE})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('tabs', help='List mirrored tabs')
+
+    query_parser = subparsers.add_parser('query', help='Filter mirrored rows')
+    query_parser.add_argument('--sheet', '-s', help='Only this tab')
+    query_parser.add_argument('--group', '-g', help="Group name or LIKE pattern, e.g. 'web-%%'")
+    query_parser.add_argument('--subscription', help='Subscription name')
+    query_parser.add_argument('--resource-type', '-t', help='Resource type, e.g. VMSS')
+    query_parser.add_argument('--sku', help='SKU')
+    query_parser.add_argument('--where', help=f"Extra SQL condition over: {', '.join(_COLUMN_NAMES)}")
+    query_parser.add_argument('--format', choices=('table', 'csv', 'json'), default='table',
+                             help='Output format (default: table)')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.mirror_file):
+        print(f"Error: mirror '{args.mirror_file}' not found. Run a selective sync first.")
+        sys.exit(1)
+
+    mirror = SheetMirror(args.mirror_file)
+    try:
+        if args.command == 'tabs':
+            for tab in mirror.tabs():
+                print(f"{tab['sheet']} ({tab['spreadsheet_id']}): {tab['rows']} rows, "
+                      f"last sync {tab['last_sync']} ({tab['last_mode']})")
+        else:
+            try:
+                rows = mirror.query(args.sheet, args.group, args.subscription, args.resource_type,
+                                    args.sku, args.where)
+            except sqlite3.Error as e:
+                print(f"Error: invalid query: {e}")
+                sys.exit(1)
+            print_rows(rows, args.format)
+    finally:
+        mirror.close()
+
+
+if __name__ == '__main__':
+    main()
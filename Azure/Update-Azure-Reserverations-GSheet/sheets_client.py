@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Google Sheets Client Helpers
+Fast startup for the Sheets updaters:
+  - Google client libraries are imported only when a client is actually built
+  - the Sheets discovery document is taken from the library's bundled copy (static discovery),
+    trimmed to the handful of methods these scripts call, and cached on disk
+  - service account access tokens are cached on disk until shortly before they expire,
+    so back-to-back cron runs skip the token exchange
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+CACHE_DIR = os.environ.get('GSHEET_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'azure-inventory-gsheet'))
+TOKEN_EXPIRY_MARGIN = timedelta(minutes=5)
+
+# Sheets API methods used by the updaters, debug tool and emulator
+USED_METHODS = {
+    'spreadsheets': ('get', 'batchUpdate'),
+    'values': ('get', 'batchGet', 'update', 'batchUpdate', 'clear', 'append')
+}
+
+# Top-level discovery document keys googleapiclient needs to build a service
+_DISCOVERY_KEYS = ('basePath', 'baseUrl', 'batchPath', 'discoveryVersion', 'id', 'kind', 'mtlsRootUrl', 'name',
+                   'parameters', 'protocol', 'revision', 'rootUrl', 'servicePath', 'version', 'auth')
+
+# spreadsheets().get fields mask: only the sheet properties the updaters use (titles, IDs, grid size)
+SHEET_METADATA_FIELDS = 'sheets.properties(sheetId,title,gridProperties(rowCount,columnCount))'
+
+MISSING_LIBRARIES_MESSAGE = "Required Google API libraries not installed. Run: pip install -r requirements.txt"
+
+
+def _write_private_file(path: str, data: str) -> None:
+    """Atomically write a file readable only by the current user."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _strip_method(method: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop documentation from a method description; keep what request building needs."""
+    stripped = {key: value for key, value in method.items() if key not in ('description', 'flatPath')}
+    stripped['parameters'] = {
+        name: {key: value for key, value in parameter.items() if key != 'description'}
+        for name, parameter in method.get('parameters', {}).items()
+    }
+    return stripped
+
+
+def trim_discovery_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce the Sheets discovery document to USED_METHODS.
+
+    Schemas are replaced with empty object stubs: googleapiclient only uses them to render
+    method docstrings, which is most of the cost of building resources from the full document.
+    """
+    spreadsheets = document['resources']['spreadsheets']
+    methods = {name: _strip_method(spreadsheets['methods'][name]) for name in USED_METHODS['spreadsheets']}
+    values_methods = {name: _strip_method(spreadsheets['resources']['values']['methods'][name])
+                      for name in USED_METHODS['values']}
+
+    referenced = set()
+    for method in list(methods.values()) + list(values_methods.values()):
+        for key in ('request', 'response'):
+            if '$ref' in method.get(key, {}):
+                referenced.add(method[key]['$ref'])
+
+    trimmed = {key: document[key] for key in _DISCOVERY_KEYS if key in document}
+    trimmed['resources'] = {'spreadsheets': {'methods': methods, 'resources': {'values': {'methods': values_methods}}}}
+    trimmed['schemas'] = {name: {'id': name, 'type': 'object'} for name in sorted(referenced)}
+    return trimmed
+
+
+def load_discovery_document(cache_dir: str = CACHE_DIR) -> Dict[str, Any]:
+    """Return the trimmed Sheets v4 discovery document, building and caching it on first use."""
+    from googleapiclient import discovery_cache
+
+    static_document = None
+    cache_file = None
+    try:
+        # The cache is keyed by the bundled document, so a library upgrade refreshes it
+        static_document = discovery_cache.get_static_doc('sheets', 'v4')
+        digest = hashlib.sha256(static_document.encode('utf-8')).hexdigest()[:16]
+        cache_file = os.path.join(cache_dir, f"sheets.v4.{digest}.json")
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError, TypeError, AttributeError):
+        pass
+
+    if not static_document:
+        raise RuntimeError("Sheets v4 discovery document is not bundled with googleapiclient")
+    trimmed = trim_discovery_document(json.loads(static_document))
+    if cache_file:
+        try:
+            _write_private_file(cache_file, json.dumps(trimmed, separators=(',', ':')))
+        except OSError:
+            pass  # Caching is an optimization only
+    return trimmed
+
+
+def build_sheets_service(credentials, cache_dir: str = CACHE_DIR):
+    """Build a Sheets v4 service from the cached, trimmed discovery document (no network)."""
+    from googleapiclient.discovery import build_from_document
+    return build_from_document(load_discovery_document(cache_dir), credentials=credentials)
+
+
+def _token_cache_file(client_email: str, scopes: List[str], cache_dir: str) -> str:
+    key = hashlib.sha256(f"{client_email}|{' '.join(sorted(scopes))}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"token-{key}.json")
+
+
+def load_service_account_credentials(service_account_file: str, scopes: List[str], cache_dir: str = CACHE_DIR):
+    """Load service account credentials, reusing a cached access token when it is still valid.
+
+    The returned credentials stay refreshable: if the cached token expires mid-run,
+    google-auth exchanges a new one with the service account key as usual.
+    """
+    from google.oauth2 import service_account
+
+    credentials = service_account.Credentials.from_service_account_file(service_account_file, scopes=scopes)
+    cache_file = _token_cache_file(credentials.service_account_email, scopes, cache_dir)
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        expiry = _parse_expiry(cached['expiry'])
+        if expiry - TOKEN_EXPIRY_MARGIN > datetime.now(timezone.utc):
+            credentials.token = cached['token']
+            # google-auth compares expiry against naive UTC datetimes
+            credentials.expiry = expiry.replace(tzinfo=None)
+    except (OSError, ValueError, KeyError):
+        pass
+    return credentials
+
+
+def format_expiry(expiry: datetime) -> str:
+    """Serialize a token expiry as ISO 8601 UTC; naive datetimes (google-auth's) are taken as UTC."""
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=timezone.utc)
+    return expiry.astimezone(timezone.utc).isoformat(timespec='seconds')
+
+
+def _parse_expiry(value: str) -> datetime:
+    """Timezone-aware expiry from the cache; entries written without an offset are UTC."""
+    expiry = datetime.fromisoformat(value)
+    return expiry if expiry.tzinfo is not None else expiry.replace(tzinfo=timezone.utc)
+
+
+def ensure_token(credentials, scopes: List[str], cache_dir: str = CACHE_DIR) -> bool:
+    """Fetch an access token if the credentials have none, and cache it. Returns True if a fetch happened."""
+    if credentials.valid:
+        return False
+
+    import httplib2
+    from google_auth_httplib2 import Request
+
+    credentials.refresh(Request(httplib2.Http()))
+    if credentials.expiry is not None:
+        cache_file = _token_cache_file(credentials.service_account_email, scopes, cache_dir)
+        try:
+            _write_private_file(cache_file, json.dumps({
+                'token': credentials.token,
+                'expiry': format_expiry(credentials.expiry)
+            }))
+        except OSError:
+            pass
+    return True
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Offline Google Sheets API Emulator
+In-memory stand-in for the `service` object returned by googleapiclient's build('sheets', 'v4').
+It supports the spreadsheets() / values() calls used by the updaters and debug_column_mapping.py,
+records every request (method, payload size, duration) and can inject latency and quota errors.
+
+Example:
+    service = FakeSheetsService({'Azure Inventory': [['Group', 'SKU'], ['api', 'B2s']]})
+    updater.service = service
+    updater.update_sheet_selective('fake-spreadsheet', 'Azure Inventory', 'inventory.csv')
+    print(service.summary())
+"""
+
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+FAKE_SPREADSHEET_ID = 'fake-spreadsheet'
+DEFAULT_ROW_COUNT = 1000
+DEFAULT_COLUMN_COUNT = 26
+
+_CELL_PATTERN = re.compile(r'^([A-Za-z]*)(\d*)$')
+_FIELD_PATH_PATTERN = re.compile(r'[\w.]+')
+
+
+class EmulatedHttpError(Exception):
+    """Raised for emulated API errors when googleapiclient is not installed."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class QuotaExceededError(EmulatedHttpError):
+    """Raised for injected quota errors when googleapiclient is not installed."""
+
+    def __init__(self, message: str):
+        super().__init__(message, 429)
+
+
+def _http_error(code: int, status: str, message: str) -> Exception:
+    """Build an error that looks like the one googleapiclient raises for an HTTP error status."""
+    content = json.dumps({'error': {'code': code, 'status': status, 'message': message}}).encode('utf-8')
+    try:
+        import httplib2
+        from googleapiclient.errors import HttpError
+        return HttpError(httplib2.Response({'status': code}), content)
+    except ImportError:
+        if code == 429:
+            return QuotaExceededError(content.decode('utf-8'))
+        return EmulatedHttpError(content.decode('utf-8'), code)
+
+
+def _quota_error(method: str) -> Exception:
+    """Build an error that looks like the one googleapiclient raises for HTTP 429."""
+    return _http_error(429, 'RESOURCE_EXHAUSTED', f"Quota exceeded (emulated) for {method}")
+
+
+def column_letter_to_number(letters: str) -> int:
+    """Convert a column letter to its 1-based number (A=1, AA=27)."""
+    number = 0
+    for char in letters.upper():
+        number = number * 26 + (ord(char) - ord('A') + 1)
+    return number
+
+
+def column_number_to_letter(column_number: int) -> str:
+    """Convert a 1-based column number to its letter (1=A, 27=AA)."""
+    column_letter = ""
+    while column_number > 0:
+        column_number -= 1
+        column_letter = chr(column_number % 26 + ord('A')) + column_letter
+        column_number //= 26
+    return column_letter
+
+
+def parse_a1_range(range_name: str) -> Tuple[str, int, Optional[int], int, Optional[int]]:
+    """Parse 'Sheet!A1:C10' style ranges.
+
+    Returns (sheet title, first row, last row, first column, last column) using 0-based,
+    end-exclusive indices; None means "to the end of the sheet".
+    """
+    if '!' in range_name:
+        title, cells = range_name.rsplit('!', 1)
+    else:
+        title, cells = range_name, ''
+    if len(title) >= 2 and title[0] == title[-1] == "'":
+        title = title[1:-1].replace("''", "'")
+    if not cells:
+        return title, 0, None, 0, None
+
+    start, _, end = cells.partition(':')
+    start_match, end_match = _CELL_PATTERN.match(start), _CELL_PATTERN.match(end or start)
+    if not start_match or not end_match:
+        raise ValueError(f"Unable to parse range: {range_name}")
+
+    start_col, start_row = start_match.groups()
+    end_col, end_row = end_match.groups()
+    first_row = int(start_row) - 1 if start_row else 0
+    first_col = column_letter_to_number(start_col) - 1 if start_col else 0
+    if end:
+        last_row = int(end_row) if end_row else None
+        last_col = column_letter_to_number(end_col) if end_col else None
+    else:
+        # Single reference: "A1" is one cell, "C" a whole column, "3" a whole row
+        last_row = first_row + 1 if start_row else None
+        last_col = first_col + 1 if start_col else None
+    return title, first_row, last_row, first_col, last_col
+
+
+def _parse_fields(fields: str, pos: int = 0) -> Tuple[Dict[str, Any], int]:
+    """Parse a partial-response mask ('a.b(c,d),e') into {field: subtree or None for everything}."""
+    tree: Dict[str, Any] = {}
+    while pos < len(fields):
+        match = _FIELD_PATH_PATTERN.match(fields, pos)
+        if not match:
+            raise ValueError(f"Invalid fields mask: {fields}")
+        path, pos = match.group(0).split('.'), match.end()
+        node = tree
+        for part in path[:-1]:
+            node = node.setdefault(part, {})
+        if pos < len(fields) and fields[pos] == '(':
+            subtree, pos = _parse_fields(fields, pos + 1)
+            node.setdefault(path[-1], {}).update(subtree)
+        else:
+            node[path[-1]] = None
+        if pos < len(fields) and fields[pos] == ',':
+            pos += 1
+        elif pos < len(fields) and fields[pos] == ')':
+            return tree, pos + 1
+    return tree, pos
+
+
+def _apply_mask(value: Any, tree: Optional[Dict[str, Any]]) -> Any:
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [_apply_mask(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _apply_mask(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+def apply_fields_mask(payload: Dict[str, Any], fields: str) -> Dict[str, Any]:
+    """Trim a response to a `fields` mask like the real API does."""
+    return _apply_mask(payload, _parse_fields(fields.replace(' ', ''))[0])
+
+
+def _payload_size(payload: Any) -> int:
+    return len(json.dumps(payload, default=str).encode('utf-8'))
+
+
+class CallRecord:
+    """One emulated API request."""
+
+    __slots__ = ('method', 'params', 'bytes_sent', 'bytes_received', 'duration', 'error')
+
+    def __init__(self, method: str, params: Dict[str, Any], bytes_sent: int):
+        self.method = method
+        self.params = params
+        self.bytes_sent = bytes_sent
+        self.bytes_received = 0
+        self.duration = 0.0
+        self.error = None
+
+    def __repr__(self) -> str:
+        return f"CallRecord({self.method}, sent={self.bytes_sent}B, received={self.bytes_received}B)"
+
+
+class _Sheet:
+    def __init__(self, sheet_id: int, title: str, rows: Iterable[Iterable[Any]] = ()):
+        self.sheet_id = sheet_id
+        self.title = title
+        self.rows: List[List[str]] = [[str(value) for value in row] for row in rows]
+        self.row_count = max(DEFAULT_ROW_COUNT, len(self.rows))
+        self.column_count = max([DEFAULT_COLUMN_COUNT] + [len(row) for row in self.rows])
+
+    def properties(self) -> Dict[str, Any]:
+        return {
+            'sheetId': self.sheet_id,
+            'title': self.title,
+            'index': self.sheet_id,
+            'sheetType': 'GRID',
+            'gridProperties': {'rowCount': self.row_count, 'columnCount': self.column_count}
+        }
+
+    def read(self, first_row: int, last_row: Optional[int], first_col: int, last_col: Optional[int]) -> List[List[str]]:
+        """Return values like the real API: trailing empty cells and rows are trimmed."""
+        values = []
+        for row in self.rows[first_row:last_row]:
+            cells = row[first_col:last_col]
+            while cells and cells[-1] == '':
+                cells = cells[:-1]
+            values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def write(self, first_row: int, first_col: int, values: List[List[Any]], grow: bool = False) -> int:
+        """Write values at a 0-based cell; like values().update, fails past the grid unless `grow`
+        (values().append and appendCells add rows and columns as needed)."""
+        last_row = first_row + len(values)
+        last_col = first_col + max([len(row) for row in values] + [0])
+        if not grow and values and (last_row > self.row_count or last_col > self.column_count):
+            cells = f"{column_number_to_letter(first_col + 1)}{first_row + 1}:{column_number_to_letter(last_col)}{last_row}"
+            raise _http_error(400, 'INVALID_ARGUMENT',
+                              f"Range ('{self.title}'!{cells}) exceeds grid limits. "
+                              f"Max rows: {self.row_count}, max columns: {self.column_count}")
+        updated = 0
+        for row_offset, row_values in enumerate(values):
+            row_index = first_row + row_offset
+            while len(self.rows) <= row_index:
+                self.rows.append([])
+            row = self.rows[row_index]
+            for col_offset, value in enumerate(row_values):
+                col_index = first_col + col_offset
+                if len(row) <= col_index:
+                    row.extend([''] * (col_index + 1 - len(row)))
+                row[col_index] = '' if value is None else str(value)
+                updated += 1
+            self.column_count = max(self.column_count, len(row))
+        self.row_count = max(self.row_count, len(self.rows))
+        return updated
+
+    def clear(self, first_row: int, last_row: Optional[int], first_col: int, last_col: Optional[int]) -> None:
+        for row in self.rows[first_row:last_row]:
+            stop = len(row) if last_col is None else min(last_col, len(row))
+            for col_index in range(first_col, stop):
+                row[col_index] = ''
+
+
+class _Request:
+    """Mimics googleapiclient's HttpRequest: nothing happens until execute()."""
+
+    def __init__(self, service: 'FakeSheetsService', method: str, params: Dict[str, Any], handler):
+        self._service = service
+        self._method = method
+        self._params = params
+        self._handler = handler
+
+    def execute(self, http=None, num_retries: int = 0) -> Dict[str, Any]:
+        return self._service._execute(self._method, self._params, self._handler)
+
+
+class _ValuesResource:
+    def __init__(self, service: 'FakeSheetsService'):
+        self._service = service
+
+    def get(self, spreadsheetId: str, range: str, **kwargs) -> _Request:
+        return _Request(self._service, 'values.get', dict(kwargs, spreadsheetId=spreadsheetId, range=range),
+                        lambda: self._service._values_get(range, kwargs.get('majorDimension', 'ROWS')))
+
+    def batchGet(self, spreadsheetId: str, ranges: List[str], **kwargs) -> _Request:
+        major_dimension = kwargs.get('majorDimension', 'ROWS')
+        return _Request(self._service, 'values.batchGet', dict(kwargs, spreadsheetId=spreadsheetId, ranges=ranges),
+                        lambda: {'spreadsheetId': spreadsheetId,
+                                 'valueRanges': [self._service._values_get(range_name, major_dimension)
+                                                 for range_name in ranges]})
+
+    def update(self, spreadsheetId: str, range: str, body: Dict[str, Any], valueInputOption: str = 'RAW',
+               **kwargs) -> _Request:
+        return _Request(self._service, 'values.update',
+                        dict(kwargs, spreadsheetId=spreadsheetId, range=range, body=body, valueInputOption=valueInputOption),
+                        lambda: self._service._values_update(range, body.get('values', [])))
+
+    def batchUpdate(self, spreadsheetId: str, body: Dict[str, Any], **kwargs) -> _Request:
+        def handler():
+            responses = [self._service._values_update(data['range'], data.get('values', []))
+                         for data in body.get('data', [])]
+            return {'spreadsheetId': spreadsheetId,
+                    'totalUpdatedCells': sum(response['updatedCells'] for response in responses),
+                    'responses': responses}
+        return _Request(self._service, 'values.batchUpdate', dict(kwargs, spreadsheetId=spreadsheetId, body=body), handler)
+
+    def append(self, spreadsheetId: str, range: str, body: Dict[str, Any], valueInputOption: str = 'RAW',
+               **kwargs) -> _Request:
+        return _Request(self._service, 'values.append',
+                        dict(kwargs, spreadsheetId=spreadsheetId, range=range, body=body, valueInputOption=valueInputOption),
+                        lambda: self._service._values_append(range, body.get('values', [])))
+
+    def clear(self, spreadsheetId: str, range: str, body: Optional[Dict[str, Any]] = None, **kwargs) -> _Request:
+        return _Request(self._service, 'values.clear', dict(kwargs, spreadsheetId=spreadsheetId, range=range),
+                        lambda: self._service._values_clear(range))
+
+
+class _SpreadsheetsResource:
+    def __init__(self, service: 'FakeSheetsService'):
+        self._service = service
+
+    def values(self) -> _ValuesResource:
+        return _ValuesResource(self._service)
+
+    def get(self, spreadsheetId: str, **kwargs) -> _Request:
+        return _Request(self._service, 'spreadsheets.get', dict(kwargs, spreadsheetId=spreadsheetId),
+                        lambda: self._service._metadata(spreadsheetId))
+
+    def batchUpdate(self, spreadsheetId: str, body: Dict[str, Any], **kwargs) -> _Request:
+        return _Request(self._service, 'spreadsheets.batchUpdate', dict(kwargs, spreadsheetId=spreadsheetId, body=body),
+                        lambda: self._service._batch_update(spreadsheetId, body.get('requests', [])))
+
+
+class FakeSheetsService:
+    """In-memory Sheets v4 service with call recording, latency and quota-error injection.
+
+    sheets          - {title: rows} to seed the spreadsheet with
+    latency         - seconds to sleep per request (simulates network round trips)
+    quota_error_calls - 1-based request numbers that fail with HTTP 429
+    quota_error_every - fail every Nth request with HTTP 429 (0 disables)
+    """
+
+    def __init__(self, sheets: Optional[Dict[str, List[List[Any]]]] = None, latency: float = 0.0,
+                 quota_error_calls: Iterable[int] = (), quota_error_every: int = 0):
+        self.latency = latency
+        self.quota_error_calls = set(quota_error_calls)
+        self.quota_error_every = quota_error_every
+        self.calls: List[CallRecord] = []
+        self._lock = threading.RLock()
+        self._sheets: Dict[str, _Sheet] = {}
+        for title, rows in (sheets or {'Sheet1': []}).items():
+            self.add_sheet(title, rows)
+
+    # --- googleapiclient surface -------------------------------------------------
+
+    def spreadsheets(self) -> _SpreadsheetsResource:
+        return _SpreadsheetsResource(self)
+
+    # --- helpers for tests and benchmarks ----------------------------------------
+
+    def add_sheet(self, title: str, rows: Iterable[Iterable[Any]] = (), sheet_id: Optional[int] = None) -> None:
+        with self._lock:
+            if sheet_id is None:
+                sheet_id = max((sheet.sheet_id for sheet in self._sheets.values()), default=-1) + 1
+            self._sheets[title] = _Sheet(sheet_id, title, rows)
+
+    def sheet_values(self, title: str) -> List[List[str]]:
+        """Current contents of a sheet (trimmed like a values().get response)."""
+        sheet = self._sheets[title]
+        return sheet.read(0, None, 0, None)
+
+    def reset_calls(self) -> None:
+        self.calls = []
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate recorded calls: counts per method, bytes and time spent."""
+        per_method: Dict[str, int] = {}
+        for call in self.calls:
+            per_method[call.method] = per_method.get(call.method, 0) + 1
+        return {
+            'calls': len(self.calls),
+            'per_method': per_method,
+            'bytes_sent': sum(call.bytes_sent for call in self.calls),
+            'bytes_received': sum(call.bytes_received for call in self.calls),
+            'errors': sum(1 for call in self.calls if call.error),
+            'api_time': sum(call.duration for call in self.calls)
+        }
+
+    # --- request execution -------------------------------------------------------
+
+    def _execute(self, method: str, params: Dict[str, Any], handler) -> Dict[str, Any]:
+        record = CallRecord(method, params, _payload_size(params))
+        started = time.perf_counter()
+        with self._lock:
+            self.calls.append(record)
+            call_number = len(self.calls)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if call_number in self.quota_error_calls or (
+                    self.quota_error_every and call_number % self.quota_error_every == 0):
+                record.error = 'quota'
+                raise _quota_error(method)
+            with self._lock:
+                response = handler()
+            if params.get('fields'):
+                response = apply_fields_mask(response, params['fields'])
+            record.bytes_received = _payload_size(response)
+            return response
+        finally:
+            record.duration = time.perf_counter() - started
+
+    def _sheet(self, title: str) -> _Sheet:
+        if title not in self._sheets:
+            raise ValueError(f"Unable to parse range: {title} (sheet not found)")
+        return self._sheets[title]
+
+    def _metadata(self, spreadsheet_id: str) -> Dict[str, Any]:
+        ordered = sorted(self._sheets.values(), key=lambda sheet: sheet.sheet_id)
+        return {
+            'spreadsheetId': spreadsheet_id,
+            'properties': {'title': 'Emulated Spreadsheet'},
+            'sheets': [{'properties': sheet.properties()} for sheet in ordered]
+        }
+
+    def _values_get(self, range_name: str, major_dimension: str = 'ROWS') -> Dict[str, Any]:
+        title, first_row, last_row, first_col, last_col = parse_a1_range(range_name)
+        values = self._sheet(title).read(first_row, last_row, first_col, last_col)
+        if major_dimension == 'COLUMNS' and values:
+            width = max(len(row) for row in values)
+            values = [[row[col] if col < len(row) else '' for row in values] for col in range(width)]
+            for column in values:
+                while column and column[-1] == '':
+                    column.pop()
+        response = {'range': range_name, 'majorDimension': major_dimension}
+        if values:
+            response['values'] = values
+        return response
+
+    def _values_update(self, range_name: str, values: List[List[Any]]) -> Dict[str, Any]:
+        title, first_row, _, first_col, _ = parse_a1_range(range_name)
+        updated = self._sheet(title).write(first_row, first_col, values)
+        return {'updatedRange': range_name, 'updatedRows': len(values), 'updatedCells': updated}
+
+    def _values_append(self, range_name: str, values: List[List[Any]]) -> Dict[str, Any]:
+        title, _, _, first_col, _ = parse_a1_range(range_name)
+        sheet = self._sheet(title)
+        first_row = len(sheet.read(0, None, 0, None))
+        updated = sheet.write(first_row, first_col, values, grow=True)
+        return {'updates': {'updatedRows': len(values), 'updatedCells': updated}}
+
+    def _values_clear(self, range_name: str) -> Dict[str, Any]:
+        title, first_row, last_row, first_col, last_col = parse_a1_range(range_name)
+        self._sheet(title).clear(first_row, last_row, first_col, last_col)
+        return {'clearedRange': range_name}
+
+    def _batch_update(self, spreadsheet_id: str, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+        by_id = {sheet.sheet_id: sheet for sheet in self._sheets.values()}
+        replies = []
+        for request in requests:
+            if 'addSheet' in request:
+                properties = request['addSheet'].get('properties', {})
+                self.add_sheet(properties['title'], sheet_id=properties.get('sheetId'))
+                by_id = {sheet.sheet_id: sheet for sheet in self._sheets.values()}
+                replies.append({'addSheet': {'properties': self._sheets[properties['title']].properties()}})
+            elif 'deleteDimension' in request:
+                dimension_range = request['deleteDimension']['range']
+                sheet = by_id[dimension_range['sheetId']]
+                if dimension_range.get('dimension', 'ROWS') == 'ROWS':
+                    del sheet.rows[dimension_range['startIndex']:dimension_range['endIndex']]
+                    sheet.row_count -= dimension_range['endIndex'] - dimension_range['startIndex']
+                else:
+                    for row in sheet.rows:
+                        del row[dimension_range['startIndex']:dimension_range['endIndex']]
+                    sheet.column_count -= dimension_range['endIndex'] - dimension_range['startIndex']
+                replies.append({})
+            elif 'updateSheetProperties' in request:
+                update = request['updateSheetProperties']
+                sheet = by_id[update['properties']['sheetId']]
+                grid = update['properties'].get('gridProperties', {})
+                fields = update.get('fields', '')
+                if 'gridProperties.rowCount' in fields and 'rowCount' in grid:
+                    sheet.row_count = grid['rowCount']
+                if 'gridProperties.columnCount' in fields and 'columnCount' in grid:
+                    sheet.column_count = grid['columnCount']
+                replies.append({})
+            elif 'appendCells' in request:
+                append = request['appendCells']
+                sheet = by_id[append['sheetId']]
+                rows = [
+                    [next(iter(cell.get('userEnteredValue', {'stringValue': ''}).values()), '')
+                     for cell in row.get('values', [])]
+                    for row in append.get('rows', [])
+                ]
+                sheet.write(len(sheet.read(0, None, 0, None)), 0, rows, grow=True)
+                replies.append({})
+            else:
+                raise ValueError(f"Emulator does not support request type: {list(request)}")
+        return {'spreadsheetId': spreadsheet_id, 'replies': replies}
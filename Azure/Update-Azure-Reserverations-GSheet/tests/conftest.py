@@ -0,0 +1,46 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The scripts are flat modules run from this directory; make them importable from tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def service_account_file(tmp_path):
+    """Service account key file with a freshly generated RSA key."""
+    pytest.importorskip('cryptography')
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode('utf-8')
+    path = str(tmp_path / 'service-account-key.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'type': 'service_account',
+            'project_id': 'example-project',
+            'private_key_id': 'test',
+            'private_key': pem,
+            'client_email': 'test@example-project.iam.gserviceaccount.com',
+            'client_id': '0',
+            'token_uri': 'https://oauth2.googleapis.com/token'
+        }, f)
+    return path
+
+
+@pytest.fixture
+def seed_token_cache():
+    """Store an access token in the token cache of a key file: seed(key_file, cache_dir, expiry, token)."""
+    from sheets_client import _token_cache_file, _write_private_file
+    from update_gsheet_service_account import SCOPES
+
+    def seed(key_file, cache_dir, expiry, token='cached-token'):
+        with open(key_file, 'r', encoding='utf-8') as f:
+            client_email = json.load(f)['client_email']
+        _write_private_file(_token_cache_file(client_email, SCOPES, cache_dir),
+                            json.dumps({'token': token, 'expiry': expiry}))
+    return seed
@@ -0,0 +1,33 @@
+"""azure_inventory_collector.py replayed offline from the recorded Resource Graph fixtures."""
+
+import asyncio
+import csv
+import os
+
+from azure_inventory_collector import CSV_HEADER, FixtureTransport, collect_rows, write_csv
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'resource_graph')
+
+
+def test_fixture_pages_are_followed_and_written_as_csv(tmp_path):
+    transport = FixtureTransport(FIXTURE_DIR)
+    output_file = str(tmp_path / 'inventory.csv')
+
+    write_csv(asyncio.run(collect_rows(transport)), output_file)
+
+    with open(output_file, 'r', encoding='utf-8', newline='') as f:
+        header, *rows = list(csv.reader(f))
+    assert header == CSV_HEADER
+    assert rows == [
+        ['VM', 'web-server-01', 'prod-rg', 'Production', 'eastus', 'Standard_D2s_v3', '', 'VM running', 'Linux',
+         'N/A', 'N/A', 'N/A', 'N/A'],
+        ['VM', 'jump-box', 'prod-rg', 'Production', 'canadacentral', 'Standard_B2s', '', 'VM running', 'Linux',
+         'N/A', 'N/A', 'N/A', 'N/A'],
+        ['VMSS', 'api-scale-set', 'prod-rg', 'Production', 'eastus', 'Standard_B2s', '3', 'Succeeded', '',
+         'true', '2', '10', '3'],
+        ['VMSS', 'worker-scale-set', 'prod-rg', 'Production', 'eastus', 'Standard_D4s_v3', '2', 'Succeeded', '',
+         'false', 'N/A', 'N/A', 'N/A']
+    ]
+    # vms.json holds two pages; the second is requested with the $skipToken of the first
+    vm_calls = [call['body'].get('options', {}).get('$skipToken') for call in transport.calls if call['name'] == 'vms']
+    assert vm_calls == [None, '1']
@@ -0,0 +1,50 @@
+"""Header-to-field resolution shared by the CSV inventory and the sheet."""
+
+import pytest
+
+from column_mapping import (CSV_COLUMN_ALIASES, GSHEET_COLUMN_ALIASES, explain_columns, find_column_index,
+                            map_columns, normalize_header)
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('Resource Type ', 'resourcetype'),
+    ('resource_type', 'resourcetype'),
+    ('AutoscaleMaxCapacity', 'autoscalemaxcapacity'),
+    ('  S.K.U  ', 'sku')
+])
+def test_normalize_header(header, expected):
+    assert normalize_header(header) == expected
+
+
+def test_csv_headers_match_regardless_of_case_and_spacing():
+    header = ['resource type', 'NAME', 'Resource_Group', 'subscription', 'sku', 'autoscale max capacity']
+
+    columns = map_columns(header, CSV_COLUMN_ALIASES)
+
+    assert (columns['resource_type'], columns['name'], columns['resource_group']) == (0, 1, 2)
+    assert (columns['subscription'], columns['sku'], columns['autoscale_max']) == (3, 4, 5)
+    assert columns['location'] is None
+
+
+def test_aliases_resolve_in_priority_order():
+    assert map_columns(['Type', 'ResourceType'], CSV_COLUMN_ALIASES)['resource_type'] == 1
+    assert map_columns(['Group', 'curr', 'Maximum'], GSHEET_COLUMN_ALIASES) == {
+        'group': 0, 'sku': None, 'subscription': None, 'resource_type': None, 'current': 1, 'min': None, 'max': 2
+    }
+
+
+def test_exact_match_wins_over_normalized_match():
+    # 'resource type' normalizes like 'Resource Type' but the exact header is preferred
+    assert map_columns(['resource type', 'Resource Type'], GSHEET_COLUMN_ALIASES)['resource_type'] == 1
+
+
+def test_first_duplicate_header_wins():
+    assert find_column_index(['Sku', 'Name', 'SKU '], ['sku']) == 0
+
+
+def test_explain_columns_reports_the_matched_alias():
+    details = explain_columns(['Group', 'minimum'], GSHEET_COLUMN_ALIASES)
+
+    assert details['min'] == {'found': True, 'index': 1, 'matched_term': 'minimum', 'matched_column': 'minimum',
+                              'search_terms': ['min', 'minimum']}
+    assert details['max']['found'] is False
@@ -0,0 +1,50 @@
+"""NgramIndex similarity scoring and the --scan near-miss report."""
+
+import pytest
+
+from debug_column_mapping import NEAR_MISS_THRESHOLD, NgramIndex, _ngrams, scan_mappings
+
+CSV_HEADER = ['ResourceType', 'Name', 'SKU']
+SHEET_HEADER = ['Group', 'SKU']
+
+
+def test_identical_and_punctuation_only_names_score_one():
+    index = NgramIndex(['web-server-01', 'db-server-02'])
+
+    assert index.best_match('web-server-01') == ('web-server-01', 1.0)
+    assert index.best_match('Web Server 01') == ('web-server-01', 1.0)
+
+
+def test_score_is_dice_similarity_of_trigrams():
+    index = NgramIndex(['api-gateway', 'cache-node'])
+    name, score = index.best_match('api-gatway')
+
+    grams, indexed = _ngrams('apigatway'), _ngrams('apigateway')
+    assert name == 'api-gateway'
+    assert score == pytest.approx(2 * len(grams & indexed) / (len(grams) + len(indexed)))
+    assert NEAR_MISS_THRESHOLD <= score < 1.0
+
+
+def test_no_shared_ngrams_returns_no_match():
+    assert NgramIndex(['alpha']).best_match('zzz') == (None, 0.0)
+    assert NgramIndex([]).best_match('alpha') == (None, 0.0)
+
+
+def test_common_ngrams_are_dropped_from_postings():
+    names = [f"prod-vm-{number:04d}" for number in range(2000)]
+    index = NgramIndex(names)
+
+    assert 'pro' not in index.postings
+    assert index.best_match('prod-vm-1234') == ('prod-vm-1234', 1.0)
+
+
+def test_scan_reports_near_misses_between_unmatched_names():
+    csv_rows = [['VM', 'web-server-01', 'Standard_B2s'], ['VM', 'api_gateway', 'Standard_B2s'],
+                ['VM', 'unrelated', 'Standard_B2s']]
+    sheet_rows = [['web-server-01', 'Standard_B2s'], ['api-gateway', 'Standard_B2s'], ['database', 'Standard_B2s']]
+
+    report = scan_mappings(CSV_HEADER, csv_rows, SHEET_HEADER, sheet_rows)
+
+    assert report['matched'] == 1
+    assert report['near_misses'] == [{'csv_name': 'api_gateway', 'sheet_group': 'api-gateway', 'similarity': 1.0,
+                                      'reason': 'punctuation/spacing only'}]
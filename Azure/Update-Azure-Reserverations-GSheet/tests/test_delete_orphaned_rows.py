@@ -0,0 +1,65 @@
+"""Orphan detection and the batched row deletion in update_gsheet_service_account.py."""
+
+import csv
+
+import pytest
+
+from orphan_policy import OrphanPolicy
+from sheets_emulator import FAKE_SPREADSHEET_ID, FakeSheetsService
+from update_gsheet_service_account import GoogleSheetsServiceAccountUpdater
+
+SHEET_NAME = 'Azure Inventory'
+HEADER = ['Group', 'SKU']
+
+
+@pytest.fixture
+def service():
+    return FakeSheetsService({SHEET_NAME: [HEADER] + [[f"row-{row}", 'Standard_B2s'] for row in range(2, 12)]})
+
+
+@pytest.fixture
+def updater(service):
+    updater = GoogleSheetsServiceAccountUpdater()
+    updater.service = service
+    return updater
+
+
+def delete_ranges(service):
+    return [(request['deleteDimension']['range']['startIndex'], request['deleteDimension']['range']['endIndex'])
+            for call in service.calls if call.method == 'spreadsheets.batchUpdate'
+            for request in call.params['body']['requests']]
+
+
+def test_adjacent_rows_merge_into_bottom_up_ranges(service, updater):
+    rows = [3, 4, 5, 8, 10, 11]
+    orphans = [{'row_index': row, 'name': f"row-{row}", 'data': []} for row in rows]
+
+    deleted = updater.delete_orphaned_rows(FAKE_SPREADSHEET_ID, updater.get_sheet_info(FAKE_SPREADSHEET_ID),
+                                           SHEET_NAME, orphans)
+
+    assert deleted == [f"row-{row}" for row in rows]
+    assert delete_ranges(service) == [(9, 11), (7, 8), (2, 5)]
+    assert [row[0] for row in service.sheet_values(SHEET_NAME)[1:]] == ['row-2', 'row-6', 'row-7', 'row-9']
+
+
+def test_unknown_sheet_deletes_nothing(service, updater):
+    orphans = [{'row_index': 2, 'name': 'row-2', 'data': []}]
+
+    assert updater.delete_orphaned_rows(FAKE_SPREADSHEET_ID, {'sheets': []}, SHEET_NAME, orphans) == []
+    assert delete_ranges(service) == []
+
+
+def test_orphans_are_sheet_groups_missing_from_csv(tmp_path, updater):
+    csv_file = tmp_path / 'inventory.csv'
+    with open(csv_file, 'w', encoding='utf-8', newline='') as f:
+        # Matching is case-insensitive, so ROW-2 keeps row-2
+        csv.writer(f).writerows([['Name', 'SKU']] + [[f"row-{row}", 'Standard_B2s'] for row in range(3, 12)] +
+                                [['ROW-2', 'Standard_B2s']])
+    service = FakeSheetsService({SHEET_NAME: [HEADER, ['row-2'], ['gone-a'], ['row-3'], ['Gone-B'], ['gone-a']]})
+    updater.service = service
+    policy = OrphanPolicy(mode='delete', state_file=str(tmp_path / 'misses.json'))
+
+    assert updater.update_sheet_selective(FAKE_SPREADSHEET_ID, SHEET_NAME, str(csv_file), orphan_policy=policy)
+
+    assert delete_ranges(service) == [(4, 6), (2, 3)]
+    assert [row[0] for row in service.sheet_values(SHEET_NAME)[1:3]] == ['row-2', 'row-3']
@@ -0,0 +1,54 @@
+"""diff_rows change detection for matched CSV/sheet rows."""
+
+from column_mapping import CSV_COLUMN_ALIASES, GSHEET_COLUMN_ALIASES, map_columns
+from inventory_diff import CellChange, diff_rows, format_change
+
+CSV_HEADER = ['ResourceType', 'Name', 'Subscription', 'SKU', 'AutoscaleMinCapacity', 'AutoscaleMaxCapacity',
+              'AutoscaleDefaultCapacity']
+SHEET_HEADER = ['Group', 'Resource Type', 'Subscription', 'SKU', 'current', 'min', 'max']
+CSV_INDICES = map_columns(CSV_HEADER, CSV_COLUMN_ALIASES)
+SHEET_INDICES = map_columns(SHEET_HEADER, GSHEET_COLUMN_ALIASES)
+
+
+def test_no_matches_means_no_changes():
+    assert diff_rows([], [SHEET_HEADER], CSV_INDICES, SHEET_INDICES) == []
+
+
+def test_changes_are_grouped_by_row_in_field_order():
+    sheet = [
+        SHEET_HEADER,
+        ['vmss-1', 'VMSS', 'Production', 'Standard_B2s', '2', '1', '5'],
+        ['vm-1', 'VM', 'Staging', 'Standard_B2s']
+    ]
+    matches = [
+        (3, ['VM', 'vm-1', 'Production', ' Standard_B2s ', 'N/A', 'N/A', 'N/A']),
+        (2, ['VMSS', 'vmss-1', 'Production', 'Standard_D2s_v3', '1', '8', '3'])
+    ]
+
+    assert diff_rows(matches, sheet, CSV_INDICES, SHEET_INDICES) == [
+        CellChange(2, 3, 'SKU', 'vmss-1', 'Standard_B2s', 'Standard_D2s_v3'),
+        CellChange(2, 4, 'Current Capacity', 'vmss-1', '2', '3'),
+        CellChange(2, 6, 'Max Capacity', 'vmss-1', '5', '8'),
+        CellChange(3, 2, 'Subscription', 'vm-1', 'Staging', 'Production')
+    ]
+
+
+def test_placeholders_and_blanks_never_overwrite_the_sheet():
+    sheet = [SHEET_HEADER, ['vmss-1', 'VMSS', 'Production', 'Standard_B2s', '2', '1', '5']]
+    matches = [(2, ['VMSS', 'vmss-1', '', 'Standard_B2s', 'null', 'N/A', ''])]
+
+    assert diff_rows(matches, sheet, CSV_INDICES, SHEET_INDICES) == []
+
+
+def test_short_sheet_rows_and_unmapped_columns():
+    sheet_indices = dict(SHEET_INDICES, subscription=None)
+    sheet = [SHEET_HEADER, ['vmss-1']]
+    matches = [(2, ['VMSS', 'vmss-1', 'Production', 'Standard_B2s', '1', '4', '2'])]
+
+    changes = diff_rows(matches, sheet, CSV_INDICES, sheet_indices)
+
+    assert [(change.field, change.old_value, change.new_value) for change in changes] == [
+        ('SKU', '', 'Standard_B2s'), ('Resource Type', '', 'VMSS'), ('Current Capacity', '', '2'),
+        ('Min Capacity', '', '1'), ('Max Capacity', '', '4')
+    ]
+    assert format_change(changes[0]) == "Updated vmss-1 -> SKU: '' → 'Standard_B2s'"
@@ -0,0 +1,28 @@
+"""The legacy summary is computed by one engine for both updaters."""
+
+import csv
+
+from inventory_index import load_inventory
+from inventory_stats import aggregate_csv
+
+ROWS = [
+    ['ResourceType', 'Name', 'ResourceGroup', 'Subscription', 'SKU', 'Capacity', 'AutoscaleEnabled', 'AutoscaleMaxCapacity'],
+    ['VM', 'vm-1', 'rg', 'Production', 'Standard_B2s', '', 'N/A', 'N/A'],
+    ['VMSS', 'vmss-1', 'rg', 'Production', 'Standard_D2s_v3', '3', 'true', '10'],
+    ['VMSS', 'vmss-2', 'rg', 'Staging', 'Standard_D2s_v3', '2', 'false', '2'],
+    ['MySQL', 'db-1', 'rg', 'Staging', 'GP_Gen5_2'],
+    ['CosmosDB-MongoDB', 'cosmos-1', 'rg', 'Shared Services'],
+    ['Redis', 'cache-1'],
+    ['VM']
+]
+
+
+def test_index_and_engine_report_the_same_summary(tmp_path):
+    csv_file = tmp_path / 'inventory.csv'
+    with open(csv_file, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows(ROWS)
+
+    summary = aggregate_csv(str(csv_file)).legacy_summary()
+    assert load_inventory(str(csv_file)).stats.legacy_summary() == summary
+    assert summary == {'total_resources': 7, 'vms': 2, 'vmss': 2, 'autoscale_enabled': 1, 'mysql': 1,
+                       'postgresql': 0, 'cosmosdb': 1, 'sqldb': 0, 'redis': 1, 'subscriptions': 3}
@@ -0,0 +1,78 @@
+"""OrphanPolicy mode resolution and MissCounterStore bookkeeping."""
+
+import json
+import os
+
+import pytest
+
+from orphan_policy import DEFAULT_ARCHIVE_SHEET, MissCounterStore, OrphanPolicy
+
+SCOPE = MissCounterStore.scope('sheet-id', 'Inventory')
+
+
+class FakeStdin:
+    def __init__(self, tty):
+        self.tty = tty
+
+    def isatty(self):
+        return self.tty
+
+
+@pytest.mark.parametrize('tty, expected', [(True, 'prompt'), (False, 'flag')])
+def test_prompt_falls_back_to_flag_without_a_terminal(monkeypatch, tty, expected):
+    monkeypatch.setattr('sys.stdin', FakeStdin(tty))
+    assert OrphanPolicy().effective_mode() == expected
+
+
+@pytest.mark.parametrize('mode', ['flag', 'delete', 'archive'])
+def test_unattended_modes_ignore_the_terminal(monkeypatch, mode):
+    monkeypatch.setattr('sys.stdin', FakeStdin(False))
+    assert OrphanPolicy(mode=mode).effective_mode() == mode
+
+
+def test_archive_mode_defaults_the_archive_sheet():
+    assert OrphanPolicy(mode='archive').archive_sheet == DEFAULT_ARCHIVE_SHEET
+    assert OrphanPolicy(mode='delete').archive_sheet is None
+    assert OrphanPolicy(mode='delete', archive_sheet='Old').archive_sheet == 'Old'
+
+
+@pytest.mark.parametrize('kwargs', [{'mode': 'purge'}, {'min_misses': 0}])
+def test_invalid_policy_is_rejected(kwargs):
+    with pytest.raises(ValueError):
+        OrphanPolicy(**kwargs)
+
+
+def test_select_for_removal_applies_the_threshold():
+    policy = OrphanPolicy(mode='delete', min_misses=2)
+    assert policy.select_for_removal(['VM-A', 'vm-b', 'vm-c'], {'vm-a': 2, 'vm-b': 1}) == ['VM-A']
+
+
+def test_counters_grow_and_reset_when_rows_reappear(tmp_path):
+    store = MissCounterStore(str(tmp_path / 'misses.json'))
+
+    assert store.record_sync(SCOPE, ['VM-A', 'vm-b']) == {'vm-a': 1, 'vm-b': 1}
+    assert store.record_sync(SCOPE, ['vm-a']) == {'vm-a': 2}
+    assert store.record_sync(SCOPE, ['vm-a', 'vm-b']) == {'vm-a': 3, 'vm-b': 1}
+
+    store.forget(SCOPE, ['VM-A'])
+    assert set(store.state[SCOPE]) == {'vm-b'}
+
+
+def test_save_is_atomic_and_round_trips(tmp_path):
+    state_file = str(tmp_path / 'misses.json')
+    store = MissCounterStore(state_file)
+    store.record_sync(SCOPE, ['vm-a'])
+    store.save()
+
+    assert not os.path.exists(f"{state_file}.tmp")
+    assert MissCounterStore(state_file).record_sync(SCOPE, ['vm-a']) == {'vm-a': 2}
+
+
+def test_corrupt_state_file_starts_over(tmp_path):
+    state_file = tmp_path / 'misses.json'
+    state_file.write_text('{not json', encoding='utf-8')
+
+    store = MissCounterStore(str(state_file))
+    assert store.state == {}
+    store.save()
+    assert json.loads(state_file.read_text(encoding='utf-8')) == {}
@@ -0,0 +1,52 @@
+"""SheetMirror keeps the mapped columns in line with the sheet between syncs."""
+
+import pytest
+
+from inventory_diff import CellChange
+from sheet_mirror import SheetMirror
+
+INDICES = {'group': 0, 'resource_type': 1, 'subscription': 2, 'sku': 3, 'current': 4, 'min': 5, 'max': 6}
+HEADER = ['Group', 'Resource Type', 'Subscription', 'SKU', 'current', 'min', 'max']
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    mirror = SheetMirror(str(tmp_path / 'mirror.db'))
+    yield mirror
+    mirror.close()
+
+
+def rows_by_group(mirror):
+    return {row['group_name']: dict(row) for row in mirror.query()}
+
+
+def test_first_sync_is_full_then_incremental(mirror):
+    sheet = [HEADER, ['vmss-1', 'VMSS', 'Production', 'Standard_D2s_v3', '3', '1', '10']]
+    assert mirror.apply_sync('sheet-id', 'Inventory', sheet, INDICES) == 'full'
+    assert mirror.apply_sync('sheet-id', 'Inventory', sheet, INDICES) == 'incremental'
+    assert rows_by_group(mirror)['vmss-1']['max_capacity'] == 10
+
+
+def test_incremental_sync_picks_up_hand_edits(mirror):
+    sheet = [HEADER, ['vmss-1', 'VMSS', 'Production', 'Standard_D2s_v3', '3', '1', '10'],
+             ['vm-1', 'VM', 'Production', 'Standard_B2s', '', '', '']]
+    mirror.apply_sync('sheet-id', 'Inventory', sheet, INDICES)
+
+    # Edited by hand since the last sync; the CSV has N/A there, so the sync never rewrites them
+    edited = [HEADER, ['vmss-1', 'VMSS', 'Production', 'Standard_D2s_v3', '3', '2', '20'],
+              ['vm-1', 'VM', 'Staging', 'Standard_B2s', '', '', '']]
+    changes = [CellChange(2, 3, 'SKU', 'vmss-1', 'Standard_D2s_v3', 'Standard_D4s_v3')]
+    assert mirror.apply_sync('sheet-id', 'Inventory', edited, INDICES, cell_changes=changes) == 'incremental'
+
+    rows = rows_by_group(mirror)
+    assert (rows['vmss-1']['sku'], rows['vmss-1']['min_capacity'], rows['vmss-1']['max_capacity']) == \
+        ('Standard_D4s_v3', 2, 20)
+    assert rows['vm-1']['subscription'] == 'Staging'
+
+
+def test_added_and_deleted_rows(mirror):
+    sheet = [HEADER, ['vm-1', 'VM', 'Production', 'Standard_B2s'], ['retired-1', 'VM', 'Production', 'Standard_B2s']]
+    mirror.apply_sync('sheet-id', 'Inventory', sheet, INDICES)
+    mirror.apply_sync('sheet-id', 'Inventory', sheet, INDICES,
+                      added_rows=[['vm-2', 'VM', 'Staging', 'Standard_B2s']], deleted_names=['retired-1'])
+    assert sorted(rows_by_group(mirror)) == ['vm-1', 'vm-2']
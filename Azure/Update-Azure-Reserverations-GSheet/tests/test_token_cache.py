@@ -0,0 +1,38 @@
+"""Service account token cache expiry handling in sheets_client.py."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from sheets_client import format_expiry, load_service_account_credentials
+from update_gsheet_service_account import SCOPES
+
+
+def test_seeded_token_is_used(service_account_file, seed_token_cache, tmp_path):
+    seed_token_cache(service_account_file, str(tmp_path), format_expiry(datetime.now(timezone.utc) + timedelta(hours=1)))
+    credentials = load_service_account_credentials(service_account_file, SCOPES, str(tmp_path))
+    assert credentials.token == 'cached-token'
+    assert credentials.valid
+
+
+@pytest.mark.parametrize('offset, expiry_format', [
+    (timedelta(hours=1), '%Y-%m-%dT%H:%M:%S'),  # Caches written before expiries carried an offset
+    (timedelta(hours=1), '%Y-%m-%dT%H:%M:%S%z')
+])
+def test_cached_expiry_is_read_as_utc(service_account_file, seed_token_cache, tmp_path, offset, expiry_format):
+    seed_token_cache(service_account_file, str(tmp_path), (datetime.now(timezone.utc) + offset).strftime(expiry_format))
+    credentials = load_service_account_credentials(service_account_file, SCOPES, str(tmp_path))
+    assert credentials.token == 'cached-token'
+    assert credentials.valid
+
+
+def test_expired_cache_is_ignored(service_account_file, seed_token_cache, tmp_path):
+    seed_token_cache(service_account_file, str(tmp_path), (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat())
+    assert load_service_account_credentials(service_account_file, SCOPES, str(tmp_path)).token is None
+
+
+def test_offset_expiry_is_compared_in_utc(service_account_file, seed_token_cache, tmp_path):
+    # 10 minutes left, written in UTC-05:00: still valid, but not if the offset were ignored
+    local = timezone(timedelta(hours=-5))
+    seed_token_cache(service_account_file, str(tmp_path), (datetime.now(local) + timedelta(minutes=10)).isoformat())
+    assert load_service_account_credentials(service_account_file, SCOPES, str(tmp_path)).token == 'cached-token'
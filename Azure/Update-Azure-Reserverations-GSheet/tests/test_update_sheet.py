@@ -0,0 +1,81 @@
+"""update_gsheet.py clear-and-replace upload against the offline Sheets emulator."""
+
+import csv
+
+import pytest
+
+from sheets_emulator import FAKE_SPREADSHEET_ID, FakeSheetsService
+from update_gsheet import GoogleSheetsUpdater
+
+SHEET_NAME = 'Azure Inventory'
+EXISTING = [['Group', 'SKU'], ['api', 'Standard_B2s']]
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def service():
+    return FakeSheetsService({SHEET_NAME: EXISTING})
+
+
+@pytest.fixture
+def updater(service):
+    updater = GoogleSheetsUpdater()
+    updater.service = service
+    return updater
+
+
+def test_empty_csv_leaves_sheet_untouched(tmp_path, service, updater):
+    csv_file = write_csv(tmp_path / 'inventory.csv', [])
+
+    assert updater.update_sheet(FAKE_SPREADSHEET_ID, SHEET_NAME, csv_file) is False
+    assert service.sheet_values(SHEET_NAME) == EXISTING
+    assert 'values.clear' not in service.summary()['per_method']
+
+
+def test_header_only_csv_replaces_sheet_with_header(tmp_path, service, updater):
+    csv_file = write_csv(tmp_path / 'inventory.csv', [['ResourceType', 'Name', 'SKU']])
+
+    assert updater.update_sheet(FAKE_SPREADSHEET_ID, SHEET_NAME, csv_file) is True
+    assert service.sheet_values(SHEET_NAME) == [['ResourceType', 'Name', 'SKU']]
+
+
+def test_large_csv_grows_grid(tmp_path, service, updater):
+    rows = [[f"r{row}c{column}" for column in range(30)] for row in range(2500)]
+    csv_file = write_csv(tmp_path / 'inventory.csv', rows)
+
+    assert updater.update_sheet(FAKE_SPREADSHEET_ID, SHEET_NAME, csv_file, chunk_rows=400, max_workers=3)
+    assert service.sheet_values(SHEET_NAME) == rows
+    grid = service.spreadsheets().get(spreadsheetId=FAKE_SPREADSHEET_ID).execute()['sheets'][0]['properties']['gridProperties']
+    assert (grid['rowCount'], grid['columnCount']) == (2500, 30)
+
+
+def test_start_cell_offsets_grid_growth(tmp_path, service, updater):
+    rows = [['h1', 'h2']] + [[str(row), 'x'] for row in range(1200)]
+    csv_file = write_csv(tmp_path / 'inventory.csv', rows)
+
+    assert updater.update_sheet(FAKE_SPREADSHEET_ID, SHEET_NAME, csv_file, start_cell='Z5')
+    assert service.sheet_values(SHEET_NAME)[-1][25:] == ['1199', 'x']
+
+
+def test_short_rows(tmp_path, service, updater):
+    rows = [['ResourceType', 'Name', 'Subscription', 'SKU'], ['VM', 'vm-1', 'Production', 'Standard_B2s'],
+            ['VM', 'vm-2'], ['VMSS']]
+    csv_file = write_csv(tmp_path / 'inventory.csv', rows)
+
+    assert updater.update_sheet(FAKE_SPREADSHEET_ID, SHEET_NAME, csv_file)
+    assert service.sheet_values(SHEET_NAME) == rows
+    stats = updater.create_summary_stats(csv_file)
+    assert (stats['total_resources'], stats['vms'], stats['vmss'], stats['subscriptions']) == (3, 2, 1, 1)
+
+
+def test_emulator_rejects_writes_past_grid(service):
+    with pytest.raises(Exception, match='exceeds grid limits'):
+        service.spreadsheets().values().update(
+            spreadsheetId=FAKE_SPREADSHEET_ID, range=f"{SHEET_NAME}!A1000",
+            valueInputOption='RAW', body={'values': [['a'], ['b']]}
+        ).execute()
@@ -0,0 +1,143 @@
+"""update_gsheet_service_account.py selective sync against the offline Sheets emulator."""
+
+import csv
+
+import pytest
+
+from change_journal import ChangeJournal
+from orphan_policy import DEFAULT_ARCHIVE_SHEET, OrphanPolicy
+from sheet_mirror import SheetMirror
+from sheets_emulator import FAKE_SPREADSHEET_ID, FakeSheetsService
+from update_gsheet_service_account import GoogleSheetsServiceAccountUpdater
+
+SHEET_NAME = 'Azure Inventory'
+SHEET_HEADER = ['Group', 'Resource Type', 'Subscription', 'SKU', 'current', 'min', 'max', 'Notes']
+CSV_HEADER = ['ResourceType', 'Name', 'Subscription', 'SKU', 'AutoscaleMinCapacity', 'AutoscaleMaxCapacity',
+              'AutoscaleDefaultCapacity']
+EXISTING = [
+    SHEET_HEADER,
+    ['vm-a', 'VM', 'Production', 'Standard_B2s', '', '', '', 'keep'],
+    ['vmss-b', 'VMSS', 'Production', 'Standard_D2s_v3', '2', '1', '5', ''],
+    ['old-c', 'VM', 'Staging', 'Standard_B2s', '', '', '', 'retired?'],
+    # Mapped cells are blank, so only the full-width table end sees this row
+    ['', '', '', '', '', '', '', 'footnote']
+]
+INVENTORY = [
+    ['VM', 'vm-a', 'Production', 'Standard_D4s_v3', 'N/A', 'N/A', 'N/A'],
+    ['VMSS', 'vmss-b', 'Production', 'Standard_D2s_v3', '1', '5', '3'],
+    ['VMSS', 'new-d', 'Staging', 'Standard_E8s_v5', '2', '6', '4']
+]
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows([CSV_HEADER] + rows)
+    return str(path)
+
+
+def sync(updater, csv_file, tmp_path, mode='flag', **kwargs):
+    policy = OrphanPolicy(mode=mode, state_file=str(tmp_path / 'misses.json'))
+    return updater.update_sheet_selective(FAKE_SPREADSHEET_ID, SHEET_NAME, csv_file, orphan_policy=policy, **kwargs)
+
+
+def batch_requests(service):
+    return [request for call in service.calls if call.method == 'spreadsheets.batchUpdate'
+            for request in call.params['body']['requests']]
+
+
+@pytest.fixture
+def service():
+    return FakeSheetsService({SHEET_NAME: EXISTING})
+
+
+@pytest.fixture
+def updater(service):
+    updater = GoogleSheetsServiceAccountUpdater()
+    updater.service = service
+    return updater
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    return write_csv(tmp_path / 'inventory.csv', INVENTORY)
+
+
+def test_updates_in_place_and_appends_after_last_row(tmp_path, service, updater, csv_file):
+    assert sync(updater, csv_file, tmp_path)
+
+    rows = service.sheet_values(SHEET_NAME)
+    assert rows[1] == ['vm-a', 'VM', 'Production', 'Standard_D4s_v3', '', '', '', 'keep']
+    assert rows[2] == ['vmss-b', 'VMSS', 'Production', 'Standard_D2s_v3', '3', '1', '5']
+    assert rows[4] == ['', '', '', '', '', '', '', 'footnote']
+    assert rows[5] == ['new-d', 'VMSS', 'Staging', 'Standard_E8s_v5', '4', '2', '6']
+    assert len(rows) == 6
+
+
+def test_flag_policy_leaves_orphans_in_place(tmp_path, service, updater, csv_file):
+    assert sync(updater, csv_file, tmp_path, mode='flag')
+
+    assert service.sheet_values(SHEET_NAME)[3][0] == 'old-c'
+    assert batch_requests(service) == []
+
+
+def test_delete_policy_removes_orphans_in_one_batch(tmp_path, service, updater, csv_file):
+    assert sync(updater, csv_file, tmp_path, mode='delete')
+
+    requests = batch_requests(service)
+    assert [request['deleteDimension']['range']['startIndex'] for request in requests] == [3]
+    assert [row[0] for row in service.sheet_values(SHEET_NAME)] == ['Group', 'vm-a', 'vmss-b', '', 'new-d']
+
+
+def test_archive_policy_copies_full_rows_before_deleting(tmp_path, service, updater, csv_file):
+    assert sync(updater, csv_file, tmp_path, mode='archive')
+
+    assert [list(request) for request in batch_requests(service)] == [['addSheet'], ['appendCells'], ['deleteDimension']]
+    archived = service.sheet_values(DEFAULT_ARCHIVE_SHEET)
+    assert archived[0] == SHEET_HEADER + ['Archived At']
+    assert archived[1][:-1] == EXISTING[3]
+    assert 'old-c' not in [row[0] for row in service.sheet_values(SHEET_NAME)]
+
+
+def test_duplicate_groups_update_first_and_delete_every_orphan(tmp_path, updater):
+    service = FakeSheetsService({SHEET_NAME: [
+        SHEET_HEADER,
+        ['vm-a', 'VM', 'Production', 'Standard_B2s'],
+        ['dup', 'VM', 'Staging', 'Standard_B2s'],
+        ['dup', 'VM', 'Staging', 'Standard_B2s'],
+        ['VM-A', 'VM', 'Production', 'Standard_B2s'],
+        ['dup', 'VM', 'Staging', 'Standard_B2s']
+    ]})
+    updater.service = service
+    csv_file = write_csv(tmp_path / 'inventory.csv', [INVENTORY[0]])
+
+    assert sync(updater, csv_file, tmp_path, mode='delete')
+
+    ranges = [(request['deleteDimension']['range']['startIndex'], request['deleteDimension']['range']['endIndex'])
+              for request in batch_requests(service)]
+    assert ranges == [(5, 6), (2, 4)]  # adjacent duplicates merged, bottom-up
+    assert service.sheet_values(SHEET_NAME)[1:] == [
+        ['vm-a', 'VM', 'Production', 'Standard_D4s_v3'],
+        ['VM-A', 'VM', 'Production', 'Standard_B2s']
+    ]
+
+
+def test_journal_and_mirror_follow_the_sync(tmp_path, service, updater, csv_file):
+    journal = ChangeJournal(str(tmp_path / 'journal.db'))
+    mirror = SheetMirror(str(tmp_path / 'mirror.db'))
+    try:
+        assert sync(updater, csv_file, tmp_path, mode='delete', journal=journal, mirror=mirror)
+
+        entries = {(row['action'], row['resource'], row['field'], row['new_value']) for row in journal.history()}
+        assert ('updated', 'vm-a', 'SKU', 'Standard_D4s_v3') in entries
+        assert ('updated', 'vmss-b', 'Current Capacity', '3') in entries
+        assert ('added', 'new-d', 'Max Capacity', '6') in entries
+        assert ('deleted', 'old-c', '', '') in entries
+
+        mirrored = {row['group_name']: row for row in mirror.query()}
+        assert set(mirrored) == {'vm-a', 'vmss-b', 'new-d'}
+        assert mirrored['vm-a']['sku'] == 'Standard_D4s_v3'
+        assert mirrored['vmss-b']['current_capacity'] == 3
+        assert mirrored['new-d']['max_capacity'] == 6
+    finally:
+        journal.close()
+        mirror.close()
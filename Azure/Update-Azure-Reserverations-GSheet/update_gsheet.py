@@ -12,29 +12,31 @@ import os
 import sys
 import csv
 import argparse
-from typing import List, Dict, Any
+from typing import Any, Dict, List, Tuple
 import json
 import logging
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-try:
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-    from google.oauth2.credentials import Credentials
-    from google_auth_oauthlib.flow import InstalledAppFlow
-except ImportError as e:
-    print(f"Error: Required Google API libraries not installed. Run: pip install -r requirements.txt")
-    print(f"Missing: {e}")
-    sys.exit(1)
+from inventory_stats import aggregate_csv
+from sheets_client import MISSING_LIBRARIES_MESSAGE, SHEET_METADATA_FIELDS, build_sheets_service
 
 # Google Sheets API scope
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
+# Streaming upload defaults: rows per values().update request and concurrent requests
+DEFAULT_CHUNK_ROWS = 5000
+DEFAULT_UPLOAD_WORKERS = 4
+
 class GoogleSheetsUpdater:
     def __init__(self, credentials_file: str = 'credentials.json', token_file: str = 'token.json'):
         """Initialize the Google Sheets updater."""
         self.credentials_file = credentials_file
         self.token_file = token_file
         self.service = None
+        self.credentials = None
+        self._thread_local = threading.local()
         self.logger = self._setup_logging()
     
     def _setup_logging(self) -> logging.Logger:
@@ -48,6 +50,16 @@ class GoogleSheetsUpdater:
     
     def authenticate(self) -> bool:
         """Authenticate with Google Sheets API."""
+        # Google libraries are imported here rather than at module load to keep --help and imports fast
+        try:
+            from google.auth.transport.requests import Request
+            from google.oauth2.credentials import Credentials
+            from google_auth_oauthlib.flow import InstalledAppFlow
+        except ImportError as e:
+            self.logger.error(f"Error: {MISSING_LIBRARIES_MESSAGE}")
+            self.logger.error(f"Missing: {e}")
+            return False
+        
         creds = None
         
         # Load existing token
@@ -94,7 +106,8 @@ class GoogleSheetsUpdater:
                 self.logger.warning(f"Could not save token: {e}")
         
         try:
-            self.service = build('sheets', 'v4', credentials=creds)
+            self.service = build_sheets_service(creds)
+            self.credentials = creds
             self.logger.info("Google Sheets API service initialized successfully")
             return True
         except Exception as e:
@@ -104,7 +117,10 @@ class GoogleSheetsUpdater:
     def get_sheet_info(self, spreadsheet_id: str) -> Dict[str, Any]:
         """Get information about the spreadsheet."""
         try:
-            sheet_metadata = self.service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+            sheet_metadata = self.service.spreadsheets().get(
+                spreadsheetId=spreadsheet_id,
+                fields=SHEET_METADATA_FIELDS
+            ).execute()
             return sheet_metadata
         except Exception as e:
             self.logger.error(f"Error getting sheet info: {e}")
@@ -124,52 +140,166 @@ class GoogleSheetsUpdater:
             self.logger.error(f"Error reading CSV file: {e}")
             return []
     
+    def _thread_http(self):
+        """Return an authorized HTTP object owned by the calling thread (httplib2 is not thread-safe)."""
+        if self.credentials is None:
+            return None
+        http = getattr(self._thread_local, 'http', None)
+        if http is None:
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
+            http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+            self._thread_local.http = http
+        return http
+    
+    def _upload_chunk(self, spreadsheet_id: str, range_name: str, rows: List[List[str]]) -> int:
+        """Write one chunk of rows and return the number of updated cells."""
+        result = self.service.spreadsheets().values().update(
+            spreadsheetId=spreadsheet_id,
+            range=range_name,
+            valueInputOption='RAW',
+            body={'values': rows}
+        ).execute(http=self._thread_http())
+        return result.get('updatedCells', 0)
+    
+    def _measure_csv(self, csv_file: str) -> Tuple[int, int]:
+        """Return (rows, widest row) of a CSV in one streaming pass."""
+        rows, columns = 0, 0
+        with open(csv_file, 'r', encoding='utf-8', newline='') as file:
+            for row in csv.reader(file):
+                rows += 1
+                columns = max(columns, len(row))
+        return rows, columns
+    
+    def _ensure_grid_size(self, spreadsheet_id: str, properties: Dict[str, Any], rows: int, columns: int) -> None:
+        """Grow the sheet's grid so rows x columns fit; the grid is never shrunk."""
+        grid = properties.get('gridProperties', {})
+        row_count, column_count = grid.get('rowCount', 0), grid.get('columnCount', 0)
+        if rows <= row_count and columns <= column_count:
+            return
+        row_count, column_count = max(rows, row_count), max(columns, column_count)
+        self.logger.info(f"Resizing sheet '{properties['title']}' to {row_count} rows x {column_count} columns")
+        self.service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'requests': [{
+                'updateSheetProperties': {
+                    'properties': {
+                        'sheetId': properties['sheetId'],
+                        'gridProperties': {'rowCount': row_count, 'columnCount': column_count}
+                    },
+                    'fields': 'gridProperties.rowCount,gridProperties.columnCount'
+                }
+            }]}
+        ).execute()
+        properties['gridProperties'] = dict(grid, rowCount=row_count, columnCount=column_count)
+    
     def update_sheet(self, spreadsheet_id: str, sheet_name: str, csv_file: str, 
-                    start_cell: str = 'A1', clear_existing: bool = True) -> bool:
-        """Update Google Sheet with data from CSV file."""
+                    start_cell: str = 'A1', clear_existing: bool = True,
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS, max_workers: int = DEFAULT_UPLOAD_WORKERS,
+                    resume_from_row: int = 0) -> bool:
+        """Update Google Sheet with data from CSV file.
+        
+        The CSV is streamed and uploaded in chunks of `chunk_rows` rows with up to
+        `max_workers` requests in flight. `resume_from_row` skips CSV rows that were
+        already written by an earlier, interrupted run (and skips the clear).
+        """
         
         if not self.service:
             self.logger.error("Google Sheets service not initialized. Call authenticate() first.")
             return False
         
-        # Read CSV data
-        data = self.read_csv_data(csv_file)
-        if not data:
-            self.logger.error("No data to update")
+        if not os.path.exists(csv_file):
+            self.logger.error(f"Error reading CSV file: '{csv_file}' not found")
+            return False
+        
+        cell_match = re.match(r'^([A-Za-z]+)(\d+)$', start_cell)
+        if not cell_match:
+            self.logger.error(f"Invalid start cell '{start_cell}' (expected e.g. A1)")
             return False
+        start_column, start_row = cell_match.group(1).upper(), int(cell_match.group(2))
         
         try:
             # Get sheet info to verify sheet exists
             sheet_metadata = self.get_sheet_info(spreadsheet_id)
-            sheet_names = [sheet['properties']['title'] for sheet in sheet_metadata.get('sheets', [])]
+            sheet_properties = {sheet['properties']['title']: sheet['properties']
+                                for sheet in sheet_metadata.get('sheets', [])}
+            
+            if sheet_name not in sheet_properties:
+                self.logger.error(f"Sheet '{sheet_name}' not found. Available sheets: {list(sheet_properties)}")
+                return False
             
-            if sheet_name not in sheet_names:
-                self.logger.error(f"Sheet '{sheet_name}' not found. Available sheets: {sheet_names}")
+            # Size the upload before touching the sheet: an empty CSV must not clear it
+            # (a header-only CSV still replaces the sheet with just the header)
+            csv_rows, csv_columns = self._measure_csv(csv_file)
+            if csv_rows == 0 or csv_rows <= resume_from_row:
+                self.logger.error("No data to update")
                 return False
             
-            # Clear existing data if requested
-            if clear_existing:
-                self.logger.info(f"Clearing existing data in sheet '{sheet_name}'")
-                clear_range = f"{sheet_name}!A:Z"  # Clear columns A through Z
+            # Writes past the grid fail with "exceeds grid limits", so grow it first
+            self._ensure_grid_size(spreadsheet_id, sheet_properties[sheet_name],
+                                   start_row - 1 + csv_rows,
+                                   self._column_letter_to_number(start_column) - 1 + csv_columns)
+            
+            # Clear existing data if requested, sized to the sheet's real grid (not just A:Z)
+            if clear_existing and resume_from_row == 0:
+                grid = sheet_properties[sheet_name].get('gridProperties', {})
+                last_column = self._column_number_to_letter(grid.get('columnCount', 26))
+                clear_range = f"{sheet_name}!A1:{last_column}{grid.get('rowCount', 1000)}"
+                self.logger.info(f"Clearing existing data in sheet '{sheet_name}' ({clear_range})")
                 self.service.spreadsheets().values().clear(
                     spreadsheetId=spreadsheet_id,
                     range=clear_range
                 ).execute()
+            elif resume_from_row:
+                self.logger.info(f"Resuming upload at CSV row {resume_from_row} (existing data is kept)")
             
-            # Update with new data
-            range_name = f"{sheet_name}!{start_cell}"
-            body = {
-                'values': data
-            }
+            # Stream the CSV and upload it in row chunks with bounded parallelism
+            updated_cells = 0
+            rows_read = 0
+            failed_offsets = []
+            pending = {}
             
-            result = self.service.spreadsheets().values().update(
-                spreadsheetId=spreadsheet_id,
-                range=range_name,
-                valueInputOption='RAW',
-                body=body
-            ).execute()
+            def collect(done_futures):
+                nonlocal updated_cells
+                for future in done_futures:
+                    offset = pending.pop(future)
+                    try:
+                        updated_cells += future.result()
+                    except Exception as e:
+                        self.logger.error(f"Chunk starting at CSV row {offset} failed: {e}")
+                        failed_offsets.append(offset)
             
-            updated_cells = result.get('updatedCells', 0)
+            with open(csv_file, 'r', encoding='utf-8', newline='') as file, \
+                    ThreadPoolExecutor(max_workers=max_workers) as executor:
+                csv_reader = csv.reader(file)
+                chunk, chunk_offset = [], resume_from_row
+                for row_offset, row in enumerate(csv_reader):
+                    rows_read += 1
+                    if row_offset < resume_from_row:
+                        continue
+                    chunk.append(row)
+                    if len(chunk) < chunk_rows:
+                        continue
+                    
+                    # Keep at most 2x max_workers chunks in memory
+                    if len(pending) >= max_workers * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    range_name = f"{sheet_name}!{start_column}{start_row + chunk_offset}"
+                    pending[executor.submit(self._upload_chunk, spreadsheet_id, range_name, chunk)] = chunk_offset
+                    chunk, chunk_offset = [], row_offset + 1
+                
+                if chunk:
+                    range_name = f"{sheet_name}!{start_column}{start_row + chunk_offset}"
+                    pending[executor.submit(self._upload_chunk, spreadsheet_id, range_name, chunk)] = chunk_offset
+                collect(wait(pending).done)
+            
+            if failed_offsets:
+                resume_row = min(failed_offsets)
+                self.logger.error(f"{len(failed_offsets)} chunk(s) failed. Re-run with --no-clear --resume-from-row {resume_row} to finish the upload")
+                return False
+            
+            self.logger.info(f"Read {rows_read} rows from {csv_file}")
             self.logger.info(f"Successfully updated {updated_cells} cells in '{sheet_name}'")
             return True
             
@@ -177,58 +307,29 @@ class GoogleSheetsUpdater:
             self.logger.error(f"Error updating sheet: {e}")
             return False
     
+    def _column_letter_to_number(self, column_letter: str) -> int:
+        """Convert Excel-style column letter to number (A=1, AA=27)."""
+        column_number = 0
+        for char in column_letter.upper():
+            column_number = column_number * 26 + (ord(char) - ord('A') + 1)
+        return column_number
+    
+    def _column_number_to_letter(self, column_number: int) -> str:
+        """Convert column number to Excel-style letter (1=A, 2=B, etc.)."""
+        column_letter = ""
+        while column_number > 0:
+            column_number -= 1
+            column_letter = chr(column_number % 26 + ord('A')) + column_letter
+            column_number //= 26
+        return column_letter
+    
     def create_summary_stats(self, csv_file: str) -> Dict[str, int]:
-        """Create summary statistics from CSV data."""
-        stats = {
-            'total_resources': 0,
-            'vms': 0,
-            'vmss': 0,
-            'autoscale_enabled': 0,
-            'mysql': 0,
-            'postgresql': 0,
-            'cosmosdb': 0,
-            'sqldb': 0,
-            'redis': 0,
-            'subscriptions': set()
-        }
-        
+        """Create summary statistics from CSV data (one streaming pass, see inventory_stats.py)."""
         try:
-            with open(csv_file, 'r', encoding='utf-8') as file:
-                csv_reader = csv.DictReader(file)
-                for row in csv_reader:
-                    stats['total_resources'] += 1
-                    
-                    resource_type = row.get('ResourceType', '').upper()
-                    
-                    # Handle VM/VMSS resources (for backward compatibility)
-                    if resource_type == 'VM':
-                        stats['vms'] += 1
-                    elif resource_type == 'VMSS':
-                        stats['vmss'] += 1
-                        if row.get('AutoscaleEnabled', '').lower() == 'true':
-                            stats['autoscale_enabled'] += 1
-                    
-                    # Handle database resources
-                    elif resource_type == 'MYSQL':
-                        stats['mysql'] += 1
-                    elif resource_type == 'POSTGRESQL':
-                        stats['postgresql'] += 1
-                    elif resource_type == 'COSMOSDB' or resource_type.startswith('COSMOSDB-'):
-                        stats['cosmosdb'] += 1
-                    elif resource_type == 'SQLDB':
-                        stats['sqldb'] += 1
-                    elif resource_type == 'REDIS':
-                        stats['redis'] += 1
-                    
-                    if row.get('Subscription'):
-                        stats['subscriptions'].add(row['Subscription'])
-            
-            stats['subscriptions'] = len(stats['subscriptions'])
-            
+            return aggregate_csv(csv_file).legacy_summary()
         except Exception as e:
             self.logger.error(f"Error creating summary stats: {e}")
-        
-        return stats
+            raise
 
 def main():
     parser = argparse.ArgumentParser(
@@ -246,6 +347,12 @@ def main():
                        help='Path to Google API credentials file (default: credentials.json)')
     parser.add_argument('--token', default='token.json',
                        help='Path to token file (default: token.json)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                       help=f'Rows per upload request (default: {DEFAULT_CHUNK_ROWS})')
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_UPLOAD_WORKERS,
+                       help=f'Concurrent upload requests (default: {DEFAULT_UPLOAD_WORKERS})')
+    parser.add_argument('--resume-from-row', type=int, default=0,
+                       help='Skip the first N CSV rows (header included) already uploaded by a failed run')
     parser.add_argument('--verbose', '-v', action='store_true', 
                        help='Enable verbose logging')
     
@@ -276,12 +383,19 @@ def main():
         sheet_name=args.sheet_name,
         csv_file=args.csv_file,
         start_cell=args.start_cell,
-        clear_existing=not args.no_clear
+        clear_existing=not args.no_clear,
+        chunk_rows=args.chunk_rows,
+        max_workers=args.max_workers,
+        resume_from_row=args.resume_from_row
     )
     
     if success:
         # Show summary statistics
-        stats = updater.create_summary_stats(args.csv_file)
+        try:
+            stats = updater.create_summary_stats(args.csv_file)
+        except Exception:
+            print("Google Sheet updated, but the summary statistics could not be computed.")
+            sys.exit(1)
         print("\n=== Update Summary ===")
         print(f"Total Resources: {stats['total_resources']}")
         
@@ -9,21 +9,26 @@ import os
 import sys
 import csv
 import argparse
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional
 import json
 import logging
+import sqlite3
+from datetime import datetime
 
-try:
-    from googleapiclient.discovery import build
-    from google.oauth2 import service_account
-except ImportError as e:
-    print(f"Error: Required Google API libraries not installed. Run: pip install -r requirements.txt")
-    print(f"Missing: {e}")
-    sys.exit(1)
+from change_journal import DEFAULT_JOURNAL_FILE, ChangeJournal, JournalEntry
+from column_mapping import GSHEET_COLUMN_ALIASES, find_column_index, map_columns
+from inventory_diff import FIELD_MAPPINGS, CellChange, diff_rows, format_change
+from inventory_index import InventoryIndex, load_inventory
+from inventory_stats import InventoryStats
+from orphan_policy import DEFAULT_STATE_FILE, ORPHAN_POLICY_MODES, MissCounterStore, OrphanPolicy
+from sheet_mirror import DEFAULT_MIRROR_FILE, SheetMirror
+from sheets_client import (MISSING_LIBRARIES_MESSAGE, SHEET_METADATA_FIELDS, build_sheets_service, ensure_token,
+                           load_service_account_credentials)
 
 # Google Sheets API scope
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 SERVICE_ACCOUNT_FILE = 'service-account-key.json'
+CELL_UPDATE_BATCH_SIZE = 1000  # Cells per values().batchUpdate request
 
 class GoogleSheetsServiceAccountUpdater:
     def __init__(self, service_account_file: str = SERVICE_ACCOUNT_FILE):
@@ -31,6 +36,8 @@ class GoogleSheetsServiceAccountUpdater:
         self.service_account_file = service_account_file
         self.service = None
         self.logger = self._setup_logging()
+        self._inventory_cache = {}
+        self._sheet_info_cache = {}
     
     def _setup_logging(self) -> logging.Logger:
         """Set up logging configuration."""
@@ -54,30 +61,40 @@ class GoogleSheetsServiceAccountUpdater:
             return False
         
         try:
-            # Load service account credentials
-            credentials = service_account.Credentials.from_service_account_file(
-                self.service_account_file, scopes=SCOPES)
+            # Load service account credentials (reuses a cached access token while it is valid)
+            credentials = load_service_account_credentials(self.service_account_file, SCOPES)
+            if ensure_token(credentials, SCOPES):
+                self.logger.info("Fetched new service account access token")
             
-            # Build the service
-            self.service = build('sheets', 'v4', credentials=credentials)
-            
-            # Get service account email for user reference
-            with open(self.service_account_file, 'r') as f:
-                service_info = json.load(f)
-                service_email = service_info.get('client_email', 'unknown')
+            # Build the service from the bundled discovery document (no discovery request)
+            self.service = build_sheets_service(credentials)
             
             self.logger.info(f"Google Sheets API service initialized successfully")
-            self.logger.info(f"Service account: {service_email}")
+            self.logger.info(f"Service account: {credentials.service_account_email}")
             return True
             
+        except ImportError as e:
+            self.logger.error(f"Error: {MISSING_LIBRARIES_MESSAGE}")
+            self.logger.error(f"Missing: {e}")
+            return False
         except Exception as e:
             self.logger.error(f"Authentication failed: {e}")
             return False
     
-    def get_sheet_info(self, spreadsheet_id: str) -> Dict[str, Any]:
-        """Get information about the spreadsheet."""
+    def get_sheet_info(self, spreadsheet_id: str, refresh: bool = False) -> Dict[str, Any]:
+        """Get information about the spreadsheet.
+        
+        Metadata is fetched once per updater and reused until invalidate_sheet_info() is
+        called after a structural change (rows deleted/appended, tabs added).
+        """
+        if not refresh and spreadsheet_id in self._sheet_info_cache:
+            return self._sheet_info_cache[spreadsheet_id]
         try:
-            sheet_metadata = self.service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+            sheet_metadata = self.service.spreadsheets().get(
+                spreadsheetId=spreadsheet_id,
+                fields=SHEET_METADATA_FIELDS
+            ).execute()
+            self._sheet_info_cache[spreadsheet_id] = sheet_metadata
             return sheet_metadata
         except Exception as e:
             self.logger.error(f"Error getting sheet info: {e}")
@@ -85,6 +102,13 @@ class GoogleSheetsServiceAccountUpdater:
                 self.logger.error("Make sure you've shared the Google Sheet with the service account email!")
             return {}
     
+    def invalidate_sheet_info(self, spreadsheet_id: Optional[str] = None) -> None:
+        """Drop cached metadata for one spreadsheet (or all) after a structural change."""
+        if spreadsheet_id is None:
+            self._sheet_info_cache.clear()
+        else:
+            self._sheet_info_cache.pop(spreadsheet_id, None)
+    
     def read_csv_data(self, csv_file: str) -> List[List[str]]:
         """Read data from CSV file."""
         data = []
@@ -99,16 +123,43 @@ class GoogleSheetsServiceAccountUpdater:
             self.logger.error(f"Error reading CSV file: {e}")
             return []
     
-    def update_sheet_selective(self, spreadsheet_id: str, sheet_name: str, csv_file: str) -> bool:
-        """Selectively update Google Sheet with data from CSV file - only update specific columns where values differ."""
+    def load_inventory(self, csv_file: str) -> Optional[InventoryIndex]:
+        """Stream the CSV once into an InventoryIndex (cached per file version)."""
+        try:
+            file_stat = os.stat(csv_file)
+            cache_key = (os.path.abspath(csv_file), file_stat.st_mtime_ns, file_stat.st_size)
+            if cache_key not in self._inventory_cache:
+                self._inventory_cache = {cache_key: load_inventory(csv_file)}
+                inventory = self._inventory_cache[cache_key]
+                if inventory is not None:
+                    self.logger.info(f"Indexed {len(inventory.rows)} resources from {csv_file}")
+            return self._inventory_cache[cache_key]
+        except Exception as e:
+            self.logger.error(f"Error reading CSV file: {e}")
+            return None
+    
+    def update_sheet_selective(self, spreadsheet_id: str, sheet_name: str, csv_file: Optional[str] = None,
+                               archive_sheet: Optional[str] = None,
+                               orphan_policy: Optional[OrphanPolicy] = None,
+                               inventory: Optional[InventoryIndex] = None,
+                               journal: Optional[ChangeJournal] = None,
+                               mirror: Optional[SheetMirror] = None) -> bool:
+        """Selectively update Google Sheet with data from CSV file - only update specific columns where values differ.
+        
+        Pass `inventory` instead of `csv_file` to sync rows that were collected in-process
+        (see azure_inventory_collector.py). When `journal` is given, the change set is
+        appended to it after the sheet has been written (see change_journal.py); `mirror`
+        is updated from the same change set (see sheet_mirror.py).
+        """
         
         if not self.service:
             self.logger.error("Google Sheets service not initialized. Call authenticate() first.")
             return False
         
-        # Read CSV data
-        csv_data = self.read_csv_data(csv_file)
-        if not csv_data:
+        # Stream CSV data into the match index
+        if inventory is None:
+            inventory = self.load_inventory(csv_file)
+        if inventory is None:
             self.logger.error("No data to update")
             return False
         
@@ -124,49 +175,27 @@ class GoogleSheetsServiceAccountUpdater:
                 self.logger.error(f"Sheet '{sheet_name}' not found. Available sheets: {sheet_names}")
                 return False
             
-            # Read existing sheet data
+            # Read the header row first, then only the columns the sync compares
             self.logger.info(f"Reading existing data from sheet '{sheet_name}'")
-            range_name = f"{sheet_name}!A:Z"  # Read all columns
-            sheet_result = self.service.spreadsheets().values().get(
+            header_result = self.service.spreadsheets().values().get(
                 spreadsheetId=spreadsheet_id,
-                range=range_name
+                range=f"{sheet_name}!1:1"
             ).execute()
             
-            existing_data = sheet_result.get('values', [])
-            if not existing_data:
+            gsheet_header = (header_result.get('values') or [[]])[0]
+            if not gsheet_header:
                 self.logger.error("No existing data found in sheet")
                 return False
             
             # Find column indices in both CSV and GSheet
-            csv_header = csv_data[0] if csv_data else []
-            gsheet_header = existing_data[0] if existing_data else []
+            csv_header = inventory.header
             
             self.logger.info(f"CSV columns: {csv_header}")
             self.logger.info(f"GSheet columns: {gsheet_header}")
             
-            # Map CSV columns to indices
-            csv_indices = {
-                'name': self._find_column_index(csv_header, ['Name']),
-                'sku': self._find_column_index(csv_header, ['SKU']),
-                'subscription': self._find_column_index(csv_header, ['Subscription']),
-                'resource_group': self._find_column_index(csv_header, ['ResourceGroup']),
-                'location': self._find_column_index(csv_header, ['Location']),
-                'resource_type': self._find_column_index(csv_header, ['ResourceType']),
-                'autoscale_min': self._find_column_index(csv_header, ['AutoscaleMinCapacity']),
-                'autoscale_max': self._find_column_index(csv_header, ['AutoscaleMaxCapacity']),
-                'autoscale_current': self._find_column_index(csv_header, ['AutoscaleDefaultCapacity'])
-            }
-            
-            # Map GSheet columns to indices (case-insensitive search)
-            gsheet_indices = {
-                'group': self._find_column_index(gsheet_header, ['Group'], case_sensitive=False),
-                'sku': self._find_column_index(gsheet_header, ['SKU'], case_sensitive=False),
-                'subscription': self._find_column_index(gsheet_header, ['Subscription'], case_sensitive=False),
-                'resource_type': self._find_column_index(gsheet_header, ['Resource Type', 'ResourceType', 'Type'], case_sensitive=False),
-                'current': self._find_column_index(gsheet_header, ['current'], case_sensitive=False),
-                'min': self._find_column_index(gsheet_header, ['min'], case_sensitive=False),
-                'max': self._find_column_index(gsheet_header, ['max'], case_sensitive=False)
-            }
+            # Map CSV and GSheet columns to indices in one pass per header
+            csv_indices = inventory.columns
+            gsheet_indices = map_columns(gsheet_header, GSHEET_COLUMN_ALIASES)
             
             self.logger.info(f"CSV column mapping: {csv_indices}")
             self.logger.info(f"GSheet column mapping: {gsheet_indices}")
@@ -179,145 +208,60 @@ class GoogleSheetsServiceAccountUpdater:
                 self.logger.error("GSheet 'Group' column not found")
                 return False
             
-            # Process updates
+            # Sparse rows: mapped columns are filled in, everything else is left empty
+            existing_data = self.read_mapped_columns(spreadsheet_id, sheet_name, gsheet_indices.values())
+            existing_data[0] = gsheet_header
+            
+            # Index GSheet rows by lower-cased group name (updates go to the first occurrence)
+            gsheet_rows_by_group = {}
+            for idx, gsheet_row in enumerate(existing_data[1:], start=2):  # Skip header
+                if len(gsheet_row) > gsheet_indices['group']:
+                    gsheet_group = gsheet_row[gsheet_indices['group']].strip()
+                    if gsheet_group:
+                        gsheet_rows_by_group.setdefault(gsheet_group.lower(), []).append(idx)
+            
+            # Match CSV resources to sheet rows
             changes_made = []
             new_resources = []
+            matched_rows = []
+            sample_groups = [existing_data[rows[0] - 1][gsheet_indices['group']].strip()
+                             for rows in list(gsheet_rows_by_group.values())[:10]]
             
-            # Skip CSV header row
-            for csv_row_idx, csv_row in enumerate(csv_data[1:], start=2):
-                if not csv_row or len(csv_row) <= csv_indices['name']:
-                    continue
-                
+            for csv_row_idx, csv_row in inventory.rows:
                 resource_name = csv_row[csv_indices['name']].strip()
-                if not resource_name:
-                    continue
                 
                 self.logger.info(f"Processing CSV resource: {resource_name}")
                 
                 # Find matching row in GSheet (exact match only, case-insensitive)
-                gsheet_row_idx = None
-                for idx, gsheet_row in enumerate(existing_data[1:], start=2):  # Skip header
-                    if len(gsheet_row) <= gsheet_indices['group']:
-                        continue
-                        
-                    gsheet_group = gsheet_row[gsheet_indices['group']].strip()
-                    if not gsheet_group:
-                        continue
-                    
-                    # Only exact match (case-insensitive)
-                    if gsheet_group.lower() == resource_name.lower():
-                        gsheet_row_idx = idx
-                        self.logger.info(f"Exact match found: '{resource_name}' = '{gsheet_group}'")
-                        break
-                
+                gsheet_row_idx = gsheet_rows_by_group.get(resource_name.lower(), [None])[0]
                 if gsheet_row_idx is not None:
-                    # Resource found - check for updates
-                    gsheet_row = existing_data[gsheet_row_idx - 1]  # Adjust for 0-based indexing
-                    updates_needed = []
-                    
-                    # Check SKU
-                    if (csv_indices['sku'] is not None and 
-                        gsheet_indices['sku'] is not None and 
-                        len(csv_row) > csv_indices['sku']):
-                        
-                        csv_sku = csv_row[csv_indices['sku']].strip()
-                        gsheet_sku = gsheet_row[gsheet_indices['sku']].strip() if len(gsheet_row) > gsheet_indices['sku'] else ""
-                        
-                        if csv_sku and (not gsheet_sku or csv_sku != gsheet_sku):
-                            updates_needed.append({
-                                'column': gsheet_indices['sku'],
-                                'value': csv_sku,
-                                'field': 'SKU',
-                                'old_value': gsheet_sku
-                            })
-                    
-                    # Check Subscription
-                    if (csv_indices['subscription'] is not None and 
-                        gsheet_indices['subscription'] is not None and 
-                        len(csv_row) > csv_indices['subscription']):
-                        
-                        csv_subscription = csv_row[csv_indices['subscription']].strip()
-                        gsheet_subscription = gsheet_row[gsheet_indices['subscription']].strip() if len(gsheet_row) > gsheet_indices['subscription'] else ""
-                        
-                        if csv_subscription and (not gsheet_subscription or csv_subscription != gsheet_subscription):
-                            updates_needed.append({
-                                'column': gsheet_indices['subscription'],
-                                'value': csv_subscription,
-                                'field': 'Subscription',
-                                'old_value': gsheet_subscription
-                            })
-                    
-                    # Check Resource Type
-                    if (csv_indices['resource_type'] is not None and 
-                        gsheet_indices['resource_type'] is not None and 
-                        len(csv_row) > csv_indices['resource_type']):
-                        
-                        csv_resource_type = csv_row[csv_indices['resource_type']].strip()
-                        gsheet_resource_type = gsheet_row[gsheet_indices['resource_type']].strip() if len(gsheet_row) > gsheet_indices['resource_type'] else ""
-                        
-                        if csv_resource_type and (not gsheet_resource_type or csv_resource_type != gsheet_resource_type):
-                            updates_needed.append({
-                                'column': gsheet_indices['resource_type'],
-                                'value': csv_resource_type,
-                                'field': 'Resource Type',
-                                'old_value': gsheet_resource_type
-                            })
-                    
-                    # Check autoscale values
-                    autoscale_mappings = [
-                        ('autoscale_current', 'current', 'Current Capacity'),
-                        ('autoscale_min', 'min', 'Min Capacity'),
-                        ('autoscale_max', 'max', 'Max Capacity')
-                    ]
-                    
-                    for csv_key, gsheet_key, field_name in autoscale_mappings:
-                        if (csv_indices[csv_key] is not None and 
-                            gsheet_indices[gsheet_key] is not None and 
-                            len(csv_row) > csv_indices[csv_key]):
-                            
-                            csv_value = csv_row[csv_indices[csv_key]].strip()
-                            gsheet_value = gsheet_row[gsheet_indices[gsheet_key]].strip() if len(gsheet_row) > gsheet_indices[gsheet_key] else ""
-                            
-                            # Only update if CSV has a meaningful value and it's different
-                            if csv_value and csv_value.lower() not in ['n/a', '', 'null']:
-                                if not gsheet_value or csv_value != gsheet_value:
-                                    updates_needed.append({
-                                        'column': gsheet_indices[gsheet_key],
-                                        'value': csv_value,
-                                        'field': field_name,
-                                        'old_value': gsheet_value
-                                    })
-                    
-                    # Apply updates if needed
-                    if updates_needed:
-                        for update in updates_needed:
-                            cell_address = f"{sheet_name}!{self._column_number_to_letter(update['column'] + 1)}{gsheet_row_idx}"
-                            
-                            self.service.spreadsheets().values().update(
-                                spreadsheetId=spreadsheet_id,
-                                range=cell_address,
-                                valueInputOption='RAW',
-                                body={'values': [[update['value']]]}
-                            ).execute()
-                            
-                            change_msg = f"Updated {resource_name} -> {update['field']}: '{update['old_value']}' → '{update['value']}'"
-                            changes_made.append(change_msg)
-                            self.logger.info(change_msg)
+                    self.logger.info(f"Exact match found: '{resource_name}' (sheet row {gsheet_row_idx})")
+                    matched_rows.append((gsheet_row_idx, csv_row))
                 
                 else:
                     # Resource not found - provide more detailed logging
                     self.logger.warning(f"No matching row found for CSV resource: '{resource_name}'")
-                    self.logger.info(f"Available Google Sheet groups: {[row[gsheet_indices['group']].strip() for row in existing_data[1:] if len(row) > gsheet_indices['group'] and row[gsheet_indices['group']].strip()][:10]}...")
+                    self.logger.info(f"Available Google Sheet groups: {sample_groups}...")
                     
                     # Add to new resources list
                     new_resources.append(csv_row)
                     self.logger.info(f"Will add as new resource: {resource_name}")
             
+            # Diff all matched rows at once and write the change set in batched requests
+            journal_entries = []
+            cell_changes = diff_rows(matched_rows, existing_data, csv_indices, gsheet_indices)
+            if cell_changes:
+                self.write_cell_changes(spreadsheet_id, sheet_name, cell_changes)
+                for change in cell_changes:
+                    change_msg = format_change(change)
+                    changes_made.append(change_msg)
+                    self.logger.info(change_msg)
+                    journal_entries.append(JournalEntry('updated', change.resource, change.field,
+                                                        change.old_value, change.new_value))
+            
             # Append new resources at the bottom of the sheet with proper formatting
+            formatted_new_resources = []
             if new_resources:
-                last_row = len(existing_data) + 1
-                formatted_new_resources = []
-                
                 for resource in new_resources:
                     # Create a new row with the same structure as the Google Sheet
                     new_row = [''] * len(gsheet_header)  # Initialize with empty values
@@ -365,6 +309,14 @@ class GoogleSheetsServiceAccountUpdater:
                     
                     formatted_new_resources.append(new_row)
                     
+                    # Journal the values the row was created with
+                    added_entries = [
+                        JournalEntry('added', resource_name, label, '', new_row[gsheet_indices[gsheet_field]])
+                        for _, gsheet_field, label, _ in FIELD_MAPPINGS
+                        if gsheet_indices[gsheet_field] is not None and new_row[gsheet_indices[gsheet_field]]
+                    ]
+                    journal_entries.extend(added_entries or [JournalEntry('added', resource_name, '', '', '')])
+                    
                     # Log what we're adding
                     resource_info = f"{resource_type}: {resource_name}"
                     if resource_type.upper() == 'VMSS' and gsheet_indices['current'] is not None:
@@ -376,148 +328,114 @@ class GoogleSheetsServiceAccountUpdater:
                 
                 # Add the formatted resources to the sheet
                 if formatted_new_resources:
-                    new_data_range = f"{sheet_name}!A{last_row}"
+                    # The mapped-column read above can end before the sheet's real last row (blank
+                    # mapped cells, data in other columns), so let append find the table's end
+                    table_range = f"{sheet_name}!A1:{self._column_number_to_letter(max(len(gsheet_header), 1))}"
                     
-                    self.service.spreadsheets().values().update(
+                    self.service.spreadsheets().values().append(
                         spreadsheetId=spreadsheet_id,
-                        range=new_data_range,
+                        range=table_range,
                         valueInputOption='RAW',
+                        insertDataOption='INSERT_ROWS',
                         body={'values': formatted_new_resources}
                     ).execute()
+                    # Appending inserts rows, so the grid has grown
+                    self.invalidate_sheet_info(spreadsheet_id)
                     
                     self.logger.info(f"Added {len(formatted_new_resources)} new resources to the bottom of the sheet")
             
             # Check for resources in Google Sheet that are NOT in CSV (potential deletions)
-            orphaned_resources = []
-            csv_resource_names = set()
+            orphaned_names = gsheet_rows_by_group.keys() - inventory.names
+            orphaned_resources = sorted(
+                (
+                    {
+                        'row_index': idx,
+                        'name': existing_data[idx - 1][gsheet_indices['group']].strip(),
+                        'data': existing_data[idx - 1]
+                    }
+                    for name in orphaned_names
+                    for idx in gsheet_rows_by_group[name]
+                ),
+                key=lambda resource: resource['row_index']
+            )
             
-            # Collect all resource names from CSV (skip header)
-            for csv_row in csv_data[1:]:
-                if len(csv_row) > csv_indices['name']:
-                    resource_name = csv_row[csv_indices['name']].strip()
-                    if resource_name:
-                        csv_resource_names.add(resource_name.lower())
+            # Handle orphaned resources according to the orphan policy
+            deleted_resources = []
+            policy = orphan_policy or OrphanPolicy(archive_sheet=archive_sheet)
+            mode = policy.effective_mode()
+            if mode != policy.mode:
+                self.logger.warning("No interactive terminal detected - orphaned resources will only be flagged")
             
-            # Check Google Sheet resources against CSV
-            for idx, gsheet_row in enumerate(existing_data[1:], start=2):
-                if len(gsheet_row) > gsheet_indices['group']:
-                    gsheet_group = gsheet_row[gsheet_indices['group']].strip()
-                    if gsheet_group:
-                        # Check if this resource exists in CSV
-                        if gsheet_group.lower() not in csv_resource_names:
-                            orphaned_resources.append({
-                                'row_index': idx,
-                                'name': gsheet_group,
-                                'data': gsheet_row
-                            })
+            # Consecutive-miss counters are only tracked for unattended policies
+            counter_store = None
+            miss_counts = {}
+            if mode != 'prompt':
+                counter_store = MissCounterStore(policy.state_file)
+                counter_scope = MissCounterStore.scope(spreadsheet_id, sheet_name)
+                miss_counts = counter_store.record_sync(counter_scope, orphaned_names)
             
-            # Handle orphaned resources (prompt for deletion)
-            deleted_resources = []
             if orphaned_resources:
                 self.logger.warning(f"\nFound {len(orphaned_resources)} resources in Google Sheet that are NOT in Azure CSV:")
+                resource_type_idx = gsheet_indices['resource_type']
                 for resource in orphaned_resources:
                     # Show resource details
-                    resource_type_idx = self._find_column_index(gsheet_header, ['Resource Type'], case_sensitive=False)
                     resource_type = resource['data'][resource_type_idx] if (resource_type_idx is not None and len(resource['data']) > resource_type_idx) else "Unknown"
-                    self.logger.warning(f"  • {resource['name']} ({resource_type})")
-                
-                # Ask user if they want to delete these resources
-                print("\n" + "="*60)
-                print("ORPHANED RESOURCES DETECTED")
-                print("="*60)
-                print(f"Found {len(orphaned_resources)} resources in your Google Sheet that no longer exist in Azure:")
-                print()
+                    misses = f", missing for {miss_counts[resource['name'].lower()]} sync(s)" if miss_counts else ""
+                    self.logger.warning(f"  • {resource['name']} ({resource_type}{misses})")
                 
-                for i, resource in enumerate(orphaned_resources, 1):
-                    resource_type_idx = self._find_column_index(gsheet_header, ['Resource Type'], case_sensitive=False)
-                    resource_type = resource['data'][resource_type_idx] if (resource_type_idx is not None and len(resource['data']) > resource_type_idx) else "Unknown"
-                    
-                    subscription_idx = gsheet_indices['subscription']
-                    subscription = resource['data'][subscription_idx] if (subscription_idx is not None and len(resource['data']) > subscription_idx) else "Unknown"
-                    
-                    print(f"{i:2d}. Name: {resource['name']}")
-                    print(f"     Type: {resource_type}")
-                    print(f"     Subscription: {subscription}")
-                    print()
+                rows_to_delete = []
+                if mode == 'prompt':
+                    if self._prompt_orphan_deletion(orphaned_resources, gsheet_indices):
+                        rows_to_delete = orphaned_resources
+                elif mode in ('delete', 'archive'):
+                    removable = set(policy.select_for_removal(orphaned_names, miss_counts))
+                    rows_to_delete = [resource for resource in orphaned_resources if resource['name'].lower() in removable]
+                    pending = len(orphaned_resources) - len(rows_to_delete)
+                    if pending:
+                        self.logger.info(f"Keeping {pending} orphaned resources until they are missing for {policy.min_misses} consecutive syncs")
+                else:
+                    self.logger.info("Orphan policy 'flag': leaving orphaned resources in place")
                 
-                print("These resources are no longer found in your Azure environment.")
-                print("This could mean they were:")
-                print("  - Deleted from Azure")
-                print("  - Moved to a different subscription")
-                print("  - Renamed")
-                print("  - Access was revoked")
-                print()
+                if rows_to_delete and policy.archive_sheet:
+                    # Only mapped columns were read; archive the complete rows
+                    full_rows = self.read_rows(spreadsheet_id, sheet_name, [resource['row_index'] for resource in rows_to_delete])
+                    for resource in rows_to_delete:
+                        resource['data'] = full_rows.get(resource['row_index'], resource['data'])
                 
-                while True:
-                    try:
-                        user_choice = input("Do you want to DELETE these rows from the Google Sheet? (y/n/list): ").lower().strip()
-                    except (EOFError, KeyboardInterrupt):
-                        print("\nOperation cancelled by user.")
-                        user_choice = 'n'
+                if rows_to_delete:
+                    deleted_resources = self.delete_orphaned_rows(
+                        spreadsheet_id, sheet_metadata, sheet_name, rows_to_delete,
+                        archive_sheet=policy.archive_sheet, header=gsheet_header
+                    )
                     
-                    if user_choice in ['y', 'yes']:
-                        # Delete orphaned resources (delete from bottom to top to maintain indices)
-                        orphaned_resources.sort(key=lambda x: x['row_index'], reverse=True)
-                        
-                        for resource in orphaned_resources:
-                            try:
-                                # Get the actual sheet ID
-                                sheet_id = None
-                                for sheet in sheet_metadata.get('sheets', []):
-                                    if sheet['properties']['title'] == sheet_name:
-                                        sheet_id = sheet['properties']['sheetId']
-                                        break
-                                
-                                if sheet_id is not None:
-                                    # Delete the entire row using batchUpdate
-                                    request_body = {
-                                        'requests': [{
-                                            'deleteDimension': {
-                                                'range': {
-                                                    'sheetId': sheet_id,
-                                                    'dimension': 'ROWS',
-                                                    'startIndex': resource['row_index'] - 1,  # 0-based index
-                                                    'endIndex': resource['row_index']
-                                                }
-                                            }
-                                        }]
-                                    }
-                                    
-                                    self.service.spreadsheets().batchUpdate(
-                                        spreadsheetId=spreadsheet_id,
-                                        body=request_body
-                                    ).execute()
-                                    
-                                    deleted_resources.append(resource['name'])
-                                    self.logger.info(f"Deleted orphaned resource: {resource['name']}")
-                                else:
-                                    self.logger.error(f"Could not find sheet ID for '{sheet_name}'")
-                                    
-                            except Exception as e:
-                                self.logger.error(f"Failed to delete resource {resource['name']}: {e}")
-                        
-                        if deleted_resources:
-                            print(f"\n✓ Successfully deleted {len(deleted_resources)} orphaned resources from Google Sheet")
-                            changes_made.extend([f"Deleted orphaned resource: {name}" for name in deleted_resources])
-                        break
-                        
-                    elif user_choice in ['n', 'no']:
-                        print("\n↪ Skipping deletion of orphaned resources")
-                        break
-                        
-                    elif user_choice in ['list', 'l']:
-                        print("\nDetailed list of orphaned resources:")
-                        print("-" * 60)
-                        for i, resource in enumerate(orphaned_resources, 1):
-                            print(f"{i}. {resource['name']}")
-                            if len(resource['data']) > 1:
-                                print(f"   Row data: {resource['data'][:5]}...")  # Show first 5 columns
-                            print()
-                        continue
-                        
-                    else:
-                        print("Please enter 'y' for yes, 'n' for no, or 'list' to see details")
+                    if deleted_resources:
+                        archived_note = f" (archived to '{policy.archive_sheet}')" if policy.archive_sheet else ""
+                        print(f"\n✓ Successfully deleted {len(deleted_resources)} orphaned resources from Google Sheet{archived_note}")
+                        changes_made.extend([f"Deleted orphaned resource: {name}" for name in deleted_resources])
+                        journal_entries.extend(JournalEntry('deleted', name, '', '', '') for name in deleted_resources)
+            
+            if counter_store is not None:
+                counter_store.forget(counter_scope, deleted_resources)
+                try:
+                    counter_store.save()
+                except OSError as e:
+                    self.logger.warning(f"Could not save orphan miss counters to {policy.state_file}: {e}")
 
+            if journal is not None and journal_entries:
+                try:
+                    journal.record(spreadsheet_id, sheet_name, journal_entries)
+                    self.logger.info(f"Recorded {len(journal_entries)} change(s) in journal {journal.journal_file}")
+                except sqlite3.Error as e:
+                    self.logger.warning(f"Could not write change journal {journal.journal_file}: {e}")
+            
+            if mirror is not None:
+                try:
+                    mirror_mode = mirror.apply_sync(spreadsheet_id, sheet_name, existing_data, gsheet_indices,
+                                                    cell_changes, formatted_new_resources, deleted_resources)
+                    self.logger.info(f"Updated local mirror {mirror.mirror_file} ({mirror_mode})")
+                except sqlite3.Error as e:
+                    self.logger.warning(f"Could not update local mirror {mirror.mirror_file}: {e}")
+            
             # Summary
             self.logger.info(f"\n=== UPDATE SUMMARY ===")
             self.logger.info(f"Total changes made: {len(changes_made)}")
@@ -542,17 +460,216 @@ class GoogleSheetsServiceAccountUpdater:
                 self.logger.error("2. Does the service account have 'Editor' permissions?")
             return False
     
-    def _find_column_index(self, header_row: List[str], search_terms: List[str], case_sensitive: bool = True) -> int:
-        """Find column index by searching for terms in header row."""
-        for term in search_terms:
-            for idx, col_name in enumerate(header_row):
-                if case_sensitive:
-                    if col_name.strip() == term:
-                        return idx
-                else:
-                    if col_name.strip().lower() == term.lower():
-                        return idx
-        return None
+    def read_mapped_columns(self, spreadsheet_id: str, sheet_name: str,
+                            column_indices: Iterable[Optional[int]]) -> List[List[str]]:
+        """Read only the given 0-based columns with one values().batchGet.
+        
+        Returns rows (header included) as wide as the right-most requested column, with
+        unrequested cells left empty, so they index like a full values().get result.
+        """
+        columns = sorted({index for index in column_indices if index is not None})
+        if not columns:
+            return [[]]
+        ranges = []
+        for index in columns:
+            letter = self._column_number_to_letter(index + 1)
+            ranges.append(f"{sheet_name}!{letter}:{letter}")
+        result = self.service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=ranges,
+            majorDimension='COLUMNS',
+            fields='valueRanges.values'
+        ).execute()
+        
+        column_values = [(value_range.get('values') or [[]])[0] for value_range in result.get('valueRanges', [])]
+        row_count = max([1] + [len(values) for values in column_values])
+        width = columns[-1] + 1
+        rows = [[''] * width for _ in range(row_count)]
+        for index, values in zip(columns, column_values):
+            for row, value in zip(rows, values):
+                row[index] = value
+        return rows
+    
+    def read_rows(self, spreadsheet_id: str, sheet_name: str, row_numbers: Iterable[int]) -> Dict[int, List[str]]:
+        """Read complete rows (1-based numbers) with one values().batchGet over contiguous runs."""
+        runs = []
+        for row_number in sorted(set(row_numbers)):
+            if runs and runs[-1][1] == row_number - 1:
+                runs[-1][1] = row_number
+            else:
+                runs.append([row_number, row_number])
+        if not runs:
+            return {}
+        result = self.service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f"{sheet_name}!{first}:{last}" for first, last in runs],
+            fields='valueRanges.values'
+        ).execute()
+        
+        rows = {}
+        for (first, last), value_range in zip(runs, result.get('valueRanges', [])):
+            values = value_range.get('values', [])
+            for row_number in range(first, last + 1):
+                offset = row_number - first
+                rows[row_number] = values[offset] if offset < len(values) else []
+        return rows
+    
+    def write_cell_changes(self, spreadsheet_id: str, sheet_name: str, cell_changes: List[CellChange],
+                           batch_size: int = CELL_UPDATE_BATCH_SIZE) -> int:
+        """Write a change set with values().batchUpdate, batch_size cells per request."""
+        updated_cells = 0
+        for start in range(0, len(cell_changes), batch_size):
+            data = [
+                {
+                    'range': f"{sheet_name}!{self._column_number_to_letter(change.column + 1)}{change.row}",
+                    'values': [[change.new_value]]
+                }
+                for change in cell_changes[start:start + batch_size]
+            ]
+            result = self.service.spreadsheets().values().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={'valueInputOption': 'RAW', 'data': data}
+            ).execute()
+            updated_cells += result.get('totalUpdatedCells', len(data))
+        return updated_cells
+    
+    def _prompt_orphan_deletion(self, orphaned_resources: List[Dict[str, Any]], gsheet_indices: Dict[str, Optional[int]]) -> bool:
+        """Show orphaned resources and ask whether they should be deleted."""
+        resource_type_idx = gsheet_indices['resource_type']
+        
+        # Ask user if they want to delete these resources
+        print("\n" + "="*60)
+        print("ORPHANED RESOURCES DETECTED")
+        print("="*60)
+        print(f"Found {len(orphaned_resources)} resources in your Google Sheet that no longer exist in Azure:")
+        print()
+        
+        for i, resource in enumerate(orphaned_resources, 1):
+            resource_type = resource['data'][resource_type_idx] if (resource_type_idx is not None and len(resource['data']) > resource_type_idx) else "Unknown"
+            
+            subscription_idx = gsheet_indices['subscription']
+            subscription = resource['data'][subscription_idx] if (subscription_idx is not None and len(resource['data']) > subscription_idx) else "Unknown"
+            
+            print(f"{i:2d}. Name: {resource['name']}")
+            print(f"     Type: {resource_type}")
+            print(f"     Subscription: {subscription}")
+            print()
+        
+        print("These resources are no longer found in your Azure environment.")
+        print("This could mean they were:")
+        print("  - Deleted from Azure")
+        print("  - Moved to a different subscription")
+        print("  - Renamed")
+        print("  - Access was revoked")
+        print()
+        
+        while True:
+            try:
+                user_choice = input("Do you want to DELETE these rows from the Google Sheet? (y/n/list): ").lower().strip()
+            except (EOFError, KeyboardInterrupt):
+                print("\nOperation cancelled by user.")
+                user_choice = 'n'
+            
+            if user_choice in ['y', 'yes']:
+                return True
+                
+            elif user_choice in ['n', 'no']:
+                print("\n↪ Skipping deletion of orphaned resources")
+                return False
+                
+            elif user_choice in ['list', 'l']:
+                print("\nDetailed list of orphaned resources:")
+                print("-" * 60)
+                for i, resource in enumerate(orphaned_resources, 1):
+                    print(f"{i}. {resource['name']}")
+                    if len(resource['data']) > 1:
+                        print(f"   Row data: {resource['data'][:5]}...")  # Show first 5 columns
+                    print()
+                continue
+                
+            else:
+                print("Please enter 'y' for yes, 'n' for no, or 'list' to see details")
+    
+    def delete_orphaned_rows(self, spreadsheet_id: str, sheet_metadata: Dict[str, Any], sheet_name: str,
+                             orphaned_resources: List[Dict[str, Any]], archive_sheet: Optional[str] = None,
+                             header: Optional[List[str]] = None) -> List[str]:
+        """Delete orphaned rows in a single batchUpdate, optionally archiving them to another tab first."""
+        sheet_ids = {sheet['properties']['title']: sheet['properties']['sheetId']
+                     for sheet in sheet_metadata.get('sheets', [])}
+        sheet_id = sheet_ids.get(sheet_name)
+        if sheet_id is None:
+            self.logger.error(f"Could not find sheet ID for '{sheet_name}'")
+            return []
+        
+        requests = []
+        if archive_sheet:
+            archive_rows = []
+            archive_id = sheet_ids.get(archive_sheet)
+            if archive_id is None:
+                # Create the archive tab in the same call, with a header row
+                archive_id = max(sheet_ids.values(), default=0) + 1
+                requests.append({
+                    'addSheet': {'properties': {'sheetId': archive_id, 'title': archive_sheet}}
+                })
+                archive_rows.append(list(header or []) + ['Archived At'])
+            
+            archived_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            width = len(header or [])
+            archive_rows.extend(
+                list(resource['data']) + [''] * (width - len(resource['data'])) + [archived_at]
+                for resource in orphaned_resources
+            )
+            requests.append({
+                'appendCells': {
+                    'sheetId': archive_id,
+                    'rows': [
+                        {'values': [{'userEnteredValue': {'stringValue': str(value)}} for value in row]}
+                        for row in archive_rows
+                    ],
+                    'fields': 'userEnteredValue'
+                }
+            })
+        
+        # Merge adjacent rows into ranges and delete from the bottom up so indices stay valid
+        row_ranges = []
+        for row_index in sorted({resource['row_index'] for resource in orphaned_resources}, reverse=True):
+            if row_ranges and row_ranges[-1][0] == row_index:
+                row_ranges[-1][0] = row_index - 1
+            else:
+                row_ranges.append([row_index - 1, row_index])  # 0-based, end-exclusive
+        
+        for start_index, end_index in row_ranges:
+            requests.append({
+                'deleteDimension': {
+                    'range': {
+                        'sheetId': sheet_id,
+                        'dimension': 'ROWS',
+                        'startIndex': start_index,
+                        'endIndex': end_index
+                    }
+                }
+            })
+        
+        try:
+            self.service.spreadsheets().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={'requests': requests}
+            ).execute()
+        except Exception as e:
+            self.logger.error(f"Failed to delete orphaned resources: {e}")
+            return []
+        finally:
+            # Row indices, grid sizes and possibly the tab list have changed
+            self.invalidate_sheet_info(spreadsheet_id)
+        
+        deleted_resources = [resource['name'] for resource in orphaned_resources]
+        for name in deleted_resources:
+            self.logger.info(f"Deleted orphaned resource: {name}")
+        return deleted_resources
+    
+    def _find_column_index(self, header_row: List[str], search_terms: List[str]) -> Optional[int]:
+        """Find column index by searching for terms in header row (see column_mapping.py)."""
+        return find_column_index(header_row, search_terms)
     
     def _column_number_to_letter(self, column_number: int) -> str:
         """Convert column number to Excel-style letter (1=A, 2=B, etc.)."""
@@ -564,64 +681,25 @@ class GoogleSheetsServiceAccountUpdater:
         return column_letter
     
     def update_sheet(self, spreadsheet_id: str, sheet_name: str, csv_file: str, 
-                    start_cell: str = 'A1', clear_existing: bool = True) -> bool:
+                    start_cell: str = 'A1', clear_existing: bool = True,
+                    archive_sheet: Optional[str] = None,
+                    orphan_policy: Optional[OrphanPolicy] = None,
+                    journal: Optional[ChangeJournal] = None,
+                    mirror: Optional[SheetMirror] = None) -> bool:
         """Update Google Sheet with data from CSV file - wrapper that chooses update method."""
         
         # Always use selective update method (ignore clear_existing parameter)
-        return self.update_sheet_selective(spreadsheet_id, sheet_name, csv_file)
+        return self.update_sheet_selective(spreadsheet_id, sheet_name, csv_file,
+                                           archive_sheet=archive_sheet, orphan_policy=orphan_policy,
+                                           journal=journal, mirror=mirror)
     
     def create_summary_stats(self, csv_file: str) -> Dict[str, int]:
-        """Create summary statistics from CSV data."""
-        stats = {
-            'total_resources': 0,
-            'vms': 0,
-            'vmss': 0,
-            'autoscale_enabled': 0,
-            'mysql': 0,
-            'postgresql': 0,
-            'cosmosdb': 0,
-            'sqldb': 0,
-            'redis': 0,
-            'subscriptions': set()
-        }
-        
-        try:
-            with open(csv_file, 'r', encoding='utf-8') as file:
-                csv_reader = csv.DictReader(file)
-                for row in csv_reader:
-                    stats['total_resources'] += 1
-                    
-                    resource_type = row.get('ResourceType', '').upper()
-                    
-                    # Handle VM/VMSS resources (for backward compatibility)
-                    if resource_type == 'VM':
-                        stats['vms'] += 1
-                    elif resource_type == 'VMSS':
-                        stats['vmss'] += 1
-                        if row.get('AutoscaleEnabled', '').lower() == 'true':
-                            stats['autoscale_enabled'] += 1
-                    
-                    # Handle database resources
-                    elif resource_type == 'MYSQL':
-                        stats['mysql'] += 1
-                    elif resource_type == 'POSTGRESQL':
-                        stats['postgresql'] += 1
-                    elif resource_type == 'COSMOSDB' or resource_type.startswith('COSMOSDB-'):
-                        stats['cosmosdb'] += 1
-                    elif resource_type == 'SQLDB':
-                        stats['sqldb'] += 1
-                    elif resource_type == 'REDIS':
-                        stats['redis'] += 1
-                    
-                    if row.get('Subscription'):
-                        stats['subscriptions'].add(row['Subscription'])
-            
-            stats['subscriptions'] = len(stats['subscriptions'])
-            
-        except Exception as e:
-            self.logger.error(f"Error creating summary stats: {e}")
-        
-        return stats
+        """Create summary statistics from CSV data (reuses the index built during the sync)."""
+        inventory = self.load_inventory(csv_file)
+        if inventory is None:
+            self.logger.error("Error creating summary stats: no inventory data")
+            return InventoryStats().legacy_summary()
+        return inventory.stats.legacy_summary()
 
 def main():
     parser = argparse.ArgumentParser(
@@ -637,6 +715,22 @@ def main():
                        help='Don\'t clear existing data before updating')
     parser.add_argument('--service-account', default=SERVICE_ACCOUNT_FILE,
                        help=f'Path to service account JSON file (default: {SERVICE_ACCOUNT_FILE})')
+    parser.add_argument('--archive-sheet', default=None,
+                       help='Copy deleted orphaned rows to this tab (created if missing) in the same request')
+    parser.add_argument('--orphan-policy', choices=ORPHAN_POLICY_MODES, default='prompt',
+                       help='How to handle orphaned rows: prompt (default; flag when not a TTY), flag, delete or archive')
+    parser.add_argument('--orphan-min-misses', type=int, default=1,
+                       help='Consecutive syncs a row must be missing before delete/archive removes it (default: 1)')
+    parser.add_argument('--orphan-state-file', default=DEFAULT_STATE_FILE,
+                       help=f'File used to persist orphan miss counters (default: {DEFAULT_STATE_FILE})')
+    parser.add_argument('--journal-file', default=DEFAULT_JOURNAL_FILE,
+                       help=f'SQLite change journal appended to on every sync (default: {DEFAULT_JOURNAL_FILE})')
+    parser.add_argument('--no-journal', action='store_true',
+                       help='Do not record changes in the change journal')
+    parser.add_argument('--mirror-file', default=DEFAULT_MIRROR_FILE,
+                       help=f'Local SQLite mirror of synced tabs, queried with sheet_mirror.py (default: {DEFAULT_MIRROR_FILE})')
+    parser.add_argument('--no-mirror', action='store_true',
+                       help='Do not maintain the local mirror')
     parser.add_argument('--verbose', '-v', action='store_true', 
                        help='Enable verbose logging')
     
@@ -650,6 +744,30 @@ def main():
         print(f"Error: CSV file '{args.csv_file}' not found.")
         sys.exit(1)
     
+    try:
+        orphan_policy = OrphanPolicy(
+            mode=args.orphan_policy,
+            min_misses=args.orphan_min_misses,
+            archive_sheet=args.archive_sheet,
+            state_file=args.orphan_state_file
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    journal = None
+    if not args.no_journal:
+        try:
+            journal = ChangeJournal(args.journal_file)
+        except sqlite3.Error as e:
+            print(f"Warning: change journal '{args.journal_file}' unavailable ({e}); continuing without it")
+    mirror = None
+    if not args.no_mirror:
+        try:
+            mirror = SheetMirror(args.mirror_file)
+        except sqlite3.Error as e:
+            print(f"Warning: local mirror '{args.mirror_file}' unavailable ({e}); continuing without it")
+    
     # Initialize updater
     updater = GoogleSheetsServiceAccountUpdater(
         service_account_file=args.service_account
@@ -666,8 +784,15 @@ def main():
         sheet_name=args.sheet_name,
         csv_file=args.csv_file,
         start_cell=args.start_cell,
-        clear_existing=not args.no_clear
+        clear_existing=not args.no_clear,
+        archive_sheet=args.archive_sheet,
+        orphan_policy=orphan_policy,
+        journal=journal,
+        mirror=mirror
     )
+    for store in (journal, mirror):
+        if store is not None:
+            store.close()
     
     if success:
         # Show summary statistics